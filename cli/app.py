@@ -1,35 +1,91 @@
 """
 CLI
+
+Cada archivo en commands que empiece con cmd_ es una orden; se importa solo la que se pide
+y la aplicación Flask se construye hasta que se ejecuta un comando, no al pedir --help.
 """
 
+import ast
+import importlib
 import os
+from functools import lru_cache, wraps
 
 import click
 
 CMD_FOLDER = os.path.join(os.path.dirname(__file__), "commands")
 CMD_PREFIX = "cmd_"
+CMD_PACKAGE = "cli.commands"
+
+
+@lru_cache()
+def get_registry() -> dict:
+    """Registro de las órdenes, el nombre y su módulo, se arma una vez"""
+    registry = {}
+    for filename in sorted(os.listdir(CMD_FOLDER)):
+        if filename.endswith(".py") and filename.startswith(CMD_PREFIX):
+            registry[filename[len(CMD_PREFIX) : -3]] = f"{CMD_PACKAGE}.{filename[:-3]}"
+    return registry
+
+
+@lru_cache()
+def get_short_help(name: str) -> str:
+    """Tomar el docstring de la función cli de la orden sin importar su módulo"""
+    with open(os.path.join(CMD_FOLDER, f"{CMD_PREFIX}{name}.py"), encoding="utf8") as file:
+        tree = ast.parse(file.read())
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "cli":
+            return ast.get_docstring(node) or ""
+    return ""
+
+
+def with_app(callback):
+    """Construir la aplicación, una sola vez por proceso, antes de ejecutar el comando"""
+
+    @wraps(callback)
+    def decorated_function(*args, **kwargs):
+        # Se importa aquí para que listar las órdenes o pedir --help no construya la aplicación
+        from perseo.worker import get_worker_app
+
+        get_worker_app()
+        return callback(*args, **kwargs)
+
+    return decorated_function
+
+
+def wrap_commands(command: click.Command) -> None:
+    """Envolver los comandos finales de un grupo con with_app"""
+    if isinstance(command, click.Group):
+        for subcommand in command.commands.values():
+            wrap_commands(subcommand)
+    elif command.callback is not None:
+        command.callback = with_app(command.callback)
 
 
 class CLI(click.MultiCommand):
     """Para que cada archivo en commands que empiece con cmd_ sea una orden"""
 
+    commands = {}  # Órdenes ya importadas y envueltas
+
     def list_commands(self, ctx):
         """Listado de comandos"""
-        commands = []
-        for filename in os.listdir(CMD_FOLDER):
-            if filename.endswith(".py") and filename.startswith(CMD_PREFIX):
-                commands.append(filename[4:-3])
-        commands.sort()
-        return commands
+        return list(get_registry())
+
+    def format_commands(self, ctx, formatter):
+        """Listar las órdenes con su ayuda corta sin importarlas"""
+        rows = [(name, get_short_help(name)) for name in self.list_commands(ctx)]
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
 
     def get_command(self, ctx, name):
         """Obtener comando"""
-        ns = {}
-        filename = os.path.join(CMD_FOLDER, CMD_PREFIX + name + ".py")
-        with open(filename) as f:
-            code = compile(f.read(), filename, "exec")
-            eval(code, ns, ns)
-        return ns["cli"]
+        if name not in get_registry():
+            return None
+        if name not in self.commands:
+            command = importlib.import_module(get_registry()[name]).cli
+            wrap_commands(command)
+            self.commands[name] = command
+        return self.commands[name]
 
 
 @click.command(cls=CLI)
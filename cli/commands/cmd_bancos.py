@@ -7,7 +7,6 @@ import sys
 import click
 
 from lib.exceptions import MyAnyError
-from perseo.blueprints.bancos.tasks import reiniciar_consecutivos_generados as task_reiniciar_consecutivos_generados
 
 
 @click.group()
@@ -19,6 +18,8 @@ def cli():
 def reiniciar_consecutivos_temp():
     """Lanzar reiniciar los consecutivos temporales"""
 
+    from perseo.blueprints.bancos.tasks import reiniciar_consecutivos_generados as task_reiniciar_consecutivos_generados
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_reiniciar_consecutivos_generados()
@@ -8,10 +8,8 @@ from datetime import datetime
 
 import click
 from dotenv import load_dotenv
-from openpyxl import Workbook
 
 from lib.safe_string import QUINCENA_REGEXP, safe_string
-from perseo.app import create_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.beneficiarios.models import Beneficiario
 from perseo.blueprints.beneficiarios_cuentas.models import BeneficiarioCuenta
@@ -19,10 +17,6 @@ from perseo.blueprints.beneficiarios_quincenas.models import BeneficiarioQuincen
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -34,6 +28,8 @@ def cli():
 def generar(quincena_clave: str):
     """Generar archivo XLSX con los numeros de cheque para los beneficiarios de una quincena"""
 
+    from openpyxl import Workbook
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida.")
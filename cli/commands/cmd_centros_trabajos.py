@@ -8,14 +8,11 @@ import sys
 from pathlib import Path
 
 import click
-import requests
 from dotenv import load_dotenv
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import safe_clave, safe_string
-from perseo.app import create_app
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
-from perseo.blueprints.centros_trabajos.tasks import exportar_xlsx as task_exportar_xlsx
 from perseo.extensions import database
 
 load_dotenv()
@@ -25,10 +22,6 @@ RRHH_PERSONAL_URL = os.getenv("RRHH_PERSONAL_URL", "")
 RRHH_PERSONAL_API_KEY = os.getenv("RRHH_PERSONAL_API_KEY", "")
 TIMEOUT = 12
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -115,6 +108,8 @@ def agregar_actualizar(centros_trabajos_csv: str):
 def exportar_xlsx():
     """Exportar Centros de Trabajo a un archivo XLSX"""
 
+    from perseo.blueprints.centros_trabajos.tasks import exportar_xlsx as task_exportar_xlsx
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_exportar_xlsx()
@@ -129,6 +124,9 @@ def exportar_xlsx():
 @click.command()
 def sincronizar():
     """Sincronizar los Centros de Trabajo con la informacion de RRHH Personal"""
+
+    import requests
+
     click.echo("Sincronizando Centros de Trabajo...")
 
     # Validar que se haya definido RRHH_PERSONAL_URL
@@ -18,17 +18,12 @@ import click
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_string
-from perseo.app import create_app
 from perseo.blueprints.conceptos.models import Concepto
-from perseo.blueprints.conceptos.tasks import exportar_xlsx as tesk_exportar_xlsx
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.quincenas.models import Quincena
 
 CONCEPTOS_CSV = "seed/conceptos.csv"
 
-app = create_app()
-app.app_context().push()
-
 
 @click.group()
 def cli():
@@ -168,6 +163,8 @@ def eliminar_recuperar(quincena_clave: str):
 def exportar_xlsx():
     """Exportar Conceptos a un archivo XLSX"""
 
+    from perseo.blueprints.conceptos.tasks import exportar_xlsx as tesk_exportar_xlsx
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = tesk_exportar_xlsx()
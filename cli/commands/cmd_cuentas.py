@@ -13,16 +13,14 @@ import sys
 from pathlib import Path
 
 import click
-import xlrd
 from dotenv import load_dotenv
 
 from lib.safe_string import QUINCENA_REGEXP
-from perseo.app import create_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.conceptos_productos.models import ConceptoProducto
-from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.cuentas.models import Cuenta, actualizar_cuentas_principales
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.personas.models import Persona
@@ -36,10 +34,6 @@ EXPLOTACION_BASE_DIR = os.getenv("EXPLOTACION_BASE_DIR", "")
 CUENTAS_FILENAME_XLS = "EmpleadosAlfabetico.XLS"
 MONEDEROS_FILENAME_XLS = "Monederos.XLS"
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -51,6 +45,8 @@ def cli():
 def alimentar_bancarias(quincena: str):
     """Alimentar Cuentas Bancarias"""
 
+    import xlrd
+
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
@@ -166,6 +162,8 @@ def alimentar_bancarias(quincena: str):
 def alimentar_monederos(quincena: str):
     """Alimentar cuentas monederos"""
 
+    import xlrd
+
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
@@ -299,39 +297,25 @@ def agregar_cuentas_faltantes():
         click.echo("ERROR: No se encontró el banco Santander.")
         sys.exit(1)
 
-    # Consultar las personas activas
-    personas = Persona.query.filter_by(estatus="A").all()
+    # Actualizar las cuentas principales, por si la base de datos tiene cuentas alimentadas antes de mantenerlas
+    actualizar_cuentas_principales(sesion.connection())
 
-    # Si no hay personas, se termina
-    if len(personas) == 0:
-        click.echo("ERROR: No hay personas.")
-        sys.exit(1)
+    # Consultar las personas activas que no tienen cuenta de nomina
+    personas = Persona.query.filter_by(estatus="A").filter(Persona.cuenta_nomina_id.is_(None)).all()
 
-    # Bucle por todas las personas
+    # Bucle por las personas, a cada una se le agrega una cuenta
     contador = 0
     for persona in personas:
-        # Consultar las cuentas de la persona
-        cuentas = Cuenta.query.filter_by(persona_id=persona.id).all()
+        # Agregar la cuenta
+        cuenta = Cuenta(
+            persona=persona,
+            banco=banco,
+            num_cuenta="8" * 11,
+        )
+        database.session.add(cuenta)
 
-        # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        tiene_cuenta_bancaria = False
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                tiene_cuenta_bancaria = True
-                break
-
-        # Si la persona no tiene cuenta bancaria, se le agrega una
-        if not tiene_cuenta_bancaria:
-            # Agregar la cuenta
-            cuenta = Cuenta(
-                persona=persona,
-                banco=banco,
-                num_cuenta="8" * 11,
-            )
-            database.session.add(cuenta)
-
-            # Incrementar contador
-            contador += 1
+        # Incrementar contador
+        contador += 1
 
     # Si no hubo que agregar cuentas, se termina
     if contador == 0:
@@ -345,6 +329,22 @@ def agregar_cuentas_faltantes():
     click.echo(click.style(f"  Agregar Cuentas Faltantes: {contador} cuentas en SANTANDER con ochos", fg="green"))
 
 
+@click.command()
+def actualizar_principales():
+    """Actualizar la cuenta de nomina y la de monedero de todas las personas"""
+
+    # Iniciar sesion con la base de datos
+    sesion = database.session
+
+    # Actualizar solo las personas en las que cambian
+    contador = actualizar_cuentas_principales(sesion.connection())
+    sesion.commit()
+
+    # Mensaje termino
+    click.echo(click.style(f"  Actualizar Cuentas Principales: {contador} personas actualizadas.", fg="green"))
+
+
 cli.add_command(alimentar_bancarias)
 cli.add_command(alimentar_monederos)
 cli.add_command(agregar_cuentas_faltantes)
+cli.add_command(actualizar_principales)
@@ -7,6 +7,8 @@ import sys
 
 import click
 from dotenv import load_dotenv
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.schema import CreateColumn
 
 from cli.commands.alimentar_autoridades import alimentar_autoridades
 from cli.commands.alimentar_distritos import alimentar_distritos
@@ -20,22 +22,24 @@ from cli.commands.respaldar_distritos import respaldar_distritos
 from cli.commands.respaldar_modulos import respaldar_modulos
 from cli.commands.respaldar_roles_permisos import respaldar_roles_permisos
 from cli.commands.respaldar_usuarios_roles import respaldar_usuarios_roles
-from perseo.app import create_app
 from perseo.blueprints.autoridades.models import Autoridad
 from perseo.blueprints.bitacoras.models import Bitacora
+from perseo.blueprints.conceptos.models import Concepto
+from perseo.blueprints.cuentas.models import Cuenta, actualizar_cuentas_principales
 from perseo.blueprints.distritos.models import Distrito
 from perseo.blueprints.entradas_salidas.models import EntradaSalida
 from perseo.blueprints.modulos.models import Modulo
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.permisos.models import Permiso
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.quincenas_productos.models import QuincenaProducto
 from perseo.blueprints.roles.models import Rol
 from perseo.blueprints.usuarios.models import Usuario
 from perseo.blueprints.usuarios_roles.models import UsuarioRol
 from perseo.extensions import database
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 load_dotenv()
 
 ENTORNO_IMPLEMENTACION = os.getenv("ENTORNO_IMPLEMENTACION", "DEVELOPMENT")
@@ -93,7 +97,120 @@ def respaldar(ctx):
     click.echo("Termina respaldar.")
 
 
+@click.command()
+def crear_columnas():
+    """Agregar las columnas que falten en las tablas que ya existen"""
+    inspector = inspect(database.engine)
+    agregadas = set()
+    for tabla in (Persona.__table__, QuincenaProducto.__table__):
+        existentes = {columna["name"] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name in existentes:
+                continue
+            definicion = CreateColumn(columna).compile(dialect=database.engine.dialect)
+            with database.engine.begin() as conexion:
+                conexion.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {definicion}"))
+            click.echo(f"  {tabla.name}.{columna.name}")
+            agregadas.add(f"{tabla.name}.{columna.name}")
+
+    # Si se agregaron las cuentas principales de las personas, llenarlas porque los generadores las usan
+    if agregadas & {"personas.cuenta_nomina_id", "personas.cuenta_monedero_id"}:
+        with database.engine.begin() as conexion:
+            cantidad = actualizar_cuentas_principales(conexion)
+        click.echo(f"  Se actualizaron las cuentas principales de {cantidad} personas")
+    click.echo("Termina crear columnas.")
+
+
+@click.command()
+def crear_indices():
+    """Crear los indices que falten en las tablas que ya existen"""
+    for tabla in (Nomina.__table__, PercepcionDeduccion.__table__):
+        for indice in sorted(tabla.indexes, key=lambda indice: indice.name):
+            indice.create(bind=database.engine, checkfirst=True)
+            click.echo(f"  {indice.name}")
+    click.echo("Termina crear indices.")
+
+
+@click.command()
+@click.argument("quincena_clave", type=str, required=False)
+def explicar(quincena_clave: str):
+    """Ejecutar EXPLAIN ANALYZE en las consultas mas usadas y reportar los recorridos secuenciales"""
+
+    # Tomar la quincena, por defecto la ultima
+    consulta = select(Quincena.id, Quincena.clave).where(Quincena.estatus == "A")
+    if quincena_clave:
+        consulta = consulta.where(Quincena.clave == quincena_clave)
+    quincena = database.session.execute(consulta.order_by(Quincena.clave.desc()).limit(1)).first()
+    if quincena is None:
+        click.echo("ERROR: No hay quincena.")
+        sys.exit(1)
+
+    # Tomar una persona que tenga nominas en la quincena
+    persona_id = database.session.execute(
+        select(Nomina.persona_id).where(Nomina.quincena_id == quincena.id).limit(1)
+    ).scalar_one_or_none()
+    if persona_id is None:
+        persona_id = 0
+
+    # Definir las consultas mas usadas por los generadores, las tablas y los comandos
+    consultas = {
+        "Nominas de la quincena y tipo": select(Nomina.id)
+        .where(Nomina.quincena_id == quincena.id)
+        .where(Nomina.tipo == "SALARIO")
+        .where(Nomina.estatus == "A"),
+        "Nominas de la persona y quincena": select(Nomina.id)
+        .where(Nomina.persona_id == persona_id)
+        .where(Nomina.quincena_id == quincena.id)
+        .where(Nomina.timbrado_id == 0),
+        "Matriz de P-D de la quincena": select(
+            PercepcionDeduccion.persona_id, Concepto.clave, func.sum(PercepcionDeduccion.importe)
+        )
+        .join(Concepto, PercepcionDeduccion.concepto_id == Concepto.id)
+        .where(PercepcionDeduccion.quincena_id == quincena.id)
+        .where(PercepcionDeduccion.tipo == "SALARIO")
+        .group_by(PercepcionDeduccion.persona_id, Concepto.clave),
+        "P-D de la persona": select(PercepcionDeduccion.id)
+        .where(PercepcionDeduccion.persona_id == persona_id)
+        .where(PercepcionDeduccion.estatus == "A")
+        .order_by(PercepcionDeduccion.quincena_id.desc()),
+        "Cuentas duplicadas": select(Cuenta.banco_id, Cuenta.num_cuenta)
+        .where(Cuenta.estatus == "A")
+        .group_by(Cuenta.banco_id, Cuenta.num_cuenta)
+        .having(func.count(Cuenta.persona_id.distinct()) > 1),
+    }
+
+    # En PostgreSQL se usa EXPLAIN ANALYZE, en otras bases de datos (SQLite) se usa EXPLAIN QUERY PLAN
+    dialecto = database.engine.dialect
+    if dialecto.name == "postgresql":
+        prefijo, marca_secuencial = "EXPLAIN ANALYZE", "Seq Scan on"
+    else:
+        prefijo, marca_secuencial = "EXPLAIN QUERY PLAN", "SCAN "
+
+    # Bucle por las consultas
+    click.echo(f"Explicar las consultas con la quincena {quincena.clave} y la persona {persona_id}")
+    con_secuenciales = 0
+    for nombre, consulta in consultas.items():
+        sql = str(consulta.compile(dialect=dialecto, compile_kwargs={"literal_binds": True}))
+        renglones = [" ".join(str(valor) for valor in fila) for fila in database.session.execute(text(f"{prefijo} {sql}"))]
+
+        # Revisar si hay recorridos secuenciales, en SQLite los que usan indice dicen USING INDEX
+        secuenciales = [renglon.strip() for renglon in renglones if marca_secuencial in renglon and "USING" not in renglon]
+        if len(secuenciales) > 0:
+            con_secuenciales += 1
+            click.echo(click.style(f"  {nombre}: {len(secuenciales)} recorridos secuenciales", fg="yellow"))
+            for renglon in secuenciales:
+                click.echo(click.style(f"    {renglon}", fg="yellow"))
+        else:
+            click.echo(click.style(f"  {nombre}: sin recorridos secuenciales", fg="green"))
+
+    # Mostrar el resumen
+    click.echo(f"Termina explicar: {con_secuenciales} de {len(consultas)} consultas con recorridos secuenciales.")
+
+
 cli.add_command(alimentar)
+cli.add_command(crear_columnas)
+cli.add_command(crear_indices)
+cli.add_command(explicar)
 cli.add_command(inicializar)
 cli.add_command(reiniciar)
 cli.add_command(respaldar)
@@ -0,0 +1,132 @@
+"""
+CLI Ingestar
+"""
+
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import click
+from dotenv import load_dotenv
+
+from lib.exceptions import MyAnyError
+from lib.explotacion import buscar_archivo_explotacion, leer_explotacion
+from lib.fechas import quincena_to_fecha
+from lib.ingesta import ingestar_quincena
+from lib.safe_string import QUINCENA_REGEXP
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.extensions import database
+
+load_dotenv()
+
+EXPLOTACION_BASE_DIR = os.getenv("EXPLOTACION_BASE_DIR", "")
+
+NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
+
+
+@click.group()
+def cli():
+    """Ingestar"""
+
+
+@click.command()
+@click.argument("quincena_clave", type=str)
+@click.argument("fecha_pago_str", type=str)
+@click.option("--probar", is_flag=True, help="Solo probar la lectura del archivo.")
+def quincena(quincena_clave: str, fecha_pago_str: str, probar: bool = False):
+    """Alimentar nominas y percepciones-deducciones leyendo una sola vez el archivo de explotacion"""
+
+    # Iniciar sesion con la base de datos
+    sesion = database.session
+
+    # Validar quincena
+    if re.match(QUINCENA_REGEXP, quincena_clave) is None:
+        click.echo("ERROR: Quincena inválida.")
+        sys.exit(1)
+
+    # Definir la fecha_final en base a la clave de la quincena
+    try:
+        fecha_final = quincena_to_fecha(quincena_clave, dame_ultimo_dia=True)
+    except ValueError:
+        click.echo("ERROR: Quincena inválida.")
+        sys.exit(1)
+
+    # Validar fecha_pago
+    try:
+        fecha_pago = datetime.strptime(fecha_pago_str, "%Y-%m-%d")
+    except ValueError:
+        click.echo("ERROR: Fecha de pago inválida")
+        sys.exit(1)
+
+    # Validar el directorio donde espera encontrar los archivos de explotacion
+    if EXPLOTACION_BASE_DIR == "":
+        click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
+        sys.exit(1)
+
+    # Validar si existe el archivo, en XLS o con los mismos datos en XLSX o CSV
+    ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), NOMINAS_FILENAME_XLS)
+    if not ruta.is_file():
+        click.echo(f"ERROR: {str(ruta)} no se encontró.")
+        sys.exit(1)
+
+    # Consultar quincena
+    quincena_obj = Quincena.query.filter_by(clave=quincena_clave).first()
+
+    # Si existe la quincena, pero no esta ABIERTA o ha sido eliminada, entonces se termina
+    if quincena_obj and quincena_obj.estado != "ABIERTA":
+        click.echo(f"ERROR: Quincena {quincena_clave} no esta ABIERTA.")
+        sys.exit(1)
+    if quincena_obj and quincena_obj.estatus != "A":
+        click.echo(f"ERROR: Quincena {quincena_clave} ha sido eliminada.")
+        sys.exit(1)
+
+    # Si no existe la quincena, se agrega en la misma transaccion
+    if quincena_obj is None:
+        quincena_obj = Quincena(clave=quincena_clave, estado="ABIERTA")
+        sesion.add(quincena_obj)
+        sesion.flush()
+
+    # Leer el archivo de explotacion una sola vez
+    inicio = time.perf_counter()
+    try:
+        registros = list(leer_explotacion(ruta))
+    except MyAnyError as error:
+        sesion.rollback()
+        click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+        sys.exit(1)
+
+    # Alimentar nominas y percepciones-deducciones
+    click.echo(f"Ingestar la quincena {quincena_clave} desde {ruta.name}")
+    try:
+        resultado = ingestar_quincena(sesion, quincena_obj, registros, fecha_final, fecha_pago, probar=probar)
+    except MyAnyError as error:
+        sesion.rollback()
+        click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
+        sys.exit(1)
+
+    # Hacer un solo commit, o deshacer todo si solo se esta probando
+    if probar:
+        sesion.rollback()
+    else:
+        sesion.commit()
+    sesion.close()
+
+    # Mostrar los contadores y las anomalias
+    for mensaje, color in resultado.mensajes():
+        click.echo(click.style(f"  {mensaje}", fg=color))
+
+    # Mensaje termino
+    segundos = time.perf_counter() - inicio
+    click.echo(
+        click.style(
+            f"  Ingestar quincena: {resultado.nominas_insertadas} nominas y "
+            f"{resultado.percepciones_deducciones_insertadas} percepciones-deducciones en {segundos:.1f} segundos.",
+            fg="green",
+        )
+    )
+
+
+cli.add_command(quincena)
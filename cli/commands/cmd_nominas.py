@@ -6,34 +6,27 @@ import csv
 import os
 import re
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
 
 import click
-import xlrd
 from dotenv import load_dotenv
-from openpyxl import load_workbook
 
+from lib.cargas_masivas import MapasCatalogos, insertar_por_lotes
 from lib.exceptions import MyAnyError
-from lib.fechas import crear_clave_quincena, quincena_to_fecha, quinquenio_count
+from lib.explotacion import buscar_archivo_explotacion, leer_explotacion
+from lib.fechas import crear_clave_quincena, quincena_to_fecha
+from lib.ingesta import ingestar_quincena
 from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_quincena, safe_rfc, safe_string
-from perseo.app import create_app
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
-from perseo.blueprints.nominas.generators.dispersiones_pensionados import crear_dispersiones_pensionados
-from perseo.blueprints.nominas.generators.monederos import crear_monederos
-from perseo.blueprints.nominas.generators.nominas import crear_nominas
-from perseo.blueprints.nominas.generators.pensionados import crear_pensionados
-from perseo.blueprints.nominas.generators.primas_vacacionales import crear_primas_vacacionales
-from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.plazas.models import Plaza
-from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
-from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.blueprints.timbrados.models import Timbrado
 from perseo.extensions import database
 
@@ -51,13 +44,10 @@ COMPANIA_RFC = "PJE901211TI9"
 COMPANIA_CP = "25000"
 NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 PATRON_RFC = "PJE901211TI9"
+PRIMAS_CONCEPTOS = ("P20", "PGP", "PGV", "D1R", "D62")
 PRIMAS_FILENAME_XLS = "PrimasVacacionales.XLS"
 SERICA_FILENAME_XLSX = "SERICA.xlsx"
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -289,8 +279,8 @@ def alimentar(quincena_clave: str, fecha_pago_str: str, probar: bool = False):
         click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
         sys.exit(1)
 
-    # Validar si existe el archivo
-    ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, NOMINAS_FILENAME_XLS)
+    # Validar si existe el archivo, en XLS o con los mismos datos en XLSX o CSV
+    ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), NOMINAS_FILENAME_XLS)
     if not ruta.exists():
         click.echo(f"ERROR: {str(ruta)} no se encontró.")
         sys.exit(1)
@@ -317,334 +307,41 @@ def alimentar(quincena_clave: str, fecha_pago_str: str, probar: bool = False):
         sesion.add(quincena)
         sesion.commit()
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
-
-    # Definir el puesto generico al que se van a relacionar las personas que no tengan su puesto
-    puesto_generico = Puesto.query.filter_by(clave="ND").first()
-    if puesto_generico is None:
-        click.echo("ERROR: Falta el puesto con clave ND.")
-        sys.exit(1)
-
-    # Definir el tabulador generico al que se van a relacionar los puestos que no tengan su tabulador
-    tabulador_generico = Tabulador.query.filter_by(puesto_id=puesto_generico.id).first()
-    if tabulador_generico is None:
-        click.echo("ERROR: Falta el tabulador del puesto con clave ND.")
+    # Leer el archivo de explotacion, una sola vez, en registros ya convertidos
+    try:
+        registros = list(leer_explotacion(ruta))
+    except MyAnyError as error:
+        click.echo(f"ERROR: {str(error)}")
         sys.exit(1)
 
-    # Inicializar los listados con las anomalias
-    personas_actualizadas_del_tabulador = []
-    personas_actualizadas_del_modelo = []
-    personas_actualizadas_del_num_empleado = []
-    personas_sin_puestos = []
-    personas_sin_tabulador = []
-
-    # Iniciar contadores
-    contador = 0
-    centros_trabajos_insertados_contador = 0
-    personas_actualizadas_contador = 0
-    personas_insertadas_contador = 0
-    plazas_insertadas_contador = 0
-
-    # Bucle por cada fila
-    click.echo(f"Alimentar Nominas a la quincena {quincena.clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
-        # Tomar las columnas
-        centro_trabajo_clave = hoja.cell_value(fila, 1)
-        plaza_clave = hoja.cell_value(fila, 8)
-        percepcion = int(hoja.cell_value(fila, 12)) / 100.0
-        deduccion = int(hoja.cell_value(fila, 13)) / 100.0
-        impte = int(hoja.cell_value(fila, 14)) / 100.0
-        desde_s = str(int(hoja.cell_value(fila, 16)))
-        hasta_s = str(int(hoja.cell_value(fila, 17)))
-
-        # Tomar las columnas con datos de la Persona
-        rfc = hoja.cell_value(fila, 2)
-        modelo = int(hoja.cell_value(fila, 236))
-        nombre_completo = hoja.cell_value(fila, 3)
-        num_empleado = int(hoja.cell_value(fila, 240))
-
-        # Tomar las columnas necesarias para el timbrado
-        puesto_clave = safe_clave(hoja.cell_value(fila, 20))
-        nivel = int(hoja.cell_value(fila, 9))
-        quincena_ingreso = str(int(hoja.cell_value(fila, 19)))
-
-        # Validar desde y hasta
-        try:
-            desde_clave = safe_quincena(desde_s)
-            desde = quincena_to_fecha(desde_clave, dame_ultimo_dia=False)
-            hasta_clave = safe_quincena(hasta_s)
-            hasta = quincena_to_fecha(hasta_clave, dame_ultimo_dia=True)
-        except ValueError:
-            click.echo(click.style(f"ERROR: Quincena inválida en '{desde_s}' o '{hasta_s}'", fg="red"))
-            sys.exit(1)
-
-        # Consultar el Centro de Trabajo, si no existe se agrega
-        centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
-        if centro_trabajo is None:
-            centro_trabajo = CentroTrabajo(clave=centro_trabajo_clave, descripcion="ND")
-            sesion.add(centro_trabajo)
-            sesion.commit()
-            centros_trabajos_insertados_contador += 1
-
-        # Consultar la Plaza, si no existe se agrega
-        plaza = Plaza.query.filter_by(clave=plaza_clave).first()
-        if plaza is None:
-            plaza = Plaza(clave=plaza_clave, descripcion="ND")
-            sesion.add(plaza)
-            sesion.commit()
-            plazas_insertadas_contador += 1
-
-        # Si el modelo es 2, entonces en SINDICALIZADO, se toman 4 caracteres del puesto y se busca quinquenios
-        quinquenios = None
-        if modelo == 2:
-            puesto_clave = puesto_clave[:4]
-
-            # Inicializar la bandera para saltar la fila si el concepto es PME
-            es_concepto_pme = False
-
-            # Bucle entre las columnas de los conceptos para encontrar PQ1, PQ2, PQ3, PQ4, PQ5, PQ6
-            col_num = 26
-            while True:
-                # Tomar el p_o_d
-                p_o_d = safe_string(hoja.cell_value(fila, col_num))
-                # Tomar el conc
-                conc = safe_string(hoja.cell_value(fila, col_num + 1))
-                # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-                if p_o_d == "":
-                    break
-                # Si NO es P, se salta
-                if p_o_d != "P":
-                    col_num += 6
-                    continue
-                # Si conc es ME es monedero, se rompe el ciclo porque aqui no hay quinquenios
-                if conc == "ME":
-                    es_concepto_pme = True
-                    break
-                # Si el concepto no es PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, se salta
-                if conc not in ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]:
-                    col_num += 6
-                    continue
-                # Tomar el tercer caracter del concepto y convertirlo a entero porque es la cantidad de quinquenios
-                quinquenios = int(conc[1])
-                break
-
-            # Si es PME, entonces en esta fila NO esta el quinquenio, se mantiene en None
-            if es_concepto_pme:
-                quinquenios = None
-
-        else:
-            # Entonces NO es SINDICALIZADO, se define quinquenios en cero
-            quinquenios = 0
-
-        # Consultar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
-        puesto = Puesto.query.filter_by(clave=puesto_clave).first()
-        if puesto is None:
-            personas_sin_puestos.append(rfc)
-            puesto = puesto_generico
-
-        # Consultar la Persona
-        persona = Persona.query.filter_by(rfc=rfc).first()
-
-        # Si NO existe la Persona, se agrega
-        if persona is None:
-            # Separar nombre_completo, en apellido_primero, apellido_segundo y nombres
-            separado = safe_string(nombre_completo, save_enie=True).split(" ")
-            apellido_primero = separado[0]
-            apellido_segundo = separado[1]
-            nombres = " ".join(separado[2:])
-
-            # Si el modelo es 2 y quinquenios es None, entonces es SINDICALIZADO y se calculan los quinquenios
-            if modelo == 2 and quinquenios is None:
-                # Calcular la cantidad de quinquenios
-                fecha_ingreso = quincena_to_fecha(quincena_ingreso, dame_ultimo_dia=False)
-                quinquenios = quinquenio_count(fecha_ingreso, fecha_final)
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si no existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Insertar a la Persona
-            persona = Persona(
-                tabulador_id=tabulador.id,
-                rfc=rfc,
-                nombres=nombres,
-                apellido_primero=apellido_primero,
-                apellido_segundo=apellido_segundo,
-                modelo=modelo,
-                num_empleado=num_empleado,
-            )
-            sesion.add(persona)
-            sesion.commit()
-            personas_insertadas_contador += 1
-
-        # De lo contrario, se revisa si cambia la Persona de tabulador, modelo o num_empleado
-        else:
-            # Inicializar hay_cambios
-            hay_cambios = False
-
-            # Si la fila es concepto PME NO va tener los quinquenios, entonces se define con la Persona
-            if quinquenios is None:
-                quinquenios = persona.tabulador.quinquenio
-
-            # Consultar el tabulador que coincida con puesto_clave, modelo, nivel y quinquenios
-            tabulador = (
-                Tabulador.query.filter_by(puesto_id=puesto.id)
-                .filter_by(modelo=modelo)
-                .filter_by(nivel=nivel)
-                .filter_by(quinquenio=quinquenios)
-                .first()
-            )
-
-            # Si NO existe el tabulador, se agrega a personas_sin_tabulador y se le asigna tabulador_generico
-            if tabulador is None:
-                personas_sin_tabulador.append(rfc)
-                tabulador = tabulador_generico
-
-            # Revisar si hay que actualizar el tabulador a la Persona
-            if persona.tabulador_id != tabulador.id:
-                personas_actualizadas_del_tabulador.append(
-                    f"{rfc} {persona.nombre_completo}: Tabulador: {persona.tabulador_id} -> {tabulador.id}"
-                )
-                persona.tabulador_id = tabulador.id
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el modelo a la Persona
-            if persona.modelo != modelo:
-                personas_actualizadas_del_modelo.append(
-                    f"{rfc} {persona.nombre_completo}: Modelo: {persona.modelo} -> {modelo}"
-                )
-                persona.modelo = modelo
-                hay_cambios = True
-
-            # Revisar si hay que actualizar el numero de empleado a la Persona
-            if persona.num_empleado != num_empleado:
-                personas_actualizadas_del_num_empleado.append(
-                    f"{rfc} {persona.nombre_completo}: Num. Emp. {persona.num_empleado} -> {num_empleado}"
-                )
-                persona.num_empleado = num_empleado
-                hay_cambios = True
-
-            # Si hay cambios, guardar la Persona
-            if hay_cambios:
-                if probar is False:
-                    persona.save()
-                personas_actualizadas_contador += 1
-
-        # Bucle entre P-D para determinar el tipo entre SALARIO y DESPENSA
-        nomina_tipo = None
-        col_num = 26
-        while True:
-            # Tomar el tipo y el conc para armar la clave del concepto
-            tipo = safe_string(hoja.cell_value(fila, col_num))
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-            concepto_clave = f"{tipo}{conc}"
-
-            # Si el tipo es un texto vacio, se rompe el ciclo
-            if tipo == "":
-                break
-
-            # Si el concepto_clave es PME, entonces es DESPENSA y se termina este ciclo
-            if concepto_clave == "PME":
-                nomina_tipo = Nomina.TIPOS["DESPENSA"]
-                break
-
-            # Incrementar col_num en SEIS
-            col_num += 6
-
-            # Romper el ciclo cuando se llega a la columna
-            if col_num > 236:
-                break
-
-        # Si no se encontro el tipo, entonces es SALARIO
-        if nomina_tipo is None:
-            nomina_tipo = Nomina.TIPOS["SALARIO"]
-
-        # Alimentar nomina
-        if probar is False:
-            nomina = Nomina(
-                centro_trabajo=centro_trabajo,
-                persona=persona,
-                plaza=plaza,
-                quincena=quincena,
-                desde=desde,
-                desde_clave=desde_clave,
-                hasta=hasta,
-                hasta_clave=hasta_clave,
-                percepcion=percepcion,
-                deduccion=deduccion,
-                importe=impte,
-                tipo=nomina_tipo,
-                fecha_pago=fecha_pago,
-            )
-            sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-        # Mostrar el avance con el modelo
-        click.echo(click.style(modelo, fg="cyan"), nl=False)
-
-    # Poner avance de linea
-    click.echo("")
-
-    # Si contador es cero, mostrar mensaje de error y terminar
-    if contador == 0:
-        click.echo(click.style("ERROR: No se alimentaron registros en nominas.", fg="red"))
+    # Alimentar las nominas, las percepciones-deducciones las alimenta su propia orden o ingestar quincena
+    click.echo(f"Alimentar Nominas a la quincena {quincena.clave}")
+    try:
+        resultado = ingestar_quincena(
+            sesion,
+            quincena,
+            registros,
+            fecha_final,
+            fecha_pago,
+            percepciones_deducciones=False,
+            probar=probar,
+        )
+    except MyAnyError as error:
+        sesion.rollback()
+        click.echo(click.style(f"ERROR: {str(error)}", fg="red"))
         sys.exit(1)
 
-    # Cerrar la sesion para que se guarden todos los datos en la base de datos
+    # Hacer un solo commit para que se guarden todos los datos en la base de datos
     if probar is False:
         sesion.commit()
         sesion.close()
 
-    # Si hubo centros_trabajos_insertados, mostrar contador
-    if centros_trabajos_insertados_contador > 0:
-        click.echo(click.style(f"  Se insertaron {centros_trabajos_insertados_contador} Centros de Trabajo", fg="green"))
-
-    # Si hubo personas actualizadas, mostrar contador
-    if personas_actualizadas_contador > 0:
-        click.echo(click.style(f"  Se actualizaron {personas_actualizadas_contador} Personas", fg="green"))
-        for item in personas_actualizadas_del_tabulador:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_modelo:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-        for item in personas_actualizadas_del_num_empleado:
-            click.echo(click.style(f"  {item}", fg="yellow"))
-
-    # Si hubo personas insertadas, mostrar contador
-    if personas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {personas_insertadas_contador} Personas", fg="green"))
-
-    # Si hubo plazas insertadas, mostrar contador
-    if plazas_insertadas_contador > 0:
-        click.echo(click.style(f"  Se insertaron {plazas_insertadas_contador} Plazas", fg="green"))
-
-    # Si hubo personas_sin_puestos, mostrarlas en pantalla
-    if len(personas_sin_puestos) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_puestos)} Personas sin puestos.", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(personas_sin_puestos)}", fg="yellow"))
-
-    # Si hubo personas_sin_tabulador, mostrarlas en pantalla
-    if len(personas_sin_tabulador) > 0:
-        click.echo(click.style(f"  Hubo {len(personas_sin_tabulador)} Personas sin tabulador.", fg="yellow"))
-        click.echo(click.style(f"  {', '.join(personas_sin_tabulador)}", fg="yellow"))
+    # Mostrar los contadores y las anomalias
+    for mensaje, color in resultado.mensajes():
+        click.echo(click.style(f"  {mensaje}", fg=color))
 
     # Mensaje termino
-    click.echo(click.style(f"  Alimentar Nominas: {contador} insertadas.", fg="green"))
+    click.echo(click.style(f"  Alimentar Nominas: {resultado.nominas_insertadas} insertadas.", fg="green"))
 
 
 @click.command()
@@ -683,8 +380,8 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str, probar: bool
         click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
         sys.exit(1)
 
-    # Validar si existe el archivo
-    ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, AGUINALDOS_FILENAME_XLS)
+    # Validar si existe el archivo, en XLS o con los mismos datos en XLSX o CSV
+    ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), AGUINALDOS_FILENAME_XLS)
     if not ruta.exists():
         click.echo(f"ERROR: {str(ruta)} no se encontró.")
         sys.exit(1)
@@ -711,11 +408,12 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str, probar: bool
         sesion.add(quincena)
         sesion.commit()
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
+    # Leer el archivo de explotacion, una sola vez, en registros ya convertidos
+    try:
+        registros = list(leer_explotacion(ruta, con_persona=False))
+    except MyAnyError as error:
+        click.echo(f"ERROR: {str(error)}")
+        sys.exit(1)
 
     # Iniciar contadores
     contador = 0
@@ -725,19 +423,16 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str, probar: bool
 
     # Bucle por cada fila
     click.echo(f"Alimentando Aguinaldos a la quincena {quincena.clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
+    for registro in registros:
         # Tomar las columnas
-        centro_trabajo_clave = hoja.cell_value(fila, 1)
-        rfc = hoja.cell_value(fila, 2)
-        # nombre_completo = hoja.cell_value(fila, 3)
-        plaza_clave = hoja.cell_value(fila, 8)
-        percepcion = int(hoja.cell_value(fila, 12)) / 100.0
-        deduccion = int(hoja.cell_value(fila, 13)) / 100.0
-        impte = int(hoja.cell_value(fila, 14)) / 100.0
-        desde_s = str(int(hoja.cell_value(fila, 16)))
-        hasta_s = str(int(hoja.cell_value(fila, 17)))
-        # modelo = int(hoja.cell_value(fila, 236))
-        # num_empleado = int(hoja.cell_value(fila, 240))
+        centro_trabajo_clave = registro.centro_trabajo_clave
+        rfc = registro.rfc
+        plaza_clave = registro.plaza_clave
+        percepcion = registro.percepcion
+        deduccion = registro.deduccion
+        impte = registro.importe
+        desde_s = registro.desde_s
+        hasta_s = registro.hasta_s
 
         # Validar desde y hasta
         try:
@@ -833,6 +528,8 @@ def alimentar_aguinaldos(quincena_clave: str, fecha_pago_str: str, probar: bool
 def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str, probar: bool = False):
     """Alimentar apoyos anuales"""
 
+    import xlrd
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida.")
@@ -1097,6 +794,8 @@ def alimentar_apoyos_anuales(quincena_clave: str, fecha_pago_str: str, probar: b
 def alimentar_extraordinarios(archivo_xlsx: str, probar: bool = False):
     """Alimentar extraordinarios"""
 
+    from openpyxl import load_workbook
+
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
@@ -1354,6 +1053,8 @@ def alimentar_pensiones_alimenticias(
 ):
     """Alimentar pensiones alimenticias"""
 
+    from openpyxl import load_workbook
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida.")
@@ -1565,8 +1266,9 @@ def alimentar_pensiones_alimenticias(
 @click.command()
 @click.argument("quincena_clave", type=str)
 @click.argument("fecha_pago_str", type=str)
+@click.option("--lote", type=int, default=500, help="Cantidad de filas por commit.")
 @click.option("--probar", is_flag=True, help="Solo probar la lectura del archivo.")
-def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, probar: bool = False):
+def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, lote: int, probar: bool = False):
     """Alimentar primas vacacionales"""
 
     # Validar quincena
@@ -1588,6 +1290,11 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
         click.echo("ERROR: Fecha de pago inválida")
         sys.exit(1)
 
+    # Validar el tamaño del lote
+    if lote < 1:
+        click.echo("ERROR: El lote debe ser mayor a cero.")
+        sys.exit(1)
+
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
@@ -1596,8 +1303,8 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
         click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
         sys.exit(1)
 
-    # Validar si existe el archivo
-    ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, PRIMAS_FILENAME_XLS)
+    # Validar si existe el archivo, en XLS o con los mismos datos en XLSX o CSV
+    ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), PRIMAS_FILENAME_XLS)
     if not ruta.exists():
         click.echo(f"ERROR: {str(ruta)} no se encontró.")
         sys.exit(1)
@@ -1624,42 +1331,23 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
         sesion.add(quincena)
         sesion.commit()
 
-    # Consultar el concepto con clave P20, si no se encuentra, error
-    concepto_p20 = sesion.query(Concepto).filter_by(clave="P20").first()
-    if concepto_p20 is None:
-        click.echo("ERROR: No existe el concepto con clave P20")
-        sys.exit(1)
-
-    # Consultar el concepto con clave PGP, si no se encuentra, error
-    concepto_pgp = sesion.query(Concepto).filter_by(clave="PGP").first()
-    if concepto_pgp is None:
-        click.echo("ERROR: No existe el concepto con clave PGP")
-        sys.exit(1)
-
-    # Consultar el concepto con clave PGV, si no se encuentra, error
-    concepto_pgv = sesion.query(Concepto).filter_by(clave="PGV").first()
-    if concepto_pgv is None:
-        click.echo("ERROR: No existe el concepto con clave PGV")
-        sys.exit(1)
+    # Cargar los catalogos en diccionarios, para no consultar la base de datos por cada fila
+    mapas = MapasCatalogos(sesion)
+    quincena_id = quincena.id
 
-    # Consultar el concepto con clave D1R, si no se encuentra, error
-    concepto_d1r = sesion.query(Concepto).filter_by(clave="D1R").first()
-    if concepto_d1r is None:
-        click.echo("ERROR: No existe el concepto con clave D1R")
-        sys.exit(1)
+    # Validar que existan los conceptos P20, PGP, PGV, D1R y D62
+    for concepto_clave in PRIMAS_CONCEPTOS:
+        if concepto_clave not in mapas.conceptos:
+            click.echo(f"ERROR: No existe el concepto con clave {concepto_clave}")
+            sys.exit(1)
 
-    # Consultar el concepto con clave D62, si no se encuentra, error
-    concepto_d62 = sesion.query(Concepto).filter_by(clave="D62").first()
-    if concepto_d62 is None:
-        click.echo("ERROR: No existe el concepto con clave D62")
+    # Leer el archivo de explotacion, una sola vez, en registros ya convertidos
+    try:
+        registros = list(leer_explotacion(ruta, con_persona=False))
+    except MyAnyError as error:
+        click.echo(f"ERROR: {str(error)}")
         sys.exit(1)
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
-
     # Iniciar contadores
     contador = 0
     centros_trabajos_inexistentes = []
@@ -1667,28 +1355,20 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
     personas_inexistentes = []
     plazas_inexistentes = []
 
+    # Iniciar los listados con lo que se va a insertar en el lote
+    nominas_por_insertar = []
+    percepciones_deducciones_por_insertar = []
+
     # Bucle por cada fila
+    inicio = time.perf_counter()
     click.echo("Alimentando Nominas de Primas: ", nl=False)
-    for fila in range(1, hoja.nrows):
+    for registro in registros:
         # Tomar las columnas
-        # Columna 00 UNIDAD_DIS
-        centro_trabajo_clave = hoja.cell_value(fila, 1).strip().upper()  # Columna 01 CLAVE_CT
-        rfc = hoja.cell_value(fila, 2).strip().upper()  # Columna 02 RFC
-        # Columna 03 NOMBRE
-        # Columna 04 MUNICIPIO
-        # Columna 05 ZONA_ESCO
-        # Columna 06 LOCALIDAD
-        # Columna 07 SOB_SUELDO
-        plaza_clave = hoja.cell_value(fila, 8).strip().upper()  # Columna 08 PLAZA
-        # Columna 09 NIVP
-        # Columna 10 PROG_SUBP
-        # Columna 11 URESP_PLA
-        percepcion = int(hoja.cell_value(fila, 12)) / 100.0  # Columna 12 PERCEPCION
-        deduccion = int(hoja.cell_value(fila, 13)) / 100.0  # Columna 13 DEDUCCION
-        impte = int(hoja.cell_value(fila, 14)) / 100.0  # Columna 14 IMPTE
-        # Columna 15 NO_CHEQUE
-        desde_s = str(int(hoja.cell_value(fila, 16)))  # Columna 16 DESDE_S
-        hasta_s = str(int(hoja.cell_value(fila, 17)))  # Columna 17 HASTA_S
+        centro_trabajo_clave = registro.centro_trabajo_clave.strip().upper()
+        rfc = registro.rfc.strip().upper()
+        plaza_clave = registro.plaza_clave.strip().upper()
+        desde_s = registro.desde_s
+        hasta_s = registro.hasta_s
 
         # Validar desde y hasta
         try:
@@ -1700,198 +1380,88 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
             click.echo(click.style(f"ERROR: Quincena inválida en '{desde_s}' o '{hasta_s}'", fg="red"))
             sys.exit(1)
 
-        # Consultar la persona
-        persona = sesion.query(Persona).filter_by(rfc=rfc).first()
-
-        # Si NO existe, se agrega a la lista de personas_inexistentes y se salta
+        # Buscar la persona, si NO existe, se agrega a la lista de personas_inexistentes y se salta
+        persona = mapas.personas.get(rfc)
         if persona is None:
             personas_inexistentes.append(rfc)
             continue
 
-        # Consultar el Centro de Trabajo
-        centro_trabajo = sesion.query(CentroTrabajo).filter_by(clave=centro_trabajo_clave).first()
-
-        # Si NO existe se agrega a la lista de centros_trabajos_inexistentes y se salta
-        if centro_trabajo is None:
+        # Buscar el Centro de Trabajo, si NO existe se agrega a la lista de centros_trabajos_inexistentes y se salta
+        centro_trabajo_id = mapas.centros_trabajos.get(centro_trabajo_clave)
+        if centro_trabajo_id is None:
             centros_trabajos_inexistentes.append(centro_trabajo_clave)
             continue
 
-        # Consultar la Plaza
-        plaza = sesion.query(Plaza).filter_by(clave=plaza_clave).first()
-
-        # Si NO existe se agrega a la lista de plazas_inexistentes y se salta
-        if plaza is None:
+        # Buscar la Plaza, si NO existe se agrega a la lista de plazas_inexistentes y se salta
+        plaza_id = mapas.plazas.get(plaza_clave)
+        if plaza_id is None:
             plazas_inexistentes.append(plaza_clave)
             continue
 
-        # Revisar que en nominas no exista una nomina con la misma persona, quincena y tipo APOYO ANUAL, si existe se omite
-        # nominas_posibles = (
-        #     sesion.query(Nomina).filter_by(persona_id=persona.id)
-        #     .filter_by(quincena_id=quincena.id)
-        #     .filter_by(tipo="PRIMA VACACIONAL")
-        #     .filter_by(estatus="A")
-        #     .all()
-        # )
-        # if len(nominas_posibles) > 0:
-        #     nominas_existentes.append(rfc)
-        #     continue
-
-        # Inicializar los importes de las percepciones y deducciones
-        impt_concepto_p20 = 0.0
-        impt_concepto_pgp = 0.0
-        impt_concepto_pgv = 0.0
-        impt_concepto_d1r = 0.0
-        impt_concepto_d62 = 0.0
-
-        # Buscar percepciones y deducciones
-        col_num = 26
-        while True:
-            # Tomar 'P' o 'D', primero
-            p_o_d = safe_string(hoja.cell_value(fila, col_num))
-
-            # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-            if p_o_d == "":
-                break
-
-            # Tomar los dos caracteres adicionales del concepto
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-
-            # Definir la clave del concepto
-            concepto_clave = f"{p_o_d}{conc}"
-
-            # Si la clave del concepto NO es P20, PGP, PGV, D1R o D62, se omite
-            if concepto_clave not in ["P20", "PGP", "PGV", "D1R", "D62"]:
+        # Tomar los importes de P20, PGP, PGV, D1R y D62, si se repite un concepto se queda el ultimo
+        importes = {}
+        for concepto in registro.conceptos:
+            if concepto.clave not in PRIMAS_CONCEPTOS:
                 click.echo(click.style("X", fg="yellow"), nl=False)
-                col_num += 6
                 continue
+            importes[concepto.clave] = concepto.importe
 
-            # Tomar el importe
-            try:
-                impt = int(hoja.cell_value(fila, col_num + 3)) / 100.0
-            except ValueError:
-                impt = 0.0
-
-            # Asignar el importe al concepto correspondiente
-            if concepto_clave == "P20":
-                impt_concepto_p20 = impt
-            elif concepto_clave == "PGP":
-                impt_concepto_pgp = impt
-            elif concepto_clave == "PGV":
-                impt_concepto_pgv = impt
-            elif concepto_clave == "D1R":
-                impt_concepto_d1r = impt
-            elif concepto_clave == "D62":
-                impt_concepto_d62 = impt
-
-            # Incrementar col_num en SEIS
-            col_num += 6
-
-            # Romper el ciclo cuando se acaban las columnas a leer
-            if col_num > 236:
-                break
-
-        # Alimentar percepcion en PercepcionDeduccion, con concepto P20
-        if impt_concepto_p20 > 0:
-            if probar is False:
-                percepcion_deduccion_p20 = PercepcionDeduccion(
-                    centro_trabajo=centro_trabajo,
-                    concepto=concepto_p20,
-                    persona=persona,
-                    plaza=plaza,
-                    quincena=quincena,
-                    importe=impt_concepto_p20,
-                    tipo="PRIMA VACACIONAL",
-                )
-                sesion.add(percepcion_deduccion_p20)
-            click.echo(click.style("[P20]", fg="blue"), nl=False)
-
-        # Alimentar percepcion en PercepcionDeduccion, con concepto PGP
-        if impt_concepto_pgp > 0:
-            if probar is False:
-                percepcion_deduccion_pgp = PercepcionDeduccion(
-                    centro_trabajo=centro_trabajo,
-                    concepto=concepto_pgp,
-                    persona=persona,
-                    plaza=plaza,
-                    quincena=quincena,
-                    importe=impt_concepto_pgp,
-                    tipo="PRIMA VACACIONAL",
-                )
-                sesion.add(percepcion_deduccion_pgp)
-            click.echo(click.style("[PGP]", fg="blue"), nl=False)
-
-        # Alimentar percepcion en PercepcionDeduccion, con concepto PGV
-        if impt_concepto_pgv > 0:
-            if probar is False:
-                percepcion_deduccion_pgv = PercepcionDeduccion(
-                    centro_trabajo=centro_trabajo,
-                    concepto=concepto_pgv,
-                    persona=persona,
-                    plaza=plaza,
-                    quincena=quincena,
-                    importe=impt_concepto_pgv,
-                    tipo="PRIMA VACACIONAL",
-                )
-                sesion.add(percepcion_deduccion_pgv)
-            click.echo(click.style("[PGV]", fg="blue"), nl=False)
-
-        # Alimentar percepcion en PercepcionDeduccion, con concepto D1R
-        if impt_concepto_d1r > 0:
-            if probar is False:
-                percepcion_deduccion_d1r = PercepcionDeduccion(
-                    centro_trabajo=centro_trabajo,
-                    concepto=concepto_d1r,
-                    persona=persona,
-                    plaza=plaza,
-                    quincena=quincena,
-                    importe=impt_concepto_d1r,
-                    tipo="PRIMA VACACIONAL",
-                )
-                sesion.add(percepcion_deduccion_d1r)
-            click.echo(click.style("[D1R]", fg="blue"), nl=False)
-
-        # Alimentar percepcion en PercepcionDeduccion, con concepto D62
-        if impt_concepto_d62 > 0:
-            if probar is False:
-                percepcion_deduccion_d62 = PercepcionDeduccion(
-                    centro_trabajo=centro_trabajo,
-                    concepto=concepto_d62,
-                    persona=persona,
-                    plaza=plaza,
-                    quincena=quincena,
-                    importe=impt_concepto_d62,
-                    tipo="PRIMA VACACIONAL",
-                )
-                sesion.add(percepcion_deduccion_d62)
-            click.echo(click.style("[D62]", fg="blue"), nl=False)
-
-        # Alimentar registro en Nomina
-        if probar is False:
-            nomina = Nomina(
-                centro_trabajo=centro_trabajo,
-                persona=persona,
-                plaza=plaza,
-                quincena=quincena,
-                desde=desde,
-                desde_clave=desde_clave,
-                hasta=hasta,
-                hasta_clave=hasta_clave,
-                percepcion=percepcion,
-                deduccion=deduccion,
-                importe=impte,
-                tipo="PRIMA VACACIONAL",
-                fecha_pago=fecha_pago,
+        # Juntar las percepciones-deducciones con importe mayor a cero
+        for concepto_clave, impt in importes.items():
+            if impt <= 0:
+                continue
+            percepciones_deducciones_por_insertar.append(
+                {
+                    "centro_trabajo_id": centro_trabajo_id,
+                    "concepto_id": mapas.conceptos[concepto_clave],
+                    "persona_id": persona["id"],
+                    "plaza_id": plaza_id,
+                    "quincena_id": quincena_id,
+                    "importe": impt,
+                    "tipo": "PRIMA VACACIONAL",
+                }
             )
-            sesion.add(nomina)
+            click.echo(click.style(f"[{concepto_clave}]", fg="blue"), nl=False)
+
+        # Juntar la Nomina
+        nominas_por_insertar.append(
+            {
+                "centro_trabajo_id": centro_trabajo_id,
+                "persona_id": persona["id"],
+                "plaza_id": plaza_id,
+                "quincena_id": quincena_id,
+                "desde": desde,
+                "desde_clave": desde_clave,
+                "hasta": hasta,
+                "hasta_clave": hasta_clave,
+                "percepcion": registro.percepcion,
+                "deduccion": registro.deduccion,
+                "importe": registro.importe,
+                "tipo": "PRIMA VACACIONAL",
+                "fecha_pago": fecha_pago,
+            }
+        )
         click.echo(click.style("+", fg="green"), nl=False)
 
-        # Cerrar la sesion para que se guarden todos los datos en la base de datos
-        sesion.commit()
-        sesion.close()
-
         # Incrementar contador
         contador += 1
 
+        # Al completar el lote, insertar y hacer commit
+        if len(nominas_por_insertar) >= lote:
+            if probar is False:
+                insertar_por_lotes(sesion, PercepcionDeduccion, percepciones_deducciones_por_insertar, lote)
+                insertar_por_lotes(sesion, Nomina, nominas_por_insertar, lote)
+                sesion.commit()
+            nominas_por_insertar = []
+            percepciones_deducciones_por_insertar = []
+
+    # Insertar y hacer commit de lo que quede del ultimo lote
+    if probar is False and len(nominas_por_insertar) > 0:
+        insertar_por_lotes(sesion, PercepcionDeduccion, percepciones_deducciones_por_insertar, lote)
+        insertar_por_lotes(sesion, Nomina, nominas_por_insertar, lote)
+        sesion.commit()
+    segundos = time.perf_counter() - inicio
+
     # Poner avance de linea
     click.echo("")
 
@@ -1900,9 +1470,10 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
         click.echo(click.style("ERROR: No se alimentaron registros en nominas.", fg="red"))
         sys.exit(1)
 
-    # Actualizar la quincena para poner en verdadero el campo tiene_apoyos_anuales
-    quincena.tiene_primas = True
-    quincena.save()
+    # Actualizar la quincena para poner en verdadero el campo tiene_primas
+    if probar is False:
+        quincena.tiene_primas = True
+        quincena.save()
 
     # Si hubo centros_trabajos_inexistentes, mostrarlos
     if len(centros_trabajos_inexistentes) > 0:
@@ -1924,10 +1495,12 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
         click.echo(click.style(f"  Hubo {len(nominas_existentes)} Primas que ya existen. Se omiten:", fg="yellow"))
         click.echo(click.style(f"  {', '.join(nominas_existentes)}", fg="yellow"))
 
-    # Mensaje termino
+    # Mensaje termino, con las filas por segundo
+    filas_por_segundo = contador / segundos if segundos > 0 else 0
     click.echo(
         click.style(f"  Alimentar Primas Vacacionales: {contador} insertadas en la quincena {quincena_clave}.", fg="green")
     )
+    click.echo(click.style(f"  {segundos:.1f} segundos, {filas_por_segundo:.0f} filas por segundo.", fg="green"))
 
 
 @click.command()
@@ -1937,6 +1510,8 @@ def alimentar_primas_vacacionales(quincena_clave: str, fecha_pago_str: str, prob
 def generar_issste(quincena_clave, serica_xlsx, output_txt):
     """Generar archivo XLSX con los datos para el ISSSTE"""
 
+    from openpyxl import load_workbook
+
     # Validar si existe el archivo
     ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, serica_xlsx)
     if not ruta.exists():
@@ -1989,6 +1564,8 @@ def generar_issste(quincena_clave, serica_xlsx, output_txt):
 def crear_archivo_xlsx_dispersiones_pensionados(quincena_clave):
     """Crear archivo XLSX con las dispersiones para pensionados"""
 
+    from perseo.blueprints.nominas.generators.dispersiones_pensionados import crear_dispersiones_pensionados
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2026,6 +1603,8 @@ def crear_archivo_xlsx_dispersiones_pensionados(quincena_clave):
 def crear_archivo_xlsx_monederos(quincena_clave):
     """Crear archivo XLSX con los monederos de una quincena"""
 
+    from perseo.blueprints.nominas.generators.monederos import crear_monederos
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2063,6 +1642,8 @@ def crear_archivo_xlsx_monederos(quincena_clave):
 def crear_archivo_xlsx_nominas(quincena_clave):
     """Crear archivo XLSX con las nominas de una quincena"""
 
+    from perseo.blueprints.nominas.generators.nominas import crear_nominas
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2100,6 +1681,8 @@ def crear_archivo_xlsx_nominas(quincena_clave):
 def crear_archivo_xlsx_pensionados(quincena_clave):
     """Crear archivo XLSX con los pensionados de una quincena"""
 
+    from perseo.blueprints.nominas.generators.pensionados import crear_pensionados
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2137,6 +1720,8 @@ def crear_archivo_xlsx_pensionados(quincena_clave):
 def crear_archivo_xlsx_primas_vacacionales(quincena_clave):
     """Crear archivo XLSX con las primas vacacionales de una quincena"""
 
+    from perseo.blueprints.nominas.generators.primas_vacacionales import crear_primas_vacacionales
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2174,6 +1759,8 @@ def crear_archivo_xlsx_primas_vacacionales(quincena_clave):
 def crear_archivo_xlsx_timbrados_empleados_activos(quincena_clave):
     """Crear archivo XLSX con los timbrados de los empleados activos"""
 
+    from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2215,6 +1802,8 @@ def crear_archivo_xlsx_timbrados_empleados_activos(quincena_clave):
 def crear_archivo_xlsx_timbrados_pensionados(quincena_clave):
     """Crear archivo XLSX con los timbrados de los pensionados"""
 
+    from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -2256,6 +1845,8 @@ def crear_archivo_xlsx_timbrados_pensionados(quincena_clave):
 def crear_archivo_xlsx_timbrados_primas_vacacionales(quincena_clave):
     """Crear archivo XLSX con los timbrados de las primas vacacionales"""
 
+    from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
+
     # Validar quincena_clave
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo(click.style("ERROR: Clave de la quincena inválida.", fg="red"))
@@ -9,11 +9,11 @@ import sys
 from pathlib import Path
 
 import click
-import xlrd
 
+from lib.exceptions import MyAnyError
+from lib.explotacion import buscar_archivo_explotacion, leer_explotacion
 from lib.fechas import quincena_to_fecha, quinquenio_count
 from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_rfc, safe_string
-from perseo.app import create_app
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.conceptos_productos.models import ConceptoProducto
@@ -33,10 +33,6 @@ AGUINALDOS_FILENAME_XLS = "Aguinaldos.XLS"
 APOYOS_FILENAME_XLS = "Apoyos.XLS"
 NOMINAS_FILENAME_XLS = "NominaFmt2.XLS"
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -73,11 +69,11 @@ def alimentar(quincena_clave: str, tipo: str):
         click.echo("ERROR: Variable de entorno EXPLOTACION_BASE_DIR no definida.")
         sys.exit(1)
 
-    # Si el tipo es AGUINALDO, se usara el archivo AGUINALDOS_FILENAME_XLS
+    # Si el tipo es AGUINALDO, se usara el archivo AGUINALDOS_FILENAME_XLS, en XLS o con los mismos datos en XLSX o CSV
     if tipo == "AGUINALDO":
-        ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, AGUINALDOS_FILENAME_XLS)
+        ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), AGUINALDOS_FILENAME_XLS)
     else:
-        ruta = Path(EXPLOTACION_BASE_DIR, quincena_clave, NOMINAS_FILENAME_XLS)
+        ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), NOMINAS_FILENAME_XLS)
 
     # Validar si existe el archivo
     if not ruta.exists():
@@ -106,11 +102,12 @@ def alimentar(quincena_clave: str, tipo: str):
         sesion.add(quincena)
         sesion.commit()
 
-    # Abrir el archivo XLS con xlrd
-    libro = xlrd.open_workbook(str(ruta))
-
-    # Obtener la primera hoja
-    hoja = libro.sheet_by_index(0)
+    # Leer el archivo de explotacion, una sola vez, en registros ya convertidos
+    try:
+        registros = list(leer_explotacion(ruta))
+    except MyAnyError as error:
+        click.echo(f"ERROR: {str(error)}")
+        sys.exit(1)
 
     # Iniciar listado de conceptos que no existen
     conceptos_no_existentes = []
@@ -141,21 +138,21 @@ def alimentar(quincena_clave: str, tipo: str):
 
     # Bucle por cada fila
     click.echo(f"Alimentando Percepciones-Deducciones a la quincena {quincena.clave}: ", nl=False)
-    for fila in range(1, hoja.nrows):
+    for registro in registros:
         # Tomar las columnas
-        centro_trabajo_clave = hoja.cell_value(fila, 1)
-        plaza_clave = hoja.cell_value(fila, 8)
+        centro_trabajo_clave = registro.centro_trabajo_clave
+        plaza_clave = registro.plaza_clave
 
         # Tomar las columnas con datos de la Persona
-        rfc = hoja.cell_value(fila, 2)
-        modelo = int(hoja.cell_value(fila, 236))
-        nombre_completo = hoja.cell_value(fila, 3)
-        num_empleado = int(hoja.cell_value(fila, 240))
+        rfc = registro.rfc
+        modelo = registro.modelo
+        nombre_completo = registro.nombre_completo
+        num_empleado = registro.num_empleado
 
         # Tomar las columnas necesarias para el timbrado
-        puesto_clave = safe_clave(hoja.cell_value(fila, 20))
-        nivel = int(hoja.cell_value(fila, 9))
-        quincena_ingreso = str(int(hoja.cell_value(fila, 19)))
+        puesto_clave = registro.puesto_clave
+        nivel = registro.nivel
+        quincena_ingreso = registro.quincena_ingreso
 
         # Consultar el Centro de Trabajo, si no existe se agrega
         centro_trabajo = CentroTrabajo.query.filter_by(clave=centro_trabajo_clave).first()
@@ -174,46 +171,11 @@ def alimentar(quincena_clave: str, tipo: str):
             plazas_insertadas_contador += 1
 
         # Si el modelo es 2, entonces en SINDICALIZADO y se toman 4 caracteres del puesto
-        quinquenios = None
         if modelo == 2:
             puesto_clave = puesto_clave[:4]
 
-            # Inicializar la bandera para saltar la fila si el concepto es PME
-            es_concepto_pme = False
-
-            # Bucle entre las columnas de los conceptos para encontrar PQ1, PQ2, PQ3, PQ4, PQ5, PQ6
-            col_num = 26
-            while True:
-                # Tomar el p_o_d
-                p_o_d = safe_string(hoja.cell_value(fila, col_num))
-                # Tomar el conc
-                conc = safe_string(hoja.cell_value(fila, col_num + 1))
-                # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-                if p_o_d == "":
-                    break
-                # Si NO es P, se salta
-                if p_o_d != "P":
-                    col_num += 6
-                    continue
-                # Si conc es ME es monedero, se rompe el ciclo porque aqui no hay quinquenios
-                if conc == "ME":
-                    es_concepto_pme = True
-                    break
-                # Si el concepto no es PQ1, PQ2, PQ3, PQ4, PQ5, PQ6, se salta
-                if conc not in ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6"]:
-                    col_num += 6
-                    continue
-                # Tomar el tercer caracter del concepto y convertirlo a entero porque es la cantidad de quinquenios
-                quinquenios = int(conc[1])
-                break
-
-            # Si es PME, entonces en esta fila NO esta el quinquenio, se mantiene en None
-            if es_concepto_pme:
-                quinquenios = None
-
-        else:
-            # Entonces NO es SINDICALIZADO, se define quinquenios en cero
-            quinquenios = 0
+        # Tomar los quinquenios de PQ1 a PQ6, cero si NO es SINDICALIZADO, None si la fila es PME
+        quinquenios = registro.quinquenios
 
         # Consultar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
         puesto = Puesto.query.filter_by(clave=puesto_clave).first()
@@ -318,28 +280,13 @@ def alimentar(quincena_clave: str, tipo: str):
                 persona.save()
                 personas_actualizadas_contador += 1
 
-        # Buscar percepciones y deducciones
+        # Bucle por las percepciones y deducciones
         percepciones_deducciones_agregadas_contador = 0
-        col_num = 26
-        while True:
-            # Tomar 'P' o 'D', primero
-            p_o_d = safe_string(hoja.cell_value(fila, col_num))
-
-            # Si 'P' o 'D' es un texto vacio, se rompe el ciclo
-            if p_o_d == "":
-                break
-
-            # Tomar los dos caracteres adicionales del concepto
-            conc = safe_string(hoja.cell_value(fila, col_num + 1))
-
-            # Tomar el importe
-            try:
-                impt = int(hoja.cell_value(fila, col_num + 3)) / 100.0
-            except ValueError:
-                impt = 0.0
+        for concepto_explotacion in registro.conceptos:
+            impt = concepto_explotacion.importe
 
             # Revisar si el Concepto existe, de lo contrario se agrega
-            concepto_clave = f"{p_o_d}{conc}"
+            concepto_clave = concepto_explotacion.clave
             concepto = Concepto.query.filter_by(clave=concepto_clave).first()
             if concepto is None and concepto_clave not in conceptos_no_existentes:
                 conceptos_no_existentes.append(concepto_clave)
@@ -360,13 +307,6 @@ def alimentar(quincena_clave: str, tipo: str):
             sesion.add(percepcion_deduccion)
             percepciones_deducciones_agregadas_contador += 1
 
-            # Incrementar col_num en SEIS
-            col_num += 6
-
-            # Romper el ciclo cuando se llega a la columna
-            if col_num > 236:
-                break
-
         # Incrementar contador
         contador += 1
 
@@ -429,6 +369,8 @@ def alimentar(quincena_clave: str, tipo: str):
 def alimentar_apoyos_anuales(quincena_clave: str):
     """Alimentar percepciones-deducciones para apoyos anuales"""
 
+    import xlrd
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida.")
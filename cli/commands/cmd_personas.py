@@ -10,19 +10,14 @@ from datetime import datetime
 from pathlib import Path
 
 import click
-import requests
-import xlrd
 from dotenv import load_dotenv
 
 from lib.exceptions import MyAnyError
 from lib.fechas import quincena_to_fecha
 from lib.safe_string import QUINCENA_REGEXP, safe_clave, safe_curp, safe_rfc, safe_string
-from perseo.app import create_app
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.personas.models import Persona
-from perseo.blueprints.personas.tasks import actualizar_ultimos_xlsx as task_actualizar_ultimos
-from perseo.blueprints.personas.tasks import exportar_xlsx as task_exportar_xlsx
 from perseo.blueprints.plazas.models import Plaza
 from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.quincenas.models import Quincena
@@ -39,10 +34,6 @@ RRHH_PERSONAL_URL = os.getenv("RRHH_PERSONAL_URL", "")
 RRHH_PERSONAL_API_KEY = os.getenv("RRHH_PERSONAL_API_KEY", "")
 TIMEOUT = 12
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 @click.group()
 def cli():
@@ -54,6 +45,8 @@ def cli():
 def actualizar_datos_fiscales(quincena_clave: str):
     """Actualizar los CURPs, CP fiscal y las fechas de ingreso de las personas a partir de los archivos de explotacion de una quincena"""
 
+    import xlrd
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida")
@@ -412,6 +405,8 @@ def actualizar_nuevas_columnas(personas_csv: str):
 def actualizar_tabuladores(quincena_clave: str):
     """Actualizar los tabuladores de las personas a partir de los archivos de explotacion de una quincena"""
 
+    import xlrd
+
     # Validar quincena
     if re.match(QUINCENA_REGEXP, quincena_clave) is None:
         click.echo("ERROR: Quincena inválida")
@@ -614,6 +609,8 @@ def actualizar_tabuladores(quincena_clave: str):
 def actualizar_ultimos_xlsx():
     """Actualizar el último centro de trabajo, plaza y puesto de las Personas a partir de la última nomina"""
 
+    from perseo.blueprints.personas.tasks import actualizar_ultimos_xlsx as task_actualizar_ultimos
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_actualizar_ultimos()
@@ -717,6 +714,8 @@ def cambiar_tabulador_a_todos(tabulador_id: int):
 def exportar_xlsx():
     """Exportar Personas a un archivo XLSX"""
 
+    from perseo.blueprints.personas.tasks import exportar_xlsx as task_exportar_xlsx
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_exportar_xlsx()
@@ -826,6 +825,9 @@ def migrar_eliminar_rfc(rfc_origen: str, rfc_destino: str, eliminar: bool):
 @click.command()
 def sincronizar_con_rrhh_personal():
     """Sincronizar las Personas consultando la API de RRHH Personal"""
+
+    import requests
+
     click.echo("Sincronizando Personas...")
 
     # Validar que se haya definido RRHH_PERSONAL_URL
@@ -7,11 +7,6 @@ import sys
 import click
 
 from lib.exceptions import MyAnyError
-from perseo.app import create_app
-from perseo.blueprints.plazas.tasks import exportar_xlsx
-
-app = create_app()
-app.app_context().push()
 
 
 @click.group()
@@ -23,6 +18,8 @@ def cli():
 def exportar():
     """Exportar Plazas a un archivo XLSX"""
 
+    from perseo.blueprints.plazas.tasks import exportar_xlsx
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = exportar_xlsx()
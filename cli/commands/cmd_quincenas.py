@@ -7,7 +7,6 @@ import sys
 import click
 
 from lib.exceptions import MyAnyError
-from perseo.blueprints.quincenas.tasks import cerrar as task_cerrar
 
 
 @click.group()
@@ -19,6 +18,8 @@ def cli():
 def cerrar():
     """Lanzar cerrar TODAS las quincenas con estado ABIERTA"""
 
+    from perseo.blueprints.quincenas.tasks import cerrar as task_cerrar
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_cerrar()
@@ -11,16 +11,11 @@ import click
 
 from lib.exceptions import MyAnyError
 from lib.safe_string import safe_clave
-from perseo.app import create_app
 from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.tabuladores.models import Tabulador
-from perseo.blueprints.tabuladores.tasks import exportar_xlsx as task_exportar_xlsx
 
 TABULADORES_CSV = "seed/tabuladores-NNN.csv"
 
-app = create_app()
-app.app_context().push()
-
 
 @click.group()
 def cli():
@@ -289,6 +284,8 @@ def agregar_actualizar(tabuladores_csv: str):
 def exportar_xlsx():
     """Exportar Tabuladores a un archivo XLSX"""
 
+    from perseo.blueprints.tabuladores.tasks import exportar_xlsx as task_exportar_xlsx
+
     # Ejecutar la tarea
     try:
         mensaje_termino, _, _ = task_exportar_xlsx()
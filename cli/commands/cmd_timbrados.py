@@ -5,18 +5,19 @@ CLI Timbrados
 import os
 import re
 import sys
+import time
 import xml.etree.ElementTree as ET
-from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import click
 from dotenv import load_dotenv
 
+from lib.cfdi_extractor import extraer_cfdi
+from lib.cfdi_manifiesto import SUBIDA_ERROR, SUBIDA_SIN_DEPOSITO, SUBIDA_SUBIDO, ManifiestoCFDI
 from lib.exceptions import MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError
-from lib.google_cloud_storage import check_file_exists_from_gcs, get_public_url_from_gcs, upload_file_to_gcs
 from lib.safe_string import QUINCENA_REGEXP, safe_string
-from perseo.app import create_app
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.quincenas.models import Quincena
@@ -24,9 +25,6 @@ from perseo.blueprints.timbrados.models import Timbrado
 from perseo.extensions import database
 
 CARPETA = "timbrados"
-XML_TAG_CFD_PREFIX = "{http://www.sat.gob.mx/cfd/4}"
-XML_TAG_TFD_PREFIX = "{http://www.sat.gob.mx/TimbreFiscalDigital}"
-XML_TAG_NOMINA_PREFIX = "{http://www.sat.gob.mx/nomina12}"
 
 load_dotenv()
 
@@ -35,10 +33,35 @@ CFDI_EMISOR_NOMBRE = os.getenv("CFDI_EMISOR_NOMBRE", "")
 CFDI_EMISOR_REGFIS = os.getenv("CFDI_EMISOR_REGFIS", "")
 CLOUD_STORAGE_DEPOSITO = os.getenv("CLOUD_STORAGE_DEPOSITO", "")
 TIMBRADOS_BASE_DIR = os.getenv("TIMBRADOS_BASE_DIR", "")
+LOTE_CONFIRMAR = 100
 
-app = create_app()
-app.app_context().push()
-database.app = app
+
+def subir_archivo_gcs(blob_nombre: str, ruta: Path, content_type: str) -> tuple[str, bool]:
+    """Subir el archivo al deposito GCS si no existe, entrega la URL y si se subio; corre en los hilos, sin base de datos"""
+
+    from lib.google_cloud_storage import get_file_status_from_gcs, upload_file_to_gcs
+
+    # Consultar con una sola peticion si existe el archivo en el deposito GCS y su URL
+    existe, url = get_file_status_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre)
+    if existe:
+        return url, False
+
+    # Si NO existe el archivo, causa error
+    if not ruta.is_file():
+        raise MyFileNotFoundError
+
+    # Cargar el contenido del archivo
+    with open(ruta, "rb") as f:
+        data = f.read()
+
+    # Subir el archivo
+    url = upload_file_to_gcs(
+        bucket_name=CLOUD_STORAGE_DEPOSITO,
+        blob_name=blob_nombre,
+        content_type=content_type,
+        data=data,
+    )
+    return url, True
 
 
 @click.group()
@@ -52,7 +75,17 @@ def cli():
 @click.option("--poner_en_ceros", is_flag=True, default=False, help="Poner en ceros el campo timbrado_id")
 @click.option("--sobreescribir", is_flag=True, default=False, help="Sin importar el valor de timbrado_id")
 @click.option("--subdir", type=str, default=None)
-def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescribir: bool, subdir: str):
+@click.option("--workers", type=int, default=1, help="Cantidad de hilos para subir los archivos al deposito GCS")
+@click.option("--procesos", type=int, default=1, help="Cantidad de procesos para leer los archivos XML")
+def actualizar(
+    quincena_clave: str,
+    tipo: str,
+    poner_en_ceros: bool,
+    sobreescribir: bool,
+    subdir: str,
+    workers: int,
+    procesos: int,
+):
     """Actualizar los timbrados de una quincena a partir de archivos XML y PDF"""
 
     # Validar el directorio donde espera encontrar los archivos de explotacion
@@ -136,16 +169,169 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
     errores_xml = 0
     procesados_contador = 0
 
+    por_confirmar_contador = 0
+
+    # Iniciar los hilos para subir los archivos al deposito GCS, con un trabajador se termina cada archivo antes del siguiente
+    ejecutor = ThreadPoolExecutor(max_workers=max(workers, 1))
+    pendientes = deque()
+    pendientes_maximo = 0 if workers <= 1 else workers * 4
+    nominas_reservadas = set()
+
+    def terminar_timbrado(pendiente: dict):
+        """Esperar las subidas de los archivos XML y PDF y guardar en el hilo principal el timbrado"""
+        nonlocal actualizados_contador, agregados_contador, errores_cargas_xml_contador, errores_cargas_pdf_contador
+        nonlocal por_confirmar_contador, procesados_contador
+
+        # Tomar los datos del pendiente
+        timbrado = pendiente["timbrado"]
+        nomina = pendiente["nomina"]
+        hay_cambios = pendiente["hay_cambios"]
+
+        # Definir valores por defecto
+        archivo_xml = timbrado.archivo_xml
+        url_xml = timbrado.url_xml
+        archivo_pdf = timbrado.archivo_pdf
+        url_pdf = timbrado.url_pdf
+        hubo_errores_subidas = False
+
+        # Si se mando subir el archivo XML, esperar el resultado para contar los errores
+        if pendiente["subida_xml"] is not None:
+            try:
+                archivo_xml = pendiente["archivo_xml"]
+                url_xml, se_subio = pendiente["subida_xml"].result()
+                if se_subio:
+                    click.echo(click.style("(XML)", fg="green"), nl=False)
+            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
+                archivo_xml = ""
+                url_xml = ""
+                errores_cargas_xml_contador += 1
+                hubo_errores_subidas = True
+                click.echo(click.style("(XML)", fg="red"), nl=False)
+
+        # Si se mando subir el archivo PDF, esperar el resultado para contar los errores
+        if pendiente["subida_pdf"] is not None:
+            try:
+                archivo_pdf = pendiente["archivo_pdf"]
+                url_pdf, se_subio = pendiente["subida_pdf"].result()
+                if se_subio:
+                    click.echo(click.style("(PDF)", fg="green"), nl=False)
+            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
+                archivo_pdf = ""
+                url_pdf = ""
+                errores_cargas_pdf_contador += 1
+                hubo_errores_subidas = True
+                click.echo(click.style("(PDF)", fg="red"), nl=False)
+
+        # Si archivo_xml es diferente
+        if timbrado.archivo_xml != archivo_xml:
+            timbrado.archivo_xml = archivo_xml
+            hay_cambios = True
+
+        # Si url_xml es diferente
+        if timbrado.url_xml != url_xml:
+            timbrado.url_xml = url_xml
+            hay_cambios = True
+
+        # Si archivo_pdf es diferente
+        if timbrado.archivo_pdf != archivo_pdf:
+            timbrado.archivo_pdf = archivo_pdf
+            hay_cambios = True
+
+        # Si url_pdf es diferente
+        if timbrado.url_pdf != url_pdf:
+            timbrado.url_pdf = url_pdf
+            hay_cambios = True
+
+        # Si hay_cambios
+        if hay_cambios:
+            # Cargar el contenido XML
+            with open(pendiente["ruta_xml"], "r", encoding="utf8") as f:
+                timbrado.tfd = f.read()
+
+            # Si es nuevo, relacionar el timbrado con la nomina
+            if pendiente["es_nuevo"]:
+                timbrado.nomina = nomina
+
+            # Agregar timbrado, mandarlo a la base de datos para tener su ID
+            database.session.add(timbrado)
+            database.session.flush()
+
+            # Actualizar nomina con el ID del timbrado
+            nomina.timbrado_id = timbrado.id
+
+            # Confirmar los cambios por lotes
+            por_confirmar_contador += 1
+            if por_confirmar_contador >= LOTE_CONFIRMAR:
+                database.session.commit()
+                manifiesto.guardar()
+                por_confirmar_contador = 0
+
+            # Si es_nuevo, incrementar agregados_contador
+            if pendiente["es_nuevo"]:
+                agregados_contador += 1
+                click.echo(click.style("+", fg="green"), nl=False)
+            else:
+                actualizados_contador += 1
+                click.echo(click.style("u", fg="cyan"), nl=False)
+
+        # Liberar la nomina reservada
+        nominas_reservadas.discard(nomina.id)
+
+        # Agregar al manifiesto con el resultado de las subidas, se escribe despues de confirmar los cambios
+        if hubo_errores_subidas:
+            subida = SUBIDA_ERROR
+        elif pendiente["subida_xml"] is None:
+            subida = SUBIDA_SIN_DEPOSITO
+        else:
+            subida = SUBIDA_SUBIDO
+        manifiesto.marcar_terminado(pendiente["ruta_xml"], pendiente["tfd_uuid"], nomina.id, subida)
+
+        # Incrementar procesados_contador
+        procesados_contador += 1
+
+        # Mostrar un punto en la terminal
+        if not hay_cambios:
+            click.echo(click.style("-", fg="yellow"), nl=False)
+
+    # Cargar el manifiesto con los archivos XML ya terminados, se ignora si se pide sobreescribir o poner en ceros
+    manifiesto = ManifiestoCFDI(timbrados_dir)
+    if sobreescribir or poner_en_ceros:
+        manifiesto.archivos = {}
+
+    # Consultar de una sola vez las nominas de la quincena y del tipo que tienen timbrado, con el UUID de su timbrado
+    vinculados = set(
+        database.session.query(Nomina.id, Timbrado.tfd_uuid)
+        .join(Quincena, Nomina.quincena_id == Quincena.id)
+        .join(Timbrado, Nomina.timbrado_id == Timbrado.id)
+        .filter(Quincena.clave == quincena_clave)
+        .filter(Nomina.tipo == tipo)
+        .filter(Nomina.estatus == "A")
+        .all()
+    )
+
+    # Tomar los archivos con extension xml que sean nuevos, hayan cambiado o cuya nomina ya no tenga su timbrado
+    rutas_xml = []
+    omitidos_contador = 0
+    for ruta_xml in timbrados_dir.glob("*.xml"):
+        if manifiesto.esta_terminado(ruta_xml, CLOUD_STORAGE_DEPOSITO != "", vinculados):
+            omitidos_contador += 1
+        else:
+            rutas_xml.append(ruta_xml)
+
+    # Extraer los datos de los archivos XML, con varios procesos se leen todos antes de empezar
+    if procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos) as ejecutor_procesos:
+            cfdis = list(ejecutor_procesos.map(extraer_cfdi, rutas_xml, chunksize=32))
+    else:
+        cfdis = map(extraer_cfdi, rutas_xml)
+
     # Recorrer los archivos con extension xml
     click.echo(f"Actualizar los timbrados de las nominas {quincena_clave} y {tipo}: ", nl=False)
-    for archivo in timbrados_dir.glob("*.xml"):
+    for ruta_xml, cfdi in zip(rutas_xml, cfdis):
         # Obtener el nombre del archivo
-        archivo_nombre = archivo.name
+        archivo_nombre = ruta_xml.name
         # click.echo(f"  {archivo_nombre}")
 
-        # Definir ruta al archivo XML
-        ruta_xml = Path(timbrados_dir, archivo_nombre)
-
         # Definir ruta al archivo PDF
         ruta_pdf = Path(timbrados_dir, archivo_nombre.replace(".xml", ".pdf"))
 
@@ -157,10 +343,6 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
         # Obtener el RFC que esta en los primeros 13 caracteres del nombre del archivo
         rfc_en_nombre = archivo_nombre[:13]
 
-        # Parsear el archivo XML
-        tree = ET.parse(ruta_xml)
-        root = tree.getroot()
-
         # Estructura del CFDI version 4.0
         # - cfdi:Comprobante [xmlns:xsi, xmlns:nomina12, xmlns:cfdi, Version, Serie, Folio, Fecha, SubTotal, Descuento, Moneda,
         #     Total, TipoDeComprobante, Exportacion, MetodoPago, LugarExpedicion, Sello, Certificado, NoCertificado]
@@ -184,126 +366,31 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
         #       - nomina12:OtrosPagos
         #         - nomina12:OtroPago [TipoOtroPago, Clave, Concepto, Importe]
 
-        # Validar que el tag raiz sea cfdi:Comprobante
-        if root.tag != f"{XML_TAG_CFD_PREFIX}Comprobante":
+        # Si la raiz del archivo XML no es cfdi:Comprobante o esta mal formado se cuenta el error
+        if cfdi is None:
             errores_xml += 1
             continue
 
-        # Obtener datos de cfdi:Comprobante
-        # cfdi_comprobante_version = None
-        # if "Version" in root.attrib:
-        #     cfdi_comprobante_version = root.attrib["Version"]
-        # click.echo(click.style(f"    Version: {cfdi_comprobante_version}", fg="green"))
-        # cfdi_comprobante_serie = None
-        # if "Serie" in root.attrib:
-        #     cfdi_comprobante_serie = root.attrib["Serie"]
-        # click.echo(click.style(f"    Serie: {cfdi_comprobante_serie}", fg="green"))
-        # cfdi_comprobante_folio = None
-        # if "Folio" in root.attrib:
-        #     cfdi_comprobante_folio = root.attrib["Folio"]
-        # click.echo(click.style(f"    Folio: {cfdi_comprobante_folio}", fg="green"))
-        # cfdi_comprobante_fecha = None
-        # if "Fecha" in root.attrib:
-        #     cfdi_comprobante_fecha = root.attrib["Fecha"]
-        # click.echo(click.style(f"    Fecha: {cfdi_comprobante_fecha}", fg="green"))
-
-        # Inicializar variables de los datos que se van a obtener
-        cfdi_emisor_rfc = None  # cfdi:Emisor [Rfc]
-        cfdi_emisor_nombre = None  # cfdi:Emisor [Nombre]
-        cfdi_emisor_regimen_fiscal = None  # cfdi:Emisor [RegimenFiscal]
-        cfdi_receptor_rfc = None  # cfdi:Receptor [Rfc]
-        cfdi_receptor_nombre = None  # cfdi:Receptor [Nombre]
-        tfd_version = None  # tfd:TimbreFiscalDigital [Version]
-        tfd_uuid = None  # tfd:TimbreFiscalDigital [UUID]
-        tfd_fecha_timbrado = None  # tfd:TimbreFiscalDigital [FechaTimbrado]
-        tfd_sello_cfd = None  # tfd:TimbreFiscalDigital [SelloCFD]
-        tfd_num_cert_sat = None  # tfd:TimbreFiscalDigital [NoCertificadoSAT]
-        tfd_sello_sat = None  # tfd:TimbreFiscalDigital [SelloSAT]
-        nomina12_nomina_version = None  # nomina12:Nomina [Version]
-        nomina12_nomina_tipo_nomina = None  # nomina12:Nomina [TipoNomina]
-        nomina12_nomina_fecha_pago = None  # nomina12:Nomina [FechaPago]
-        nomina12_nomina_fecha_inicial_pago = None  # nomina12:Nomina [FechaInicialPago]
-        nomina12_nomina_fecha_final_pago = None  # nomina12:Nomina [FechaFinalPago]
-        nomina12_nomina_total_percepciones = None  # nomina12:Nomina [TotalPercepciones]
-        nomina12_nomina_total_deducciones = None  # nomina12:Nomina [TotalDeducciones]
-        nomina12_nomina_total_otros_pagos = None  # nomina12:Nomina [TotalOtrosPagos]
-
-        # Bucle por los elementos de root
-        for element in root.iter():
-            # Mostrar el tag
-            # click.echo(click.style(f"    {element.tag}", fg="blue"))
-
-            # Obtener datos de Emisor
-            if element.tag == f"{XML_TAG_CFD_PREFIX}Emisor":
-                if "Rfc" in element.attrib:
-                    cfdi_emisor_rfc = element.attrib["Rfc"]
-                if "Nombre" in element.attrib:
-                    cfdi_emisor_nombre = element.attrib["Nombre"]
-                if "RegimenFiscal" in element.attrib:
-                    cfdi_emisor_regimen_fiscal = element.attrib["RegimenFiscal"]
-
-            # Obtener datos de Receptor
-            if element.tag == f"{XML_TAG_CFD_PREFIX}Receptor":
-                if "Rfc" in element.attrib:
-                    cfdi_receptor_rfc = element.attrib["Rfc"]
-                if "Nombre" in element.attrib:
-                    cfdi_receptor_nombre = element.attrib["Nombre"]
-
-            # Obtener datos de TimbreFiscalDigital
-            if element.tag == f"{XML_TAG_TFD_PREFIX}TimbreFiscalDigital":
-                if "Version" in element.attrib:
-                    tfd_version = element.attrib["Version"]
-                if "UUID" in element.attrib:
-                    tfd_uuid = element.attrib["UUID"]
-                if "FechaTimbrado" in element.attrib:
-                    tfd_fecha_timbrado = element.attrib["FechaTimbrado"]
-                if "SelloCFD" in element.attrib:
-                    tfd_sello_cfd = element.attrib["SelloCFD"]
-                if "NoCertificadoSAT" in element.attrib:
-                    tfd_num_cert_sat = element.attrib["NoCertificadoSAT"]
-                if "SelloSAT" in element.attrib:
-                    tfd_sello_sat = element.attrib["SelloSAT"]
-
-            # Obtener datos de Nomina
-            if element.tag == f"{XML_TAG_NOMINA_PREFIX}Nomina":
-                if "Version" in element.attrib:
-                    nomina12_nomina_version = element.attrib["Version"]
-                if "TipoNomina" in element.attrib:
-                    nomina12_nomina_tipo_nomina = element.attrib["TipoNomina"]
-                if "FechaPago" in element.attrib:
-                    try:
-                        nomina12_nomina_fecha_pago = datetime.strptime(element.attrib["FechaPago"], "%Y-%m-%d").date()
-                    except ValueError:
-                        nomina12_nomina_fecha_pago = None
-                if "FechaInicialPago" in element.attrib:
-                    try:
-                        nomina12_nomina_fecha_inicial_pago = datetime.strptime(
-                            element.attrib["FechaInicialPago"], "%Y-%m-%d"
-                        ).date()
-                    except ValueError:
-                        nomina12_nomina_fecha_inicial_pago = None
-                if "FechaFinalPago" in element.attrib:
-                    try:
-                        nomina12_nomina_fecha_final_pago = datetime.strptime(
-                            element.attrib["FechaFinalPago"], "%Y-%m-%d"
-                        ).date()
-                    except ValueError:
-                        nomina12_nomina_fecha_final_pago = None
-                if "TotalPercepciones" in element.attrib:
-                    try:
-                        nomina12_nomina_total_percepciones = Decimal(format(float(element.attrib["TotalPercepciones"]), ".4f"))
-                    except InvalidOperation:
-                        nomina12_nomina_total_percepciones = None
-                if "TotalDeducciones" in element.attrib:
-                    try:
-                        nomina12_nomina_total_deducciones = Decimal(format(float(element.attrib["TotalDeducciones"]), ".4f"))
-                    except InvalidOperation:
-                        nomina12_nomina_total_deducciones = None
-                if "TotalOtrosPagos" in element.attrib:
-                    try:
-                        nomina12_nomina_total_otros_pagos = Decimal(format(float(element.attrib["TotalOtrosPagos"]), ".4f"))
-                    except InvalidOperation:
-                        nomina12_nomina_total_otros_pagos = None
+        # Tomar los datos que se van a comparar con el Timbrado
+        cfdi_emisor_rfc = cfdi.cfdi_emisor_rfc
+        cfdi_emisor_nombre = cfdi.cfdi_emisor_nombre
+        cfdi_emisor_regimen_fiscal = cfdi.cfdi_emisor_regimen_fiscal
+        cfdi_receptor_rfc = cfdi.cfdi_receptor_rfc
+        cfdi_receptor_nombre = cfdi.cfdi_receptor_nombre
+        tfd_version = cfdi.tfd_version
+        tfd_uuid = cfdi.tfd_uuid
+        tfd_fecha_timbrado = cfdi.tfd_fecha_timbrado
+        tfd_sello_cfd = cfdi.tfd_sello_cfd
+        tfd_num_cert_sat = cfdi.tfd_num_cert_sat
+        tfd_sello_sat = cfdi.tfd_sello_sat
+        nomina12_nomina_version = cfdi.nomina12_nomina_version
+        nomina12_nomina_tipo_nomina = cfdi.nomina12_nomina_tipo_nomina
+        nomina12_nomina_fecha_pago = cfdi.nomina12_nomina_fecha_pago
+        nomina12_nomina_fecha_inicial_pago = cfdi.nomina12_nomina_fecha_inicial_pago
+        nomina12_nomina_fecha_final_pago = cfdi.nomina12_nomina_fecha_final_pago
+        nomina12_nomina_total_percepciones = cfdi.nomina12_nomina_total_percepciones
+        nomina12_nomina_total_deducciones = cfdi.nomina12_nomina_total_deducciones
+        nomina12_nomina_total_otros_pagos = cfdi.nomina12_nomina_total_otros_pagos
 
         # Si NO se encontro el Receptor RFC, se agrega a la lista de errores y se omite
         if cfdi_receptor_rfc is None:
@@ -356,6 +443,10 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
         # Consultar las nominas, ordenar
         nominas = nominas.filter(Nomina.estatus == "A").order_by(Persona.rfc, Nomina.desde_clave).all()
 
+        # Si sobreescribir es falso, quitar las nominas reservadas por los timbrados pendientes de terminar
+        if sobreescribir is False:
+            nominas = [nomina_a_revisar for nomina_a_revisar in nominas if nomina_a_revisar.id not in nominas_reservadas]
+
         # Si NO se encuentra registro en Nomina
         if len(nominas) == 0:
             nomina_no_encontrada.append(cfdi_receptor_rfc)
@@ -389,10 +480,10 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
         # Puede existir el registro de Timbrado, consultar por el UUID
         timbrado = Timbrado.query.filter(Timbrado.tfd_uuid == tfd_uuid).first()
 
-        # Si NO existe el registro de Timbrado, se crea
+        # Si NO existe el registro de Timbrado, se crea, se relaciona con la nomina hasta que se guarde
         es_nuevo = False
         if timbrado is None:
-            timbrado = Timbrado(nomina=nomina, estado="TIMBRADO", archivo_pdf="", url_pdf="", archivo_xml="", url_xml="")
+            timbrado = Timbrado(estado="TIMBRADO", archivo_pdf="", url_pdf="", archivo_xml="", url_xml="")
             es_nuevo = True
             hay_cambios = True
 
@@ -526,131 +617,59 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
             timbrado.nomina12_nomina_total_otros_pagos = nomina12_nomina_total_otros_pagos
             hay_cambios = True
 
+        # Si la nomina no tiene este timbrado, por ejemplo porque se volvio a alimentar, hay que vincularla
+        if not es_nuevo and (nomina.timbrado_id != timbrado.id or timbrado.nomina_id != nomina.id):
+            timbrado.nomina = nomina
+            hay_cambios = True
+
         # Definir valores por defecto
         archivo_xml = timbrado.archivo_xml
-        url_xml = timbrado.url_xml
         archivo_pdf = timbrado.archivo_pdf
-        url_pdf = timbrado.url_pdf
+        subida_xml = None
+        subida_pdf = None
 
         # Si esta definido el deposito GCS
         if CLOUD_STORAGE_DEPOSITO != "":
-            # Bloque try-except para contar errores en subida de archivos XML
-            try:
-                # Definir el nombre de descarga del archivo XML
-                if archivo_sufijo == "":
-                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}.xml"
-                else:
-                    archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.xml"
-                # Definir la ruta del archivo XML en el deposito GCS
-                blob_nombre_xml = f"{CARPETA}/{directorio}/{tfd_uuid}.xml"
-                # Si existe el archivo XML en el deposito GCS
-                if check_file_exists_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_xml):
-                    # Obtener la URL del archivo XML
-                    url_xml = get_public_url_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_xml)
-                # De lo contrario, NO existe el archivo XML en el deposito GCS
-                else:
-                    # Si NO existe el archivo XML, causa error
-                    if not ruta_xml.is_file():
-                        raise MyFileNotFoundError
-                    # Cargar el contenido del archivo XML
-                    with open(ruta_xml, "r", encoding="utf8") as f:
-                        data_xml = f.read()
-                    # Subir el archivo XML
-                    url_xml = upload_file_to_gcs(
-                        bucket_name=CLOUD_STORAGE_DEPOSITO,
-                        blob_name=blob_nombre_xml,
-                        content_type="application/xml",
-                        data=data_xml,
-                    )
-                    click.echo(click.style("(XML)", fg="green"), nl=False)
-            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
-                archivo_xml = ""
-                url_xml = ""
-                errores_cargas_xml_contador += 1
-                click.echo(click.style("(XML)", fg="red"), nl=False)
-
-            # Bloque try-except para contar errores en subida de archivos PDF
-            try:
-                # Definir el nombre de descarga del archivo PDF
-                if archivo_sufijo == "":
-                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}.pdf"
-                else:
-                    archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.pdf"
-                # Definir la ruta del archivo PDF en el deposito GCS
-                blob_nombre_pdf = f"{CARPETA}/{directorio}/{tfd_uuid}.pdf"
-                # Si existe el archivo PDF en el deposito GCS
-                if check_file_exists_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_pdf):
-                    # Obtener la URL del archivo PDF
-                    url_pdf = get_public_url_from_gcs(CLOUD_STORAGE_DEPOSITO, blob_nombre_pdf)
-                # De lo contrario, NO existe el archivo PDF en el deposito GCS
-                else:
-                    # Si NO existe el archivo XML, causa error
-                    if not ruta_pdf.is_file():
-                        raise MyFileNotFoundError
-                    # Cargar el contenido del archivo PDF
-                    with open(ruta_pdf, "rb") as f:
-                        data_pdf = f.read()
-                    # Subir el archivo PDF
-                    url_pdf = upload_file_to_gcs(
-                        bucket_name=CLOUD_STORAGE_DEPOSITO,
-                        blob_name=blob_nombre_pdf,
-                        content_type="application/pdf",
-                        data=data_pdf,
-                    )
-                    click.echo(click.style("(PDF)", fg="green"), nl=False)
-            except (MyBucketNotFoundError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError):
-                archivo_pdf = ""
-                url_pdf = ""
-                errores_cargas_pdf_contador += 1
-                click.echo(click.style("(PDF)", fg="red"), nl=False)
-
-        # Si archivo_xml es diferente
-        if timbrado.archivo_xml != archivo_xml:
-            timbrado.archivo_xml = archivo_xml
-            hay_cambios = True
-
-        # Si url_xml es diferente
-        if timbrado.url_xml != url_xml:
-            timbrado.url_xml = url_xml
-            hay_cambios = True
-
-        # Si archivo_pdf es diferente
-        if timbrado.archivo_pdf != archivo_pdf:
-            timbrado.archivo_pdf = archivo_pdf
-            hay_cambios = True
-
-        # Si url_pdf es diferente
-        if timbrado.url_pdf != url_pdf:
-            timbrado.url_pdf = url_pdf
-            hay_cambios = True
-
-        # Si hay_cambios
-        if hay_cambios:
-            # Cargar el contenido XML
-            with open(ruta_xml, "r", encoding="utf8") as f:
-                timbrado.tfd = f.read()
-
-            # Guardar timbrado
-            timbrado.save()
-
-            # Actualizar nomina con el ID del timbrado
-            nomina.timbrado_id = timbrado.id
-            nomina.save()
-
-            # Si es_nuevo, incrementar agregados_contador
-            if es_nuevo:
-                agregados_contador += 1
-                click.echo(click.style("+", fg="green"), nl=False)
+            # Definir los nombres de descarga de los archivos XML y PDF
+            if archivo_sufijo == "":
+                archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}.xml"
+                archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}.pdf"
             else:
-                actualizados_contador += 1
-                click.echo(click.style("u", fg="cyan"), nl=False)
+                archivo_xml = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.xml"
+                archivo_pdf = f"{cfdi_receptor_rfc}-{quincena_clave}-{archivo_sufijo}.pdf"
+            # Subir en los hilos los archivos XML y PDF, las rutas en el deposito GCS usan el UUID
+            blob_nombre_xml = f"{CARPETA}/{directorio}/{tfd_uuid}.xml"
+            blob_nombre_pdf = f"{CARPETA}/{directorio}/{tfd_uuid}.pdf"
+            subida_xml = ejecutor.submit(subir_archivo_gcs, blob_nombre_xml, ruta_xml, "application/xml")
+            subida_pdf = ejecutor.submit(subir_archivo_gcs, blob_nombre_pdf, ruta_pdf, "application/pdf")
+
+        # Reservar la nomina para que otro archivo XML no la tome mientras se termina este timbrado
+        nominas_reservadas.add(nomina.id)
+
+        # Agregar a los pendientes, cuando haya mas de los permitidos se termina el mas antiguo
+        pendientes.append(
+            {
+                "archivo_xml": archivo_xml,
+                "archivo_pdf": archivo_pdf,
+                "es_nuevo": es_nuevo,
+                "hay_cambios": hay_cambios,
+                "nomina": nomina,
+                "ruta_xml": ruta_xml,
+                "subida_pdf": subida_pdf,
+                "subida_xml": subida_xml,
+                "tfd_uuid": tfd_uuid,
+                "timbrado": timbrado,
+            }
+        )
+        while len(pendientes) > pendientes_maximo:
+            terminar_timbrado(pendientes.popleft())
 
-        # Incrementar procesados_contador
-        procesados_contador += 1
-
-        # Mostrar un punto en la terminal
-        if not hay_cambios:
-            click.echo(click.style("-", fg="yellow"), nl=False)
+    # Terminar los timbrados pendientes, detener los hilos y confirmar los cambios que falten
+    while len(pendientes) > 0:
+        terminar_timbrado(pendientes.popleft())
+    ejecutor.shutdown()
+    database.session.commit()
+    manifiesto.guardar()
 
     # Poner avance de linea
     click.echo("")
@@ -711,8 +730,55 @@ def actualizar(quincena_clave: str, tipo: str, poner_en_ceros: bool, sobreescrib
     if agregados_contador > 0:
         click.echo(click.style(f"  Se agregaron {agregados_contador} timbrados.", fg="green"))
 
+    # Si se omitieron archivos XML sin cambios segun el manifiesto, se muestra el contador
+    if omitidos_contador > 0:
+        click.echo(click.style(f"  Se omitieron {omitidos_contador} archivos XML ya terminados y sin cambios.", fg="green"))
+
     # Mostrar la cantidad de archivos XML procesados
     click.echo(click.style(f"  Se procesaron {procesados_contador} archivos XML.", fg="green"))
 
 
+@click.command()
+@click.argument("directorio", type=click.Path(exists=True, file_okay=False))
+@click.option("--repeticiones", type=int, default=3, help="Veces que se lee el directorio, se toma la mejor")
+def medir_extractor(directorio: str, repeticiones: int):
+    """Medir en un solo nucleo cuantos archivos XML por segundo lee el extractor de CFDI"""
+
+    # Cargar la lista de archivos XML
+    archivos = sorted(Path(directorio).glob("*.xml"))
+    if len(archivos) == 0:
+        click.echo(f"ERROR: No hay archivos XML en {directorio}")
+        sys.exit(1)
+
+    # Medir la lectura completa con ET.parse y root.iter() como referencia
+    mejor_referencia = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for archivo in archivos:
+            for _ in ET.parse(archivo).getroot().iter():
+                pass
+        duracion = time.perf_counter() - inicio
+        mejor_referencia = duracion if mejor_referencia is None else min(mejor_referencia, duracion)
+
+    # Medir el extractor
+    mejor_extractor = None
+    errores = 0
+    for _ in range(repeticiones):
+        errores = 0
+        inicio = time.perf_counter()
+        for archivo in archivos:
+            if extraer_cfdi(archivo) is None:
+                errores += 1
+        duracion = time.perf_counter() - inicio
+        mejor_extractor = duracion if mejor_extractor is None else min(mejor_extractor, duracion)
+
+    # Mostrar los resultados
+    click.echo(f"Se leyeron {len(archivos)} archivos XML, la mejor de {repeticiones} repeticiones")
+    click.echo(f"  ET.parse + iter: {mejor_referencia:.3f} s, {len(archivos) / mejor_referencia:.0f} archivos/s")
+    click.echo(f"  extraer_cfdi:    {mejor_extractor:.3f} s, {len(archivos) / mejor_extractor:.0f} archivos/s")
+    if errores > 0:
+        click.echo(click.style(f"  Hubo {errores} archivos que no son cfdi:Comprobante o estan mal formados", fg="yellow"))
+
+
 cli.add_command(actualizar)
+cli.add_command(medir_extractor)
@@ -8,13 +8,8 @@ from datetime import datetime, timedelta
 import click
 
 from lib.pwgen import generar_api_key
-from perseo.app import create_app
 from perseo.blueprints.usuarios.models import Usuario
-from perseo.extensions import database, pwd_context
-
-app = create_app()
-app.app_context().push()
-database.app = app
+from perseo.extensions import pwd_context
 
 
 @click.group()
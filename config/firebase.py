@@ -14,54 +14,53 @@ Configure los siguientes secretos en google cloud secret manager:
 """
 
 import os
-from functools import lru_cache
+from functools import lru_cache, partial
 
 from dotenv import load_dotenv
-from google.cloud import secretmanager
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
+from config.secret_loader import get_secret_backend, get_secrets_cache, load_secrets
+
 load_dotenv()
 
 PROJECT_ID = os.getenv("PROJECT_ID", "")  # Por defecto esta vacio, esto significa estamos en modo local
 PREFIX = os.getenv("PREFIX", "firebase")  # Es comun a todos los sistemas web
+SECRET_IDS = (
+    "apikey",
+    "appid",
+    "authdomain",
+    "databaseurl",
+    "measurementid",
+    "messagingsenderid",
+    "projectid",
+    "storagebucket",
+)
 
 
-def get_secret(secret_id: str) -> str:
-    """Get secret from google cloud secret manager"""
-
-    # If not in google cloud, return environment variable
-    if PROJECT_ID == "":
-        return os.getenv(secret_id.upper(), "")
-
-    # Create the secret manager client
-    client = secretmanager.SecretManagerServiceClient()
+@lru_cache()
+def get_secrets() -> dict:
+    """Get all the secrets at once, concurrently and with one client, if one fails it is an empty string"""
+    backend = get_secret_backend(PREFIX, empty_on_error=True)
+    return load_secrets(list(SECRET_IDS), backend, get_secrets_cache(PREFIX or "firebase"))
 
-    # Build the resource name of the secret version
-    if PREFIX != "":
-        secret = f"{PREFIX}_{secret_id}"
-    else:
-        secret = secret_id
-    name = client.secret_version_path(PROJECT_ID, secret, "latest")
 
-    # Access the secret version and return the decoded payload
-    try:
-        response = client.access_secret_version(name=name)
-        return response.payload.data.decode("UTF-8")
-    except Exception as error:
-        return ""  # If fail return empty string
+def get_secret(secret_id: str) -> str:
+    """Get secret from google cloud secret manager"""
+    return get_secrets()[secret_id]
 
 
 class FirebaseSettings(BaseSettings):
     """Settings"""
 
-    APIKEY: str = get_secret("apikey")
-    APPID: str = get_secret("appid")
-    AUTHDOMAIN: str = get_secret("authdomain")
-    DATABASEURL: str = get_secret("databaseurl")
-    MEASUREMENTID: str = get_secret("measurementid")
-    MESSAGINGSENDERID: str = get_secret("messagingsenderid")
-    PROJECTID: str = get_secret("projectid")
-    STORAGEBUCKET: str = get_secret("storagebucket")
+    APIKEY: str = Field(default_factory=partial(get_secret, "apikey"))
+    APPID: str = Field(default_factory=partial(get_secret, "appid"))
+    AUTHDOMAIN: str = Field(default_factory=partial(get_secret, "authdomain"))
+    DATABASEURL: str = Field(default_factory=partial(get_secret, "databaseurl"))
+    MEASUREMENTID: str = Field(default_factory=partial(get_secret, "measurementid"))
+    MESSAGINGSENDERID: str = Field(default_factory=partial(get_secret, "messagingsenderid"))
+    PROJECTID: str = Field(default_factory=partial(get_secret, "projectid"))
+    STORAGEBUCKET: str = Field(default_factory=partial(get_secret, "storagebucket"))
 
     class Config:
         """Load configuration"""
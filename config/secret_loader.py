@@ -0,0 +1,173 @@
+"""
+Secret loader
+
+Resolve a group of secrets at once, concurrently and with one shared client:
+
+    secrets = load_secrets(["host", "salt"], get_secret_backend("pjecz_perseo"))
+    secrets["host"]
+
+The backend is pluggable:
+
+- EnvironmentBackend, when PROJECT_ID is empty (local mode), reads the environment variable SECRET_ID
+- SecretManagerBackend reads {prefix}_{secret_id} from google cloud secret manager
+- DictBackend is a local stand-in for tests
+
+For the CLI, set SECRETS_CACHE_KEY with a Fernet key to keep the resolved secrets
+encrypted on disk (in SECRETS_CACHE_DIR) for SECRETS_CACHE_TTL seconds.
+Generate a key with:
+
+    python3 -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from cryptography.fernet import Fernet, InvalidToken
+
+MAX_WORKERS = 8
+
+
+class EnvironmentBackend:
+    """Read the secrets from the environment variables, in upper case"""
+
+    cacheable = False
+
+    def get(self, secret_id: str) -> str:
+        """Get secret"""
+        return os.getenv(secret_id.upper(), "")
+
+
+class DictBackend:
+    """Read the secrets from a dictionary, for tests"""
+
+    def __init__(self, secrets: dict, cacheable: bool = False):
+        self.secrets = secrets
+        self.cacheable = cacheable
+        self.requests_count = 0
+
+    def get(self, secret_id: str) -> str:
+        """Get secret"""
+        self.requests_count += 1
+        return self.secrets.get(secret_id, "")
+
+
+class SecretManagerBackend:
+    """Read the secrets from google cloud secret manager with one shared client"""
+
+    cacheable = True
+
+    def __init__(self, project_id: str, prefix: str = "", empty_on_error: bool = False):
+        self.project_id = project_id
+        self.prefix = prefix
+        self.empty_on_error = empty_on_error
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Create the secret manager client only once"""
+        with self._lock:
+            if self._client is None:
+                # Imported here because local mode does not need it
+                from google.cloud import secretmanager
+
+                self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def get(self, secret_id: str) -> str:
+        """Get secret"""
+        secret = f"{self.prefix}_{secret_id}" if self.prefix != "" else secret_id
+        name = self.client.secret_version_path(self.project_id, secret, "latest")
+        try:
+            response = self.client.access_secret_version(name=name)
+        except Exception:
+            if self.empty_on_error:
+                return ""
+            raise
+        return response.payload.data.decode("UTF-8")
+
+
+class SecretsCache:
+    """Encrypted file with the resolved secrets and their expiration"""
+
+    def __init__(self, path: Path, key: str, ttl: int):
+        self.path = path
+        self.fernet = Fernet(key)
+        self.ttl = ttl
+
+    def load(self, secret_ids: list) -> dict | None:
+        """Return the cached secrets if the file exists, has not expired and has every secret_id"""
+        try:
+            content = json.loads(self.fernet.decrypt(self.path.read_bytes()))
+        except (OSError, InvalidToken, ValueError):
+            return None
+        if content.get("expires", 0) < time.time():
+            return None
+        secrets = content.get("secrets", {})
+        if any(secret_id not in secrets for secret_id in secret_ids):
+            return None
+        return secrets
+
+    def save(self, secrets: dict) -> None:
+        """Write the secrets encrypted, readable only by the owner"""
+        content = json.dumps({"expires": time.time() + self.ttl, "secrets": secrets}).encode("UTF-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        temporary.write_bytes(self.fernet.encrypt(content))
+        temporary.chmod(0o600)
+        os.replace(temporary, self.path)
+
+
+_backend_override = None
+
+
+def set_secret_backend(backend) -> None:
+    """Replace the backend, for example with a DictBackend in tests; None restores the default"""
+    global _backend_override
+    _backend_override = backend
+
+
+def get_secret_backend(prefix: str = "", empty_on_error: bool = False):
+    """Return the backend for the current mode"""
+    if _backend_override is not None:
+        return _backend_override
+    project_id = os.getenv("PROJECT_ID", "")
+    if project_id == "":
+        return EnvironmentBackend()
+    return SecretManagerBackend(project_id, prefix, empty_on_error)
+
+
+def get_secrets_cache(name: str) -> SecretsCache | None:
+    """Return the on disk cache if SECRETS_CACHE_KEY is defined"""
+    key = os.getenv("SECRETS_CACHE_KEY", "")
+    if key == "":
+        return None
+    directory = os.getenv("SECRETS_CACHE_DIR", str(Path.home() / ".cache" / "pjecz_perseo"))
+    return SecretsCache(Path(directory, f"{name}.secrets"), key, int(os.getenv("SECRETS_CACHE_TTL", "3600")))
+
+
+def load_secrets(secret_ids: list, backend, cache: SecretsCache | None = None) -> dict:
+    """Resolve the secrets concurrently with the backend, from the cache if it is given and still valid"""
+
+    # Try the cache, only for backends that make requests
+    use_cache = cache is not None and getattr(backend, "cacheable", False)
+    if use_cache:
+        secrets = cache.load(secret_ids)
+        if secrets is not None:
+            return secrets
+
+    # Resolve all the secrets at the same time
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, max(1, len(secret_ids)))) as executor:
+        secrets = dict(zip(secret_ids, executor.map(backend.get, secret_ids)))
+
+    # Save the cache
+    if use_cache:
+        try:
+            cache.save(secrets)
+        except OSError:
+            pass
+    return secrets
@@ -20,52 +20,55 @@ Para desarrollo, debe crear un archivo .env con las variables de entorno:
 - SECRET_KEY
 - SQLALCHEMY_DATABASE_URI
 - TASK_QUEUE
+
+Los secretos se resuelven juntos, la primera vez que se necesita uno, con config.secret_loader
 """
 
 import os
-from functools import lru_cache
+from functools import lru_cache, partial
 
 from dotenv import load_dotenv
-from google.cloud import secretmanager
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
+from config.secret_loader import get_secret_backend, get_secrets_cache, load_secrets
+
 load_dotenv()
 
 PROJECT_ID = os.getenv("PROJECT_ID", "")  # Por defecto esta vacio, esto significa estamos en modo local
 SERVICE_PREFIX = os.getenv("SERVICE_PREFIX", "pjecz_perseo")
+SECRET_IDS = (
+    "cloud_storage_deposito",
+    "host",
+    "redis_url",
+    "salt",
+    "secret_key",
+    "sqlalchemy_database_uri",
+    "task_queue",
+)
 
 
-def get_secret(secret_id: str) -> str:
-    """Get secret from google cloud secret manager"""
-
-    # If not in google cloud, return environment variable
-    if PROJECT_ID == "":
-        return os.getenv(secret_id.upper(), "")
-
-    # Create the secret manager client
-    client = secretmanager.SecretManagerServiceClient()
-
-    # Build the resource name of the secret version
-    secret = f"{SERVICE_PREFIX}_{secret_id}"
-    name = client.secret_version_path(PROJECT_ID, secret, "latest")
+@lru_cache()
+def get_secrets() -> dict:
+    """Get all the secrets at once, concurrently and with one client"""
+    return load_secrets(list(SECRET_IDS), get_secret_backend(SERVICE_PREFIX), get_secrets_cache(SERVICE_PREFIX))
 
-    # Access the secret version
-    response = client.access_secret_version(name=name)
 
-    # Return the decoded payload
-    return response.payload.data.decode("UTF-8")
+def get_secret(secret_id: str) -> str:
+    """Get secret from google cloud secret manager"""
+    return get_secrets()[secret_id]
 
 
 class Settings(BaseSettings):
     """Settings"""
 
-    CLOUD_STORAGE_DEPOSITO: str = get_secret("cloud_storage_deposito")
-    HOST: str = get_secret("host")
-    REDIS_URL: str = get_secret("redis_url")
-    SALT: str = get_secret("salt")
-    SECRET_KEY: str = get_secret("secret_key")
-    SQLALCHEMY_DATABASE_URI: str = get_secret("sqlalchemy_database_uri")
-    TASK_QUEUE: str = get_secret("task_queue")
+    CLOUD_STORAGE_DEPOSITO: str = Field(default_factory=partial(get_secret, "cloud_storage_deposito"))
+    HOST: str = Field(default_factory=partial(get_secret, "host"))
+    REDIS_URL: str = Field(default_factory=partial(get_secret, "redis_url"))
+    SALT: str = Field(default_factory=partial(get_secret, "salt"))
+    SECRET_KEY: str = Field(default_factory=partial(get_secret, "secret_key"))
+    SQLALCHEMY_DATABASE_URI: str = Field(default_factory=partial(get_secret, "sqlalchemy_database_uri"))
+    TASK_QUEUE: str = Field(default_factory=partial(get_secret, "task_queue"))
 
     class Config:
         """Load configuration"""
@@ -0,0 +1,124 @@
+"""
+Cargas masivas
+
+Mapas en memoria con los catálogos e inserciones por lotes para que la alimentación sea rápida.
+
+En lugar de consultar CentroTrabajo, Plaza, Puesto, Persona y Tabulador por cada fila del archivo XLS,
+se cargan una sola vez en diccionarios; los registros que falten se insertan en un solo lote
+y al final se insertan las filas de Nomina o PercepcionDeduccion con insert().values([...]) en lotes.
+
+    mapas = MapasCatalogos(sesion)
+    centro_trabajo_id = mapas.centros_trabajos.get(centro_trabajo_clave)
+    ...
+    mapas.insertar_centros_trabajos(claves_faltantes)
+    insertar_por_lotes(sesion, Nomina, nominas_por_insertar)
+    sesion.commit()
+"""
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.conceptos.models import Concepto
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.puestos.models import Puesto
+from perseo.blueprints.tabuladores.models import Tabulador
+
+TAMANO_LOTE = 1000
+
+
+def insertar_por_lotes(sesion: Session, modelo, filas: list[dict], tamano_lote: int = TAMANO_LOTE) -> int:
+    """Insertar las filas (diccionarios) con insert().values([...]) en lotes, entrega la cantidad insertada"""
+    for inicio in range(0, len(filas), tamano_lote):
+        sesion.execute(insert(modelo).values(filas[inicio : inicio + tamano_lote]))
+    return len(filas)
+
+
+def actualizar_por_lotes(sesion: Session, modelo, filas: list[dict], tamano_lote: int = TAMANO_LOTE) -> int:
+    """Actualizar por la clave primaria las filas (diccionarios con id) en lotes, entrega la cantidad actualizada"""
+    for inicio in range(0, len(filas), tamano_lote):
+        sesion.execute(update(modelo), filas[inicio : inicio + tamano_lote])
+    return len(filas)
+
+
+class MapasCatalogos:
+    """Catálogos cargados una sola vez en diccionarios para no consultar por cada fila"""
+
+    def __init__(self, sesion: Session):
+        self.sesion = sesion
+
+        # Centros de trabajo, plazas, puestos y conceptos por su clave, entregan el id
+        self.centros_trabajos = self._cargar_claves(CentroTrabajo)
+        self.plazas = self._cargar_claves(Plaza)
+        self.puestos = self._cargar_claves(Puesto)
+        self.conceptos = self._cargar_claves(Concepto)
+
+        # Tabuladores por (puesto_id, modelo, nivel, quinquenio), entregan el id del primero que se encuentre
+        self.tabuladores = {}
+        self.tabuladores_quinquenios = {}
+        consulta = select(Tabulador.id, Tabulador.puesto_id, Tabulador.modelo, Tabulador.nivel, Tabulador.quinquenio)
+        for tabulador in self.sesion.execute(consulta.order_by(Tabulador.id)):
+            llave = (tabulador.puesto_id, tabulador.modelo, tabulador.nivel, tabulador.quinquenio)
+            self.tabuladores.setdefault(llave, tabulador.id)
+            self.tabuladores_quinquenios[tabulador.id] = tabulador.quinquenio
+
+        # Personas por su RFC, entregan un diccionario con las columnas que se revisan al alimentar
+        self.personas = {}
+        consulta = select(
+            Persona.id,
+            Persona.rfc,
+            Persona.tabulador_id,
+            Persona.modelo,
+            Persona.num_empleado,
+            Persona.nombres,
+            Persona.apellido_primero,
+            Persona.apellido_segundo,
+        )
+        for persona in self.sesion.execute(consulta):
+            self.personas[persona.rfc] = {
+                "id": persona.id,
+                "tabulador_id": persona.tabulador_id,
+                "modelo": persona.modelo,
+                "num_empleado": persona.num_empleado,
+                "nombre_completo": f"{persona.nombres} {persona.apellido_primero} {persona.apellido_segundo}",
+            }
+
+    def _cargar_claves(self, modelo) -> dict:
+        """Cargar un catálogo como diccionario de clave a id"""
+        return dict(self.sesion.execute(select(modelo.clave, modelo.id)).all())
+
+    def _insertar_claves(self, modelo, mapa: dict, claves: set, descripcion: str) -> int:
+        """Insertar en un solo lote las claves que no estén en el mapa y agregar sus id al mapa"""
+        faltantes = sorted(clave for clave in claves if clave not in mapa)
+        if len(faltantes) == 0:
+            return 0
+        insercion = insert(modelo).values([{"clave": clave, "descripcion": descripcion} for clave in faltantes])
+        for clave, id_nuevo in self.sesion.execute(insercion.returning(modelo.clave, modelo.id)):
+            mapa[clave] = id_nuevo
+        return len(faltantes)
+
+    def insertar_centros_trabajos(self, claves: set) -> int:
+        """Insertar los centros de trabajo que falten, entrega la cantidad insertada"""
+        return self._insertar_claves(CentroTrabajo, self.centros_trabajos, claves, "ND")
+
+    def insertar_plazas(self, claves: set) -> int:
+        """Insertar las plazas que falten, entrega la cantidad insertada"""
+        return self._insertar_claves(Plaza, self.plazas, claves, "ND")
+
+    def insertar_conceptos(self, claves: set) -> int:
+        """Insertar los conceptos que falten, entrega la cantidad insertada"""
+        return self._insertar_claves(Concepto, self.conceptos, claves, "DESCONOCIDO")
+
+    def buscar_tabulador_id(self, puesto_id: int, modelo: int, nivel: int, quinquenio: int) -> int | None:
+        """Buscar el id del tabulador que coincida con el puesto, modelo, nivel y quinquenio"""
+        return self.tabuladores.get((puesto_id, modelo, nivel, quinquenio))
+
+    def insertar_personas(self, personas_nuevas: list[dict]) -> int:
+        """Insertar en lotes las personas nuevas y agregar sus id al mapa de personas"""
+        for inicio in range(0, len(personas_nuevas), TAMANO_LOTE):
+            lote = personas_nuevas[inicio : inicio + TAMANO_LOTE]
+            insercion = insert(Persona).values(lote).returning(Persona.rfc, Persona.id)
+            for rfc, id_nuevo in self.sesion.execute(insercion):
+                self.personas[rfc]["id"] = id_nuevo
+        return len(personas_nuevas)
@@ -0,0 +1,143 @@
+"""
+CFDI Extractor
+
+Extraer de un archivo XML CFDI 4.0 con complemento de nómina 1.2 los datos que necesita Timbrado.
+
+En lugar de recorrer cada elemento con root.iter() y comparar todos los tags,
+solo se revisan los hijos de cfdi:Comprobante y de cfdi:Complemento, que es donde están
+Emisor, Receptor, TimbreFiscalDigital y nomina12:Nomina; no se visitan conceptos, percepciones ni deducciones.
+Se usa ET.parse porque su analizador en C es más rápido que iterparse, que entrega cada evento a Python.
+
+    cfdi = extraer_cfdi(ruta_xml)
+    if cfdi is None:
+        # No es un cfdi:Comprobante o no se pudo leer
+    cfdi.tfd_uuid
+"""
+
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+XML_TAG_CFD_PREFIX = "{http://www.sat.gob.mx/cfd/4}"
+XML_TAG_TFD_PREFIX = "{http://www.sat.gob.mx/TimbreFiscalDigital}"
+XML_TAG_NOMINA_PREFIX = "{http://www.sat.gob.mx/nomina12}"
+
+TAG_COMPROBANTE = f"{XML_TAG_CFD_PREFIX}Comprobante"
+TAG_COMPLEMENTO = f"{XML_TAG_CFD_PREFIX}Complemento"
+TAG_EMISOR = f"{XML_TAG_CFD_PREFIX}Emisor"
+TAG_RECEPTOR = f"{XML_TAG_CFD_PREFIX}Receptor"
+TAG_TIMBRE_FISCAL_DIGITAL = f"{XML_TAG_TFD_PREFIX}TimbreFiscalDigital"
+TAG_NOMINA = f"{XML_TAG_NOMINA_PREFIX}Nomina"
+TAGS_BUSCADOS = {TAG_EMISOR, TAG_RECEPTOR, TAG_TIMBRE_FISCAL_DIGITAL, TAG_NOMINA}
+
+
+@dataclass(slots=True)
+class CFDI:
+    """Datos de un CFDI de nómina, con los mismos nombres de las columnas de Timbrado"""
+
+    cfdi_emisor_rfc: str | None = None  # cfdi:Emisor [Rfc]
+    cfdi_emisor_nombre: str | None = None  # cfdi:Emisor [Nombre]
+    cfdi_emisor_regimen_fiscal: str | None = None  # cfdi:Emisor [RegimenFiscal]
+    cfdi_receptor_rfc: str | None = None  # cfdi:Receptor [Rfc]
+    cfdi_receptor_nombre: str | None = None  # cfdi:Receptor [Nombre]
+    tfd_version: str | None = None  # tfd:TimbreFiscalDigital [Version]
+    tfd_uuid: str | None = None  # tfd:TimbreFiscalDigital [UUID]
+    tfd_fecha_timbrado: str | None = None  # tfd:TimbreFiscalDigital [FechaTimbrado]
+    tfd_sello_cfd: str | None = None  # tfd:TimbreFiscalDigital [SelloCFD]
+    tfd_num_cert_sat: str | None = None  # tfd:TimbreFiscalDigital [NoCertificadoSAT]
+    tfd_sello_sat: str | None = None  # tfd:TimbreFiscalDigital [SelloSAT]
+    nomina12_nomina_version: str | None = None  # nomina12:Nomina [Version]
+    nomina12_nomina_tipo_nomina: str | None = None  # nomina12:Nomina [TipoNomina]
+    nomina12_nomina_fecha_pago: date | None = None  # nomina12:Nomina [FechaPago]
+    nomina12_nomina_fecha_inicial_pago: date | None = None  # nomina12:Nomina [FechaInicialPago]
+    nomina12_nomina_fecha_final_pago: date | None = None  # nomina12:Nomina [FechaFinalPago]
+    nomina12_nomina_total_percepciones: Decimal | None = None  # nomina12:Nomina [TotalPercepciones]
+    nomina12_nomina_total_deducciones: Decimal | None = None  # nomina12:Nomina [TotalDeducciones]
+    nomina12_nomina_total_otros_pagos: Decimal | None = None  # nomina12:Nomina [TotalOtrosPagos]
+
+
+def _fecha(valor: str | None) -> date | None:
+    """Convertir un texto AAAA-MM-DD a fecha, entrega None si no es válido"""
+    if valor is None:
+        return None
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _importe(valor: str | None) -> Decimal | None:
+    """Convertir un texto a Decimal con cuatro decimales, entrega None si no es válido"""
+    if valor is None:
+        return None
+    try:
+        return Decimal(format(float(valor), ".4f"))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def extraer_cfdi(ruta_xml: str | Path) -> CFDI | None:
+    """Extraer los datos del CFDI, entrega None si la raíz no es cfdi:Comprobante o el XML está mal formado"""
+
+    # Leer el archivo XML
+    try:
+        raiz = ET.parse(str(ruta_xml)).getroot()
+    except ET.ParseError:
+        return None
+
+    # Validar que el tag raiz sea cfdi:Comprobante
+    if raiz.tag != TAG_COMPROBANTE:
+        return None
+
+    # Tomar los atributos de los hijos de cfdi:Comprobante y de cfdi:Complemento que se buscan
+    encontrados = {}
+    for hijo in raiz:
+        if hijo.tag == TAG_COMPLEMENTO:
+            for complemento in hijo:
+                if complemento.tag in TAGS_BUSCADOS:
+                    encontrados[complemento.tag] = complemento.attrib
+        elif hijo.tag in TAGS_BUSCADOS:
+            encontrados[hijo.tag] = hijo.attrib
+
+    # Inicializar el registro
+    cfdi = CFDI()
+
+    # Obtener datos de Emisor
+    if TAG_EMISOR in encontrados:
+        atributos = encontrados[TAG_EMISOR]
+        cfdi.cfdi_emisor_rfc = atributos.get("Rfc")
+        cfdi.cfdi_emisor_nombre = atributos.get("Nombre")
+        cfdi.cfdi_emisor_regimen_fiscal = atributos.get("RegimenFiscal")
+
+    # Obtener datos de Receptor
+    if TAG_RECEPTOR in encontrados:
+        atributos = encontrados[TAG_RECEPTOR]
+        cfdi.cfdi_receptor_rfc = atributos.get("Rfc")
+        cfdi.cfdi_receptor_nombre = atributos.get("Nombre")
+
+    # Obtener datos de TimbreFiscalDigital
+    if TAG_TIMBRE_FISCAL_DIGITAL in encontrados:
+        atributos = encontrados[TAG_TIMBRE_FISCAL_DIGITAL]
+        cfdi.tfd_version = atributos.get("Version")
+        cfdi.tfd_uuid = atributos.get("UUID")
+        cfdi.tfd_fecha_timbrado = atributos.get("FechaTimbrado")
+        cfdi.tfd_sello_cfd = atributos.get("SelloCFD")
+        cfdi.tfd_num_cert_sat = atributos.get("NoCertificadoSAT")
+        cfdi.tfd_sello_sat = atributos.get("SelloSAT")
+
+    # Obtener datos de Nomina
+    if TAG_NOMINA in encontrados:
+        atributos = encontrados[TAG_NOMINA]
+        cfdi.nomina12_nomina_version = atributos.get("Version")
+        cfdi.nomina12_nomina_tipo_nomina = atributos.get("TipoNomina")
+        cfdi.nomina12_nomina_fecha_pago = _fecha(atributos.get("FechaPago"))
+        cfdi.nomina12_nomina_fecha_inicial_pago = _fecha(atributos.get("FechaInicialPago"))
+        cfdi.nomina12_nomina_fecha_final_pago = _fecha(atributos.get("FechaFinalPago"))
+        cfdi.nomina12_nomina_total_percepciones = _importe(atributos.get("TotalPercepciones"))
+        cfdi.nomina12_nomina_total_deducciones = _importe(atributos.get("TotalDeducciones"))
+        cfdi.nomina12_nomina_total_otros_pagos = _importe(atributos.get("TotalOtrosPagos"))
+
+    # Entregar el registro
+    return cfdi
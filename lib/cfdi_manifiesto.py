@@ -0,0 +1,107 @@
+"""
+CFDI Manifiesto
+
+Manifiesto JSON que se guarda en el directorio de los archivos XML de los timbrados
+para que al volver a ejecutar solo se procesen los archivos nuevos o que cambiaron.
+
+Por cada archivo XML terminado se guarda su tamaño, fecha de modificación, sha256, UUID, el ID de la nómina con la que
+se vinculó y el resultado de la subida de sus archivos al depósito GCS. Si el tamaño y la fecha de modificación coinciden se considera sin cambios sin leerlo;
+si solo cambió la fecha de modificación (por ejemplo al copiarlo) se compara el sha256.
+
+Un archivo solo está terminado si se subió, o si no hay depósito y se terminó sin depósito.
+Los que fallaron al subir, o que se terminaron sin depósito cuando ya lo hay, se vuelven a procesar.
+Si se dan los vínculos (nomina_id, tfd_uuid) que están en la base de datos, también se vuelven a procesar
+los archivos cuya nómina ya no tiene el timbrado con ese UUID, por ejemplo porque se volvieron a alimentar las nóminas.
+
+    manifiesto = ManifiestoCFDI(timbrados_dir)
+    if manifiesto.esta_terminado(ruta_xml, con_deposito, vinculados):
+        # Omitir
+    manifiesto.marcar_terminado(ruta_xml, tfd_uuid, nomina_id, SUBIDA_SUBIDO)
+    database.session.commit()
+    manifiesto.guardar()
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFIESTO_NOMBRE = ".manifiesto_timbrados.json"
+
+SUBIDA_SUBIDO = "SUBIDO"  # Los archivos XML y PDF están en el depósito GCS
+SUBIDA_SIN_DEPOSITO = "SIN DEPOSITO"  # No hay depósito GCS, no se subieron
+SUBIDA_ERROR = "ERROR"  # Falló la subida de alguno de los archivos
+
+
+def calcular_sha256(ruta: Path) -> str:
+    """Calcular el sha256 del contenido de un archivo"""
+    sha256 = hashlib.sha256()
+    with open(ruta, "rb") as archivo:
+        for bloque in iter(lambda: archivo.read(65536), b""):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+class ManifiestoCFDI:
+    """Manifiesto de los archivos XML ya terminados de un directorio"""
+
+    def __init__(self, directorio: Path, nombre: str = MANIFIESTO_NOMBRE):
+        self.ruta = Path(directorio, nombre)
+        self.archivos = {}
+        if self.ruta.is_file():
+            try:
+                with open(self.ruta, "r", encoding="utf8") as archivo:
+                    self.archivos = json.load(archivo)
+            except (json.JSONDecodeError, OSError):
+                self.archivos = {}
+
+    def esta_terminado(self, ruta_xml: Path, con_deposito: bool = False, vinculados: set = None) -> bool:
+        """True si el archivo XML ya se terminó, no ha cambiado, ya no hay que subirlo y sigue vinculado a su nómina"""
+
+        # Si no está en el manifiesto, no se ha terminado
+        registro = self.archivos.get(ruta_xml.name)
+        if registro is None:
+            return False
+
+        # Si no se subió, solo está terminado cuando no hay depósito y tampoco lo había
+        subida = registro.get("subida", SUBIDA_ERROR)
+        if subida != SUBIDA_SUBIDO and not (subida == SUBIDA_SIN_DEPOSITO and not con_deposito):
+            return False
+
+        # Si se dan los vínculos y la nómina ya no tiene este timbrado, hay que volver a vincularla
+        if vinculados is not None and (registro.get("nomina_id"), registro["tfd_uuid"]) not in vinculados:
+            return False
+
+        # Si el tamaño es diferente, cambió
+        estado = ruta_xml.stat()
+        if estado.st_size != registro["tamano"]:
+            return False
+
+        # Si el tamaño y la fecha de modificación son iguales, no cambió
+        if estado.st_mtime_ns == registro["mtime_ns"]:
+            return True
+
+        # Si solo cambió la fecha de modificación, comparar el sha256 y actualizar la fecha
+        if calcular_sha256(ruta_xml) != registro["sha256"]:
+            return False
+        registro["mtime_ns"] = estado.st_mtime_ns
+        return True
+
+    def marcar_terminado(self, ruta_xml: Path, tfd_uuid: str, nomina_id: int, subida: str) -> None:
+        """Agregar o actualizar el archivo XML con su nómina y el resultado de su subida, se escribe hasta llamar a guardar"""
+        estado = ruta_xml.stat()
+        self.archivos[ruta_xml.name] = {
+            "tamano": estado.st_size,
+            "mtime_ns": estado.st_mtime_ns,
+            "sha256": calcular_sha256(ruta_xml),
+            "tfd_uuid": tfd_uuid,
+            "nomina_id": nomina_id,
+            "subida": subida,
+        }
+
+    def guardar(self) -> None:
+        """Escribir el manifiesto, primero en un archivo temporal para no dejarlo a medias"""
+        ruta_temporal = self.ruta.with_suffix(".tmp")
+        with open(ruta_temporal, "w", encoding="utf8") as archivo:
+            json.dump(self.archivos, archivo)
+        os.replace(ruta_temporal, self.ruta)
@@ -1,8 +1,29 @@
 """
 Datatables
+
+Para no cargar los registros como objetos ORM y luego consultar sus relaciones uno por uno,
+cada datatable_json puede declarar las columnas que necesita y project_columns las entrega
+en una sola consulta con las uniones explícitas:
+
+    DATATABLE_COLUMNAS = {
+        "id": Nomina.id,
+        "quincena_clave": Quincena.clave,  # Columna de una tabla que la consulta ya une
+        "persona_rfc": (Nomina.persona, Persona.rfc),  # Relación y columna, se une con un alias
+    }
+    consulta = project_columns(consulta, DATATABLE_COLUMNAS)
+    for resultado in paginate_keyset(consulta, [Quincena.clave, Nomina.id], start, rows_per_page, cache_key):
+        resultado.persona_rfc
 """
 
-from flask import request
+import hashlib
+import json
+
+from flask import current_app, request
+from redis.exceptions import RedisError
+from sqlalchemy import tuple_
+from sqlalchemy.orm import aliased
+
+DATATABLE_CACHE_TTL = 60  # Segundos que se conservan el total y las llaves de las páginas
 
 
 def get_datatable_parameters():
@@ -18,6 +39,105 @@ def get_datatable_parameters():
     return draw, start, rows_per_page
 
 
+def get_datatable_cache_key(nombre: str) -> str:
+    """Elaborar la clave de cache con los filtros del formulario normalizados, sin draw, start ni length"""
+    filtros = sorted((llave, valor) for llave, valor in request.form.items() if llave not in ("draw", "start", "length"))
+    huella = hashlib.sha1(json.dumps(filtros).encode("utf8")).hexdigest()
+    return f"datatables:{nombre}:{huella}"
+
+
+def count_cached(consulta, cache_key: str) -> int:
+    """Contar los registros de la consulta, el total se conserva en Redis por unos segundos"""
+    try:
+        total = current_app.redis.get(f"{cache_key}:total")
+        if total is not None:
+            return int(total)
+    except RedisError:
+        return consulta.count()
+    total = consulta.count()
+    try:
+        current_app.redis.setex(f"{cache_key}:total", DATATABLE_CACHE_TTL, total)
+    except RedisError:
+        pass
+    return total
+
+
+def project_columns(consulta, columnas: dict):
+    """
+    Cambiar la consulta para que entregue solo las columnas declaradas, con sus nombres como etiquetas
+
+    Cada columna puede ser una columna de la tabla (o de una tabla que la consulta ya une) o una tupla
+    con las relaciones a seguir y al final la columna, por ejemplo (Timbrado.nomina, Nomina.quincena, Quincena.clave);
+    cada relación se une una sola vez con un alias, así no choca con las uniones que ya tenga la consulta.
+    Los renglones que entrega tienen las columnas como atributos: resultado.persona_rfc
+    """
+    alias_por_ruta = {}
+    expresiones = []
+    for nombre, columna in columnas.items():
+        if isinstance(columna, tuple):
+            *relaciones, final = columna
+            origen = None
+            ruta = ()
+            for relacion in relaciones:
+                ruta = ruta + (relacion.key,)
+                if ruta not in alias_por_ruta:
+                    destino = aliased(relacion.property.mapper.class_)
+                    atributo = relacion if origen is None else getattr(origen, relacion.key)
+                    consulta = consulta.join(destino, atributo.of_type(destino))
+                    alias_por_ruta[ruta] = destino
+                origen = alias_por_ruta[ruta]
+            columna = getattr(origen, final.key)
+        expresiones.append(columna.label(nombre))
+    return consulta.with_entities(*expresiones)
+
+
+def paginate_keyset(consulta, columnas: list, start: int, rows_per_page: int, cache_key: str) -> list:
+    """
+    Paginar en orden descendente por las columnas, la última debe ser única (el id)
+
+    Al entregar una página se guarda en Redis la llave (valores de las columnas) de su último registro,
+    así la página siguiente se consulta con WHERE (columnas) < (llave) en lugar de OFFSET.
+    Si no se tiene la llave (salto de página, cache vencido) se usa OFFSET.
+    """
+
+    # Buscar la llave del registro anterior al inicio de la página
+    llave = None
+    if start > 0:
+        try:
+            llave = current_app.redis.get(f"{cache_key}:seek:{start}")
+        except RedisError:
+            llave = None
+
+    # Si la consulta fue cambiada con project_columns, se entregarán los renglones en lugar de los objetos
+    cantidad = len(consulta.column_descriptions)
+    es_entidad = cantidad == 1 and isinstance(consulta.column_descriptions[0]["expr"], type)
+
+    # Agregar las columnas, con etiquetas propias, para tomar la llave de cada registro y ordenar
+    llaves = [columna.label(f"llave_{numero}") for numero, columna in enumerate(columnas)]
+    consulta = consulta.add_columns(*llaves).order_by(*[columna.desc() for columna in columnas])
+    if llave is not None:
+        consulta = consulta.filter(tuple_(*columnas) < tuple_(*json.loads(llave)))
+    else:
+        consulta = consulta.offset(start)
+    filas = consulta.limit(rows_per_page).all()
+
+    # Guardar la llave del último registro para la página siguiente
+    if len(filas) > 0:
+        try:
+            current_app.redis.setex(
+                f"{cache_key}:seek:{start + len(filas)}",
+                DATATABLE_CACHE_TTL,
+                json.dumps(list(filas[-1][cantidad:])),
+            )
+        except RedisError:
+            pass
+
+    # Entregar los objetos, o los renglones que tienen las columnas declaradas como atributos
+    if es_entidad:
+        return [fila[0] for fila in filas]
+    return filas
+
+
 def output_datatable_json(draw, total, data):
     """Entregar JSON"""
     return {
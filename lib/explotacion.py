@@ -0,0 +1,242 @@
+"""
+Explotación
+
+Lector de los archivos de explotación (NominaFmt2.XLS, Aguinaldos.XLS, PrimasVacacionales.XLS).
+
+La hoja se lee una sola vez, fila por fila con row_values, en lugar de pedir cada celda con cell_value;
+las columnas se conocen por su nombre y cada fila se entrega como un RegistroExplotacion ya convertido y validado.
+Además del XLS se aceptan los mismos datos en XLSX o CSV, con el mismo orden de columnas y el renglón de encabezados.
+
+    ruta = buscar_archivo_explotacion(Path(EXPLOTACION_BASE_DIR, quincena_clave), NOMINAS_FILENAME_XLS)
+    for registro in leer_explotacion(ruta):
+        registro.rfc, registro.importe, registro.quinquenios, registro.es_despensa
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from lib.exceptions import MyFileNotFoundError, MyNotAllowedExtensionError, MyNotValidParamError
+from lib.safe_string import safe_clave, safe_string
+
+# Columnas de la hoja de explotación
+COLUMNA_CLAVE_CT = 1
+COLUMNA_RFC = 2
+COLUMNA_NOMBRE = 3
+COLUMNA_PLAZA = 8
+COLUMNA_NIVP = 9
+COLUMNA_PERCEPCION = 12
+COLUMNA_DEDUCCION = 13
+COLUMNA_IMPTE = 14
+COLUMNA_NO_CHEQUE = 15
+COLUMNA_DESDE_S = 16
+COLUMNA_HASTA_S = 17
+COLUMNA_QUINCENA_INGRESO = 19
+COLUMNA_PUESTO = 20
+COLUMNA_MODELO = 236
+COLUMNA_NUM_EMPLEADO = 240
+
+# Los conceptos van en bloques de seis columnas: P o D, concepto, (sin uso), importe, (sin uso), (sin uso)
+CONCEPTOS_PRIMERA_COLUMNA = 26
+CONCEPTOS_ANCHO_BLOQUE = 6
+CONCEPTOS_ULTIMA_COLUMNA = 236
+
+# Conceptos de los quinquenios, PQ1 a PQ6
+QUINQUENIOS_CONCEPTOS = ("Q1", "Q2", "Q3", "Q4", "Q5", "Q6")
+
+EXTENSIONES = (".xls", ".xlsx", ".csv")
+
+
+@dataclass(slots=True, frozen=True)
+class ConceptoExplotacion:
+    """Percepción o deducción de una fila"""
+
+    p_o_d: str
+    conc: str
+    importe: float
+
+    @property
+    def clave(self) -> str:
+        """Clave del concepto, por ejemplo P07 o D62"""
+        return f"{self.p_o_d}{self.conc}"
+
+
+@dataclass(slots=True)
+class RegistroExplotacion:
+    """Fila de la hoja de explotación con sus columnas convertidas"""
+
+    fila: int
+    centro_trabajo_clave: str
+    rfc: str
+    plaza_clave: str
+    percepcion: float
+    deduccion: float
+    importe: float
+    num_cheque: str
+    desde_s: str
+    hasta_s: str
+    conceptos: tuple
+    nombre_completo: str | None = None
+    nivel: int | None = None
+    quincena_ingreso: str | None = None
+    puesto_clave: str | None = None
+    modelo: int | None = None
+    num_empleado: int | None = None
+
+    @property
+    def quinquenios(self) -> int | None:
+        """Cantidad de quinquenios: cero si no es SINDICALIZADO (modelo 2), None si no viene o si la fila es PME"""
+        if self.modelo != 2:
+            return 0
+        for concepto in self.conceptos:
+            # Si NO es P, se salta
+            if concepto.p_o_d != "P":
+                continue
+            # Si conc es ME es monedero, aqui no hay quinquenios
+            if concepto.conc == "ME":
+                return None
+            # Si el concepto es PQ1 a PQ6, el segundo caracter es la cantidad de quinquenios
+            if concepto.conc in QUINQUENIOS_CONCEPTOS:
+                return int(concepto.conc[1])
+        return None
+
+    @property
+    def es_despensa(self) -> bool:
+        """Verdadero si la fila tiene el concepto PME (monedero)"""
+        return any(concepto.clave == "PME" for concepto in self.conceptos)
+
+
+def buscar_archivo_explotacion(directorio: Path, nombre: str) -> Path:
+    """Entregar la ruta del archivo XLS, o la del XLSX o CSV con el mismo nombre si es la que existe"""
+    ruta = Path(directorio, nombre)
+    if ruta.exists():
+        return ruta
+    for extension in EXTENSIONES:
+        alterna = ruta.with_suffix(extension)
+        if alterna.exists():
+            return alterna
+    return ruta
+
+
+def leer_filas(ruta: Path) -> Iterator[tuple[int, list]]:
+    """Entregar el número y los valores de cada fila de la primera hoja, sin el renglón de encabezados"""
+
+    # Validar que exista el archivo
+    if not ruta.is_file():
+        raise MyFileNotFoundError(f"No se encontró el archivo {ruta}")
+
+    # Leer segun la extension
+    extension = ruta.suffix.lower()
+    if extension == ".xls":
+        # Se importa aquí para que solo lo cargue quien lee un XLS
+        import xlrd
+
+        libro = xlrd.open_workbook(str(ruta), on_demand=True)
+        try:
+            hoja = libro.sheet_by_index(0)
+            for fila in range(1, hoja.nrows):
+                yield fila, hoja.row_values(fila)
+        finally:
+            libro.release_resources()
+    elif extension == ".xlsx":
+        # Se importa aquí para que solo lo cargue quien lee un XLSX
+        from openpyxl import load_workbook
+
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            hoja = libro.worksheets[0]
+            for fila, valores in enumerate(hoja.iter_rows(min_row=2, values_only=True), start=1):
+                yield fila, ["" if valor is None else valor for valor in valores]
+        finally:
+            libro.close()
+    elif extension == ".csv":
+        with open(ruta, encoding="utf8", newline="") as archivo:
+            lector = csv.reader(archivo)
+            next(lector, None)
+            for fila, valores in enumerate(lector, start=1):
+                yield fila, valores
+    else:
+        raise MyNotAllowedExtensionError(f"No se permite la extensión {ruta.suffix} en {ruta.name}")
+
+
+def _celda(valores: list, columna: int):
+    """Valor de la columna, texto vacío si la fila es más corta"""
+    return valores[columna] if columna < len(valores) else ""
+
+
+def _entero(valores: list, columna: int, fila: int, nombre: str) -> int:
+    """Convertir la columna a entero, como en XLS los números llegan como float y en CSV como texto"""
+    valor = _celda(valores, columna)
+    try:
+        if isinstance(valor, str):
+            valor = float(valor.strip())
+        return int(valor)
+    except (TypeError, ValueError) as error:
+        raise MyNotValidParamError(f"Fila {fila}: {nombre} no es un número: '{valor}'") from error
+
+
+def _importe(valor) -> float:
+    """Convertir el importe en centavos a pesos, cero si no es un número"""
+    try:
+        if isinstance(valor, str):
+            valor = float(valor.strip())
+        return int(valor) / 100.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _texto(valor) -> str:
+    """Convertir la columna a texto, los números enteros sin el punto decimal"""
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+def leer_conceptos(valores: list) -> tuple:
+    """Leer los bloques de conceptos desde la columna 26 hasta encontrar uno vacío"""
+    conceptos = []
+    columna = CONCEPTOS_PRIMERA_COLUMNA
+    while columna <= CONCEPTOS_ULTIMA_COLUMNA:
+        # Si 'P' o 'D' es un texto vacio, se termina
+        p_o_d = safe_string(_celda(valores, columna))
+        if p_o_d == "":
+            break
+
+        # Tomar los dos caracteres adicionales del concepto y el importe
+        conc = safe_string(_celda(valores, columna + 1))
+        conceptos.append(ConceptoExplotacion(p_o_d, conc, _importe(_celda(valores, columna + 3))))
+        columna += CONCEPTOS_ANCHO_BLOQUE
+    return tuple(conceptos)
+
+
+def leer_explotacion(ruta: Path, con_persona: bool = True) -> Iterator[RegistroExplotacion]:
+    """Entregar cada fila del archivo de explotación como RegistroExplotacion
+
+    Con con_persona en falso no se leen el nombre, nivel, quincena de ingreso, puesto, modelo
+    ni número de empleado, para los archivos que no los necesitan (aguinaldos, primas)
+    """
+    for fila, valores in leer_filas(ruta):
+        registro = RegistroExplotacion(
+            fila=fila,
+            centro_trabajo_clave=_texto(_celda(valores, COLUMNA_CLAVE_CT)),
+            rfc=_texto(_celda(valores, COLUMNA_RFC)),
+            plaza_clave=_texto(_celda(valores, COLUMNA_PLAZA)),
+            percepcion=_entero(valores, COLUMNA_PERCEPCION, fila, "PERCEPCION") / 100.0,
+            deduccion=_entero(valores, COLUMNA_DEDUCCION, fila, "DEDUCCION") / 100.0,
+            importe=_entero(valores, COLUMNA_IMPTE, fila, "IMPTE") / 100.0,
+            num_cheque=_texto(_celda(valores, COLUMNA_NO_CHEQUE)),
+            desde_s=str(_entero(valores, COLUMNA_DESDE_S, fila, "DESDE_S")),
+            hasta_s=str(_entero(valores, COLUMNA_HASTA_S, fila, "HASTA_S")),
+            conceptos=leer_conceptos(valores),
+        )
+        if con_persona:
+            registro.nombre_completo = _texto(_celda(valores, COLUMNA_NOMBRE))
+            registro.nivel = _entero(valores, COLUMNA_NIVP, fila, "NIVP")
+            registro.quincena_ingreso = str(_entero(valores, COLUMNA_QUINCENA_INGRESO, fila, "QUINCENA_INGRESO"))
+            registro.puesto_clave = safe_clave(_celda(valores, COLUMNA_PUESTO))
+            registro.modelo = _entero(valores, COLUMNA_MODELO, fila, "MODELO")
+            registro.num_empleado = _entero(valores, COLUMNA_NUM_EMPLEADO, fila, "NUM_EMPLEADO")
+        yield registro
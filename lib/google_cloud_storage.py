@@ -5,8 +5,14 @@ Functions to get and upload files from Google Cloud Storage
 
 For develpment you need the environment variable GOOGLE_APPLICATION_CREDENTIALS
 
+The storage client and the bucket handles are created once per process and reused,
+so the authentication, the HTTP session and the bucket metadata GET are paid only once.
+For tests, use set_storage_client() with a FakeStorageClient from lib.google_cloud_storage_fake
+
 """
 
+import os
+import threading
 from pathlib import Path
 from urllib.parse import unquote, urlparse
 
@@ -33,6 +39,71 @@ EXTENSIONS_MEDIA_TYPES = {
     "xlsx": "xapplication/vnd.ms-excel",
 }
 
+_storage_client = None
+_storage_client_pid = None
+_buckets = {}
+_lock = threading.Lock()
+
+
+def get_storage_client():
+    """
+    Get the storage client shared by the process
+
+    :return: Storage client
+    """
+
+    global _storage_client, _storage_client_pid
+
+    # If the process was forked, the client of the parent can not be reused
+    with _lock:
+        if _storage_client is None or _storage_client_pid != os.getpid():
+            _storage_client = storage.Client()
+            _storage_client_pid = os.getpid()
+            _buckets.clear()
+        return _storage_client
+
+
+def set_storage_client(storage_client) -> None:
+    """
+    Set the storage client shared by the process, use it with a fake client for tests
+
+    :param storage_client: Storage client, or None to create a new one on the next use
+    """
+
+    global _storage_client, _storage_client_pid
+
+    # Set the client and forget the bucket handles of the previous one
+    with _lock:
+        _storage_client = storage_client
+        _storage_client_pid = os.getpid()
+        _buckets.clear()
+
+
+def get_bucket(bucket_name: str):
+    """
+    Get the bucket handle from the cache, the metadata GET is done only the first time
+
+    :param bucket_name: Name of the bucket
+    :return: Bucket
+    """
+
+    # Return the bucket from the cache
+    storage_client = get_storage_client()
+    bucket = _buckets.get(bucket_name)
+    if bucket is not None:
+        return bucket
+
+    # Get bucket
+    try:
+        bucket = storage_client.get_bucket(bucket_name)
+    except NotFound as error:
+        raise MyBucketNotFoundError("Bucket not found") from error
+
+    # Save the bucket in the cache and return it
+    with _lock:
+        _buckets[bucket_name] = bucket
+    return bucket
+
 
 def get_media_type_from_filename(filename: str) -> str:
     """
@@ -92,11 +163,7 @@ def check_file_exists_from_gcs(
     """
 
     # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
+    bucket = get_bucket(bucket_name)
 
     # Get file
     blob = bucket.get_blob(blob_name)
@@ -107,6 +174,30 @@ def check_file_exists_from_gcs(
     return True
 
 
+def get_file_status_from_gcs(
+    bucket_name: str,
+    blob_name: str,
+) -> tuple[bool, str]:
+    """
+    Check if file exists in Google Cloud Storage and get its public URL with only one request
+
+    :param bucket_name: Name of the bucket
+    :param blob_name: Path to the file
+    :return: True and the public URL if file exists, False and an empty string if not
+    """
+
+    # Get bucket
+    bucket = get_bucket(bucket_name)
+
+    # Get file
+    blob = bucket.get_blob(blob_name)
+    if blob is None:
+        return False, ""
+
+    # Return True and public URL
+    return True, blob.public_url
+
+
 def get_public_url_from_gcs(
     bucket_name: str,
     blob_name: str,
@@ -120,11 +211,7 @@ def get_public_url_from_gcs(
     """
 
     # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
+    bucket = get_bucket(bucket_name)
 
     # Get file
     blob = bucket.get_blob(blob_name)
@@ -148,11 +235,7 @@ def get_file_from_gcs(
     """
 
     # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
+    bucket = get_bucket(bucket_name)
 
     # Get file
     blob = bucket.get_blob(blob_name)
@@ -184,11 +267,7 @@ def upload_file_to_gcs(
     #     raise MyFileNotAllowedError("File not allowed")
 
     # Get bucket
-    storage_client = storage.Client()
-    try:
-        bucket = storage_client.get_bucket(bucket_name)
-    except NotFound as error:
-        raise MyBucketNotFoundError("Bucket not found") from error
+    bucket = get_bucket(bucket_name)
 
     # Create blob
     blob = bucket.blob(blob_name)
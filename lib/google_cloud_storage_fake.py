@@ -0,0 +1,92 @@
+"""
+Google Cloud Storage Fake
+
+Local fake of the Google Cloud Storage client for tests, the blobs are kept in memory
+
+    from lib.google_cloud_storage import set_storage_client
+    from lib.google_cloud_storage_fake import FakeStorageClient
+
+    set_storage_client(FakeStorageClient(["mi-deposito"]))
+
+"""
+
+from google.cloud.exceptions import NotFound
+
+FAKE_BASE_URL = "https://storage.googleapis.com"
+
+
+class FakeBlob:
+    """Fake blob"""
+
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+
+    @property
+    def public_url(self) -> str:
+        """Public URL like the one of Google Cloud Storage"""
+        return f"{FAKE_BASE_URL}/{self.bucket.name}/{self.name}"
+
+    def exists(self) -> bool:
+        """True if the blob was uploaded"""
+        self.bucket.client.requests_count += 1
+        return self.name in self.bucket.files
+
+    def reload(self) -> None:
+        """Raise NotFound if the blob was not uploaded"""
+        if not self.exists():
+            raise NotFound(f"Blob {self.name} not found")
+        self.content_type = self.bucket.files[self.name][0]
+
+    def upload_from_string(self, data: bytes | str, content_type: str = None) -> None:
+        """Keep the content in memory"""
+        self.bucket.client.requests_count += 1
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        self.bucket.files[self.name] = (content_type, data)
+        self.content_type = content_type
+
+    def download_as_string(self) -> bytes:
+        """Return the content"""
+        self.bucket.client.requests_count += 1
+        if self.name not in self.bucket.files:
+            raise NotFound(f"Blob {self.name} not found")
+        return self.bucket.files[self.name][1]
+
+
+class FakeBucket:
+    """Fake bucket"""
+
+    def __init__(self, client: "FakeStorageClient", name: str):
+        self.client = client
+        self.name = name
+        self.files = {}
+
+    def blob(self, blob_name: str) -> FakeBlob:
+        """Blob handle, without request"""
+        return FakeBlob(self, blob_name)
+
+    def get_blob(self, blob_name: str) -> FakeBlob | None:
+        """Blob with its metadata, or None if it was not uploaded"""
+        blob = FakeBlob(self, blob_name)
+        try:
+            blob.reload()
+        except NotFound:
+            return None
+        return blob
+
+
+class FakeStorageClient:
+    """Fake storage client, counts the requests to check that the cache is working"""
+
+    def __init__(self, bucket_names: list[str] = None):
+        self.buckets = {name: FakeBucket(self, name) for name in bucket_names or []}
+        self.requests_count = 0
+
+    def get_bucket(self, bucket_name: str) -> FakeBucket:
+        """Bucket, raise NotFound if it does not exist"""
+        self.requests_count += 1
+        if bucket_name not in self.buckets:
+            raise NotFound(f"Bucket {bucket_name} not found")
+        return self.buckets[bucket_name]
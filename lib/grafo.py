@@ -0,0 +1,93 @@
+"""
+Grafo de tareas
+
+Ejecuta funciones que deben esperar a otras: cada una empieza en cuanto terminan aquellas de las que
+depende y las independientes corren al mismo tiempo en hilos. Si una falla, con MyAnyError o con cualquier
+otra excepción, se entrega como resultado no exitoso y las demás siguen. Los resultados se entregan conforme van terminando.
+
+    nodos = [
+        Nodo("NOMINAS", crear_a),
+        Nodo("PENSIONADOS", crear_b, depende_de=("NOMINAS",)),
+        Nodo("MONEDEROS", crear_c),
+    ]
+    for resultado in ejecutar_grafo(nodos, hilos=4):
+        resultado.nombre, resultado.es_exitoso, resultado.mensaje
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+from lib.exceptions import MyAnyError, MyNotValidParamError
+
+
+@dataclass(frozen=True)
+class Nodo:
+    """Función sin parámetros que entrega un mensaje, con los nombres de los nodos que deben terminar antes, bien o mal"""
+
+    nombre: str
+    funcion: Callable[[], str]
+    depende_de: tuple = ()
+
+
+@dataclass(frozen=True)
+class ResultadoNodo:
+    """Resultado de un nodo, con el mensaje que entregó o el de su error"""
+
+    nombre: str
+    es_exitoso: bool
+    mensaje: str
+
+
+def validar_grafo(nodos: list[Nodo]) -> None:
+    """Validar que los nombres no se repitan, que las dependencias existan y que no haya ciclos"""
+
+    # Validar nombres y dependencias
+    nombres = [nodo.nombre for nodo in nodos]
+    if len(set(nombres)) != len(nombres):
+        raise MyNotValidParamError("Hay nodos con el mismo nombre")
+    for nodo in nodos:
+        for dependencia in nodo.depende_de:
+            if dependencia not in nombres:
+                raise MyNotValidParamError(f"El nodo {nodo.nombre} depende de {dependencia} que no existe")
+
+    # Quitar los nodos cuyas dependencias ya se quitaron, si quedan nodos hay un ciclo
+    pendientes = {nodo.nombre: set(nodo.depende_de) for nodo in nodos}
+    while pendientes:
+        listos = [nombre for nombre, dependencias in pendientes.items() if not dependencias & pendientes.keys()]
+        if not listos:
+            raise MyNotValidParamError(f"Hay un ciclo entre {', '.join(sorted(pendientes))}")
+        for nombre in listos:
+            del pendientes[nombre]
+
+
+def ejecutar_grafo(nodos: list[Nodo], hilos: int = 4) -> Iterator[ResultadoNodo]:
+    """Ejecutar los nodos en hilos respetando sus dependencias, entrega cada resultado al terminar"""
+
+    # Validar antes de ejecutar cualquier nodo
+    validar_grafo(nodos)
+
+    pendientes = {nodo.nombre: nodo for nodo in nodos}
+    terminados = set()
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        en_curso = {}  # Futuro y nombre del nodo
+        while pendientes or en_curso:
+            # Lanzar los que ya tienen terminadas todas sus dependencias
+            for nombre, nodo in list(pendientes.items()):
+                if terminados.issuperset(nodo.depende_de):
+                    del pendientes[nombre]
+                    en_curso[ejecutor.submit(nodo.funcion)] = nombre
+
+            # Esperar a que termine al menos uno, como no hay ciclos siempre hay alguno en curso
+            hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                nombre = en_curso.pop(futuro)
+                terminados.add(nombre)
+                try:
+                    mensaje = futuro.result()
+                except MyAnyError as error:
+                    yield ResultadoNodo(nombre, False, str(error))
+                except Exception as error:  # Cualquier otro error, para que no detenga a los demás nodos
+                    yield ResultadoNodo(nombre, False, f"{type(error).__name__}: {error}")
+                else:
+                    yield ResultadoNodo(nombre, True, mensaje)
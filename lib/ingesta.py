@@ -0,0 +1,328 @@
+"""
+Ingesta
+
+Alimentar una quincena leyendo el archivo de explotación una sola vez.
+
+Cada fila se convierte en la Nomina y en una tabla larga (persona, concepto, importe) con sus
+percepciones y deducciones; las personas y los catálogos se revisan una sola vez con MapasCatalogos
+y al final se insertan en lotes las nominas y las percepciones-deducciones, sin hacer commit,
+para que quien llama guarde todo en una sola transacción.
+
+    registros = list(leer_explotacion(ruta))
+    resultado = ingestar_quincena(sesion, quincena, registros, fecha_final, fecha_pago)
+    sesion.commit()
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from lib.cargas_masivas import MapasCatalogos, actualizar_por_lotes, insertar_por_lotes
+from lib.exceptions import MyEmptyError, MyNotExistsError, MyNotValidParamError
+from lib.explotacion import RegistroExplotacion
+from lib.fechas import quincena_to_fecha, quinquenio_count
+from lib.safe_string import safe_quincena, safe_string
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.tabuladores.models import Tabulador
+
+
+@dataclass(slots=True)
+class FilaIngesta:
+    """Registro de explotación con su periodo validado, su tipo de nomina y su puesto"""
+
+    registro: RegistroExplotacion
+    desde: date
+    desde_clave: str
+    hasta: date
+    hasta_clave: str
+    tipo: str
+    puesto_clave: str
+
+
+@dataclass
+class ResultadoIngesta:
+    """Contadores y anomalías de la ingesta"""
+
+    centros_trabajos_insertados: int = 0
+    plazas_insertadas: int = 0
+    conceptos_insertados: list = field(default_factory=list)
+    personas_insertadas: int = 0
+    personas_actualizadas: int = 0
+    personas_actualizadas_del_tabulador: list = field(default_factory=list)
+    personas_actualizadas_del_modelo: list = field(default_factory=list)
+    personas_actualizadas_del_num_empleado: list = field(default_factory=list)
+    personas_sin_puestos: list = field(default_factory=list)
+    personas_sin_tabulador: list = field(default_factory=list)
+    nominas_insertadas: int = 0
+    percepciones_deducciones_insertadas: int = 0
+
+    def mensajes(self) -> list[tuple[str, str]]:
+        """Entregar los mensajes a mostrar, con su color"""
+        mensajes = []
+        if self.centros_trabajos_insertados > 0:
+            mensajes.append((f"Se insertaron {self.centros_trabajos_insertados} Centros de Trabajo", "green"))
+        if self.personas_actualizadas > 0:
+            mensajes.append((f"Se actualizaron {self.personas_actualizadas} Personas", "green"))
+            for item in self.personas_actualizadas_del_tabulador:
+                mensajes.append((item, "yellow"))
+            for item in self.personas_actualizadas_del_modelo:
+                mensajes.append((item, "yellow"))
+            for item in self.personas_actualizadas_del_num_empleado:
+                mensajes.append((item, "yellow"))
+        if self.personas_insertadas > 0:
+            mensajes.append((f"Se insertaron {self.personas_insertadas} Personas", "green"))
+        if self.plazas_insertadas > 0:
+            mensajes.append((f"Se insertaron {self.plazas_insertadas} Plazas", "green"))
+        if len(self.conceptos_insertados) > 0:
+            mensajes.append((f"Hubo {len(self.conceptos_insertados)} Conceptos que no existen:", "yellow"))
+            mensajes.append((", ".join(self.conceptos_insertados), "yellow"))
+        if len(self.personas_sin_puestos) > 0:
+            mensajes.append((f"Hubo {len(self.personas_sin_puestos)} Personas sin puestos.", "yellow"))
+            mensajes.append((", ".join(self.personas_sin_puestos), "yellow"))
+        if len(self.personas_sin_tabulador) > 0:
+            mensajes.append((f"Hubo {len(self.personas_sin_tabulador)} Personas sin tabulador.", "yellow"))
+            mensajes.append((", ".join(self.personas_sin_tabulador), "yellow"))
+        return mensajes
+
+
+def preparar_filas(registros: list[RegistroExplotacion]) -> list[FilaIngesta]:
+    """Validar el periodo de cada registro y definir su tipo de nomina y su puesto"""
+    filas = []
+    for registro in registros:
+        # Validar desde y hasta
+        try:
+            desde_clave = safe_quincena(registro.desde_s)
+            desde = quincena_to_fecha(desde_clave, dame_ultimo_dia=False)
+            hasta_clave = safe_quincena(registro.hasta_s)
+            hasta = quincena_to_fecha(hasta_clave, dame_ultimo_dia=True)
+        except ValueError as error:
+            raise MyNotValidParamError(f"Quincena inválida en '{registro.desde_s}' o '{registro.hasta_s}'") from error
+
+        # Si la fila tiene el concepto PME es DESPENSA, de lo contrario es SALARIO
+        tipo = Nomina.TIPOS["DESPENSA"] if registro.es_despensa else Nomina.TIPOS["SALARIO"]
+
+        # Si el modelo es 2, entonces en SINDICALIZADO y se toman 4 caracteres del puesto
+        puesto_clave = registro.puesto_clave[:4] if registro.modelo == 2 else registro.puesto_clave
+
+        filas.append(FilaIngesta(registro, desde, desde_clave, hasta, hasta_clave, tipo, puesto_clave))
+    return filas
+
+
+def revisar_personas(
+    mapas: MapasCatalogos,
+    filas: list[FilaIngesta],
+    fecha_final: date,
+    resultado: ResultadoIngesta,
+) -> tuple[list[dict], list[dict]]:
+    """Revisar con los diccionarios las personas de las filas, entrega las que se insertan y las que se actualizan"""
+
+    # Definir el puesto generico al que se van a relacionar las personas que no tengan su puesto
+    puesto_generico_id = mapas.puestos.get("ND")
+    if puesto_generico_id is None:
+        raise MyNotExistsError("Falta el puesto con clave ND.")
+
+    # Definir el tabulador generico al que se van a relacionar los puestos que no tengan su tabulador
+    tabulador_generico_id = mapas.sesion.scalar(select(Tabulador.id).filter_by(puesto_id=puesto_generico_id).limit(1))
+    if tabulador_generico_id is None:
+        raise MyNotExistsError("Falta el tabulador del puesto con clave ND.")
+
+    # Bucle por cada fila
+    personas_nuevas = {}
+    personas_por_actualizar = {}
+    for fila in filas:
+        registro = fila.registro
+        rfc = registro.rfc
+        modelo = registro.modelo
+        num_empleado = registro.num_empleado
+        quinquenios = registro.quinquenios
+
+        # Buscar el Puesto, si no existe se agrega a personas_sin_puestos y se le asigna el puesto_generico
+        puesto_id = mapas.puestos.get(fila.puesto_clave)
+        if puesto_id is None:
+            resultado.personas_sin_puestos.append(rfc)
+            puesto_id = puesto_generico_id
+
+        # Buscar la Persona
+        persona = mapas.personas.get(rfc)
+
+        # Si NO existe la Persona, se agrega
+        if persona is None:
+            # Separar nombre_completo, en apellido_primero, apellido_segundo y nombres
+            separado = safe_string(registro.nombre_completo, save_enie=True).split(" ")
+            apellido_primero = separado[0]
+            apellido_segundo = separado[1]
+            nombres = " ".join(separado[2:])
+
+            # Si el modelo es 2 y quinquenios es None, entonces es SINDICALIZADO y se calculan los quinquenios
+            if modelo == 2 and quinquenios is None:
+                fecha_ingreso = quincena_to_fecha(registro.quincena_ingreso, dame_ultimo_dia=False)
+                quinquenios = quinquenio_count(fecha_ingreso, fecha_final)
+
+            # Buscar el tabulador, si no existe se agrega a personas_sin_tabulador y se le asigna el tabulador_generico
+            tabulador_id = mapas.buscar_tabulador_id(puesto_id, modelo, registro.nivel, quinquenios)
+            if tabulador_id is None:
+                resultado.personas_sin_tabulador.append(rfc)
+                tabulador_id = tabulador_generico_id
+
+            # Agregar a la Persona a las que se van a insertar
+            personas_nuevas[rfc] = {
+                "tabulador_id": tabulador_id,
+                "rfc": rfc,
+                "nombres": nombres,
+                "apellido_primero": apellido_primero,
+                "apellido_segundo": apellido_segundo,
+                "modelo": modelo,
+                "num_empleado": num_empleado,
+            }
+            mapas.personas[rfc] = {
+                "id": None,
+                "tabulador_id": tabulador_id,
+                "modelo": modelo,
+                "num_empleado": num_empleado,
+                "nombre_completo": f"{nombres} {apellido_primero} {apellido_segundo}",
+            }
+            resultado.personas_insertadas += 1
+            continue
+
+        # Si la fila es concepto PME NO va tener los quinquenios, entonces se define con la Persona
+        if quinquenios is None:
+            quinquenios = mapas.tabuladores_quinquenios.get(persona["tabulador_id"])
+
+        # Buscar el tabulador, si no existe se agrega a personas_sin_tabulador y se le asigna el tabulador_generico
+        tabulador_id = mapas.buscar_tabulador_id(puesto_id, modelo, registro.nivel, quinquenios)
+        if tabulador_id is None:
+            resultado.personas_sin_tabulador.append(rfc)
+            tabulador_id = tabulador_generico_id
+
+        # Revisar si cambia la Persona de tabulador, modelo o num_empleado
+        hay_cambios = False
+        if persona["tabulador_id"] != tabulador_id:
+            resultado.personas_actualizadas_del_tabulador.append(
+                f"{rfc} {persona['nombre_completo']}: Tabulador: {persona['tabulador_id']} -> {tabulador_id}"
+            )
+            persona["tabulador_id"] = tabulador_id
+            hay_cambios = True
+        if persona["modelo"] != modelo:
+            resultado.personas_actualizadas_del_modelo.append(
+                f"{rfc} {persona['nombre_completo']}: Modelo: {persona['modelo']} -> {modelo}"
+            )
+            persona["modelo"] = modelo
+            hay_cambios = True
+        if persona["num_empleado"] != num_empleado:
+            resultado.personas_actualizadas_del_num_empleado.append(
+                f"{rfc} {persona['nombre_completo']}: Num. Emp. {persona['num_empleado']} -> {num_empleado}"
+            )
+            persona["num_empleado"] = num_empleado
+            hay_cambios = True
+
+        # Si hay cambios, juntarlos para actualizar en lote, o cambiar la persona que se va a insertar
+        if hay_cambios:
+            cambios = {
+                "tabulador_id": persona["tabulador_id"],
+                "modelo": persona["modelo"],
+                "num_empleado": persona["num_empleado"],
+            }
+            if persona["id"] is None:
+                personas_nuevas[rfc].update(cambios)
+            else:
+                personas_por_actualizar[persona["id"]] = {"id": persona["id"], **cambios}
+            resultado.personas_actualizadas += 1
+
+    # Entregar las personas a insertar y a actualizar
+    return list(personas_nuevas.values()), list(personas_por_actualizar.values())
+
+
+def tabla_conceptos(filas: list[FilaIngesta]) -> list[tuple[FilaIngesta, str, float]]:
+    """Convertir los bloques de conceptos de cada fila en una tabla larga de (fila, concepto_clave, importe)"""
+    return [(fila, concepto.clave, concepto.importe) for fila in filas for concepto in fila.registro.conceptos]
+
+
+def ingestar_quincena(
+    sesion: Session,
+    quincena: Quincena,
+    registros: list[RegistroExplotacion],
+    fecha_final: date,
+    fecha_pago: datetime,
+    percepciones_deducciones: bool = True,
+    percepciones_deducciones_tipo: str = "SALARIO",
+    probar: bool = False,
+) -> ResultadoIngesta:
+    """Alimentar las nominas y las percepciones-deducciones de la quincena con los registros, sin hacer commit"""
+
+    # Validar los periodos y definir el tipo de cada fila, antes de cambiar la base de datos
+    filas = preparar_filas(registros)
+    if len(filas) == 0:
+        raise MyEmptyError("No hay registros en el archivo de explotación.")
+
+    # Convertir los conceptos en la tabla larga
+    conceptos = tabla_conceptos(filas) if percepciones_deducciones else []
+
+    # Cargar los catalogos en diccionarios, para no consultar la base de datos por cada fila
+    mapas = MapasCatalogos(sesion)
+    resultado = ResultadoIngesta()
+
+    # Insertar en un solo lote los centros de trabajo, las plazas y los conceptos que no existan
+    if probar is False:
+        resultado.centros_trabajos_insertados = mapas.insertar_centros_trabajos(
+            {fila.registro.centro_trabajo_clave for fila in filas}
+        )
+        resultado.plazas_insertadas = mapas.insertar_plazas({fila.registro.plaza_clave for fila in filas})
+    conceptos_claves = {concepto_clave for _, concepto_clave, _ in conceptos}
+    resultado.conceptos_insertados = sorted(clave for clave in conceptos_claves if clave not in mapas.conceptos)
+    if probar is False:
+        mapas.insertar_conceptos(conceptos_claves)
+
+    # Revisar las personas, una sola vez para las nominas y las percepciones-deducciones
+    personas_nuevas, personas_por_actualizar = revisar_personas(mapas, filas, fecha_final, resultado)
+    resultado.nominas_insertadas = len(filas)
+    resultado.percepciones_deducciones_insertadas = len(conceptos)
+    if probar:
+        return resultado
+
+    # Insertar las personas nuevas y actualizar las que cambiaron, en lotes
+    mapas.insertar_personas(personas_nuevas)
+    actualizar_por_lotes(sesion, Persona, personas_por_actualizar)
+
+    # Insertar las nominas en lotes, ya con los id de los centros de trabajo, las plazas y las personas
+    nominas_por_insertar = [
+        {
+            "centro_trabajo_id": mapas.centros_trabajos[fila.registro.centro_trabajo_clave],
+            "persona_id": mapas.personas[fila.registro.rfc]["id"],
+            "plaza_id": mapas.plazas[fila.registro.plaza_clave],
+            "quincena_id": quincena.id,
+            "desde": fila.desde,
+            "desde_clave": fila.desde_clave,
+            "hasta": fila.hasta,
+            "hasta_clave": fila.hasta_clave,
+            "percepcion": fila.registro.percepcion,
+            "deduccion": fila.registro.deduccion,
+            "importe": fila.registro.importe,
+            "tipo": fila.tipo,
+            "fecha_pago": fecha_pago,
+        }
+        for fila in filas
+    ]
+    insertar_por_lotes(sesion, Nomina, nominas_por_insertar)
+
+    # Insertar las percepciones-deducciones en lotes
+    percepciones_deducciones_por_insertar = [
+        {
+            "centro_trabajo_id": mapas.centros_trabajos[fila.registro.centro_trabajo_clave],
+            "concepto_id": mapas.conceptos[concepto_clave],
+            "persona_id": mapas.personas[fila.registro.rfc]["id"],
+            "plaza_id": mapas.plazas[fila.registro.plaza_clave],
+            "quincena_id": quincena.id,
+            "importe": importe,
+            "tipo": percepciones_deducciones_tipo,
+        }
+        for fila, concepto_clave, importe in conceptos
+    ]
+    insertar_por_lotes(sesion, PercepcionDeduccion, percepciones_deducciones_por_insertar)
+
+    # Entregar el resultado
+    return resultado
@@ -1,11 +1,44 @@
 """
 Tareas en el fondo
+
+El último evento del progreso se conserva en Redis en tareas:ultimo:{tarea_id},
+para que /tareas/<tarea_id>/progreso lo entregue como JSON al navegador que lo consulta cada pocos segundos.
+La tabla tareas solo se escribe al iniciar (progreso 0) y al terminar (progreso 100 o error),
+así los generadores pueden reportar su avance por renglones sin escribir en la base de datos.
 """
 
+import json
+
+from redis.exceptions import RedisError
 from rq import get_current_job
 
 from perseo.blueprints.tareas.models import Tarea
 
+TAREAS_EVENTOS_TTL = 3600  # Segundos que se conserva el último evento de cada tarea
+
+
+def get_task_last_event_key(tarea_id: str) -> str:
+    """Clave de Redis con el último evento de la tarea"""
+    return f"tareas:ultimo:{tarea_id}"
+
+
+def save_task_last_event(job, progress: int, message: str, archivo: str = "", url: str = "", error: bool = False) -> None:
+    """Conservar el evento como el último de la tarea"""
+    evento = json.dumps(
+        {
+            "progreso": progress,
+            "mensaje": message,
+            "archivo": archivo,
+            "url": url,
+            "ha_terminado": progress >= 100,
+            "error": error,
+        }
+    )
+    try:
+        job.connection.setex(get_task_last_event_key(job.get_id()), TAREAS_EVENTOS_TTL, evento)
+    except RedisError:
+        pass
+
 
 def set_task_progress(progress: int, message: str, archivo: str = "", url: str = "") -> None:
     """Cambiar el progreso de la tarea"""
@@ -13,6 +46,10 @@ def set_task_progress(progress: int, message: str, archivo: str = "", url: str =
     if job:
         job.meta["progress"] = progress
         job.save_meta()
+        save_task_last_event(job, progress, message, archivo, url)
+        # Los avances intermedios solo se conservan en Redis, la tabla tareas se escribe al iniciar y al terminar
+        if 0 < progress < 100:
+            return
         tarea = Tarea.query.get(job.get_id())
         if tarea:
             hay_cambios = False
@@ -41,6 +78,7 @@ def set_task_error(message: str) -> str:
     if job:
         job.meta["progress"] = 100
         job.save_meta()
+        save_task_last_event(job, 100, message, error=True)
         tarea = Tarea.query.get(job.get_id())
         if tarea:
             tarea.ha_terminado = True
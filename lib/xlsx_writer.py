@@ -0,0 +1,49 @@
+"""
+XLSX Writer
+
+Escribir archivos XLSX con un libro de openpyxl de solo escritura (write_only),
+las filas se mandan al archivo conforme llegan, así la memoria no crece con la cantidad de filas.
+
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
+
+    # Agregar la fila con las cabeceras de las columnas
+    libro.append(["ID", "CLAVE", "DESCRIPCION"])
+
+    # Agregar las filas desde una consulta que entrega de mil en mil, entrega cuantas se agregaron
+    centros_trabajos = CentroTrabajo.query.order_by(CentroTrabajo.clave).yield_per(1000)
+    contador = libro.append_rows([c.id, c.clave, c.descripcion] for c in centros_trabajos)
+
+    # Guardar el archivo XLSX, solo se puede guardar una vez
+    libro.save(ruta_local_archivo_xlsx)
+"""
+
+from pathlib import Path
+from typing import Iterable
+
+from openpyxl import Workbook
+
+
+class XLSXWriter:
+    """Libro XLSX de solo escritura"""
+
+    def __init__(self, titulo: str = None):
+        self.libro = Workbook(write_only=True)
+        self.hoja = self.libro.create_sheet(title=titulo)
+
+    def append(self, fila: list) -> None:
+        """Agregar una fila"""
+        self.hoja.append(fila)
+
+    def append_rows(self, filas: Iterable[list]) -> int:
+        """Agregar las filas que entregue un iterable o generador, entrega la cantidad agregada"""
+        cantidad = 0
+        for fila in filas:
+            self.append(fila)
+            cantidad += 1
+        return cantidad
+
+    def save(self, ruta: str | Path) -> str:
+        """Guardar el archivo XLSX, entrega la ruta"""
+        self.libro.save(str(ruta))
+        return str(ruta)
@@ -2,10 +2,10 @@
 Bancos, modelos
 """
 
-from typing import List
+from typing import Iterator, List
 
-from sqlalchemy import String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, case, select, update
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from lib.universal_mixin import UniversalMixin
 from perseo.extensions import database
@@ -34,3 +34,32 @@ class Banco(database.Model, UniversalMixin):
     def __repr__(self):
         """Representación"""
         return f"<Banco {self.clave}>"
+
+
+def reservar_consecutivos(sesion: Session, cantidades: dict[int, int]) -> dict[int, Iterator[int]]:
+    """Reservar un bloque contiguo de consecutivos_generado por banco, entrega {banco_id: iterador de consecutivos}
+
+    Con cantidades {banco_id: cuantos} se bloquean los bancos y se incrementan en un solo UPDATE ... RETURNING,
+    los consecutivos se toman de memoria con next(). Los bancos quedan bloqueados hasta el commit,
+    así dos generadores al mismo tiempo reciben bloques que no se enciman.
+    """
+
+    # Quitar los bancos sin consecutivos por reservar
+    cantidades = {banco_id: cantidad for banco_id, cantidad in cantidades.items() if cantidad > 0}
+    if len(cantidades) == 0:
+        return {}
+
+    # Bloquear los bancos siempre en el mismo orden para que dos generadores no se esperen uno al otro
+    sesion.execute(select(Banco.id).where(Banco.id.in_(cantidades)).order_by(Banco.id).with_for_update())
+
+    # Incrementar cada banco con su cantidad y tomar el ultimo consecutivo reservado
+    sentencia = (
+        update(Banco)
+        .where(Banco.id.in_(cantidades))
+        .values(consecutivo_generado=Banco.consecutivo_generado + case(cantidades, value=Banco.id))
+        .returning(Banco.id, Banco.consecutivo_generado)
+    )
+    reservados = {}
+    for banco_id, ultimo in sesion.execute(sentencia):
+        reservados[banco_id] = iter(range(ultimo - cantidades[banco_id] + 1, ultimo + 1))
+    return reservados
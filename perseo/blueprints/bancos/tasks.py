@@ -6,21 +6,17 @@ import logging
 
 from lib.exceptions import MyAnyError, MyNotExistsError
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/bancos.log")
+empunadura = logging.FileHandler("logs/bancos.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def reiniciar_consecutivos_generados():
     """Reiniciar los consecutivos generados de cada banco con el consecutivo"""
@@ -56,6 +52,7 @@ def reiniciar_consecutivos_generados():
     return f"Reiniciar Consecutivos Generados: {len(bancos_actualizados)} cambios en {' ,'.join(bancos_actualizados)}"
 
 
+@con_aplicacion
 def lanzar_reiniciar_consecutivos_generados():
     """Reiniciar los consecutivos generados de cada banco con el consecutivo"""
 
@@ -7,7 +7,6 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -20,9 +19,9 @@ from lib.exceptions import (
 )
 from lib.google_cloud_storage import upload_file_to_gcs
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.conceptos.models import Concepto
-from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 GCS_BASE_DIRECTORY = "conceptos"
 LOCAL_BASE_DIRECTORY = "exports/conceptos"
@@ -31,30 +30,23 @@ TIMEZONE = "America/Mexico_City"
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/conceptos.log")
+empunadura = logging.FileHandler("logs/conceptos.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def exportar_xlsx() -> tuple[str, str, str]:
     """Exportar Conceptos a un archivo XLSX"""
     bitacora.info("Inicia exportar Conceptos a un archivo XLSX")
 
-    # Consultar Conceptos
-    conceptos = Concepto.query.filter_by(estatus="A").order_by(Concepto.clave).all()
-
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Consultar Conceptos, se leen de mil en mil para no cargarlos todos en memoria
+    conceptos = Concepto.query.filter_by(estatus="A").order_by(Concepto.clave).yield_per(1000)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "ID",
             "CLAVE",
@@ -62,22 +54,15 @@ def exportar_xlsx() -> tuple[str, str, str]:
         ]
     )
 
-    # Inicializar el contador
-    contador = 0
-
-    # Bucle por los Conceptos
-    for concepto in conceptos:
-        # Agregar la fila con los datos
-        hoja.append(
-            [
-                concepto.id,
-                concepto.clave,
-                concepto.descripcion,
-            ]
-        )
-
-        # Incrementar el contador
-        contador += 1
+    # Agregar las filas con los datos conforme se leen de la consulta, entrega cuantas se agregaron
+    contador = libro.append_rows(
+        [
+            concepto.id,
+            concepto.clave,
+            concepto.descripcion,
+        ]
+        for concepto in conceptos
+    )
 
     # Si el contador es cero, entonces no hay Conceptos
     if contador == 0:
@@ -127,6 +112,7 @@ def exportar_xlsx() -> tuple[str, str, str]:
     return mensaje_termino, nombre_archivo_xlsx, public_url
 
 
+@con_aplicacion
 def lanzar_exportar_xlsx():
     """Exportar Conceptos a un archivo XLSX"""
 
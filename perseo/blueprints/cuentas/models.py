@@ -2,12 +2,18 @@
 Cuentas, modelos
 """
 
-from sqlalchemy import ForeignKey, String
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from itertools import chain
+
+from sqlalchemy import Connection, ForeignKey, String, event, func, inspect, or_, select, update
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from lib.universal_mixin import UniversalMixin
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.personas.models import Persona
 from perseo.extensions import database
 
+BANCO_MONEDERO_CLAVE = "9"  # Clave del banco de los monederos (DESPENSA)
+
 
 class Cuenta(database.Model, UniversalMixin):
     """Cuenta"""
@@ -30,3 +36,58 @@ class Cuenta(database.Model, UniversalMixin):
     def __repr__(self):
         """Representación"""
         return f"<Cuenta {self.id}>"
+
+
+def actualizar_cuentas_principales(conexion: Connection, personas_ids: set = None) -> int:
+    """Actualizar en personas cuenta_nomina_id y cuenta_monedero_id, de todas o solo de personas_ids
+
+    La cuenta de nomina es la primera activa que NO es del banco 9 y la de monedero la primera activa del banco 9.
+    Solo se modifican las personas en las que cambian, entrega cuantas fueron.
+    """
+
+    # Subconsultas con la primera cuenta activa de cada persona, con y sin el banco de los monederos
+    primeras = []
+    for es_monedero in (False, True):
+        condicion = Banco.clave == BANCO_MONEDERO_CLAVE if es_monedero else Banco.clave != BANCO_MONEDERO_CLAVE
+        consulta = (
+            select(func.min(Cuenta.id))
+            .join(Banco, Cuenta.banco_id == Banco.id)
+            .where(Cuenta.persona_id == Persona.id, Cuenta.estatus == "A", condicion)
+        )
+        primeras.append(consulta.correlate(Persona).scalar_subquery())
+    cuenta_nomina_id, cuenta_monedero_id = primeras
+
+    # Actualizar solo las personas en las que cambian
+    sentencia = (
+        update(Persona)
+        .where(
+            or_(
+                Persona.cuenta_nomina_id.is_distinct_from(cuenta_nomina_id),
+                Persona.cuenta_monedero_id.is_distinct_from(cuenta_monedero_id),
+            )
+        )
+        .values(cuenta_nomina_id=cuenta_nomina_id, cuenta_monedero_id=cuenta_monedero_id)
+    )
+    if personas_ids is not None:
+        sentencia = sentencia.where(Persona.id.in_(personas_ids))
+    return conexion.execute(sentencia).rowcount
+
+
+@event.listens_for(Session, "after_flush")
+def actualizar_cuentas_principales_al_guardar(sesion: Session, _flush_context) -> None:
+    """Al guardar cuentas, actualizar las cuentas principales de sus personas, o las de todas si cambia la clave de un banco"""
+
+    # Juntar las personas de las cuentas agregadas, modificadas o eliminadas, incluso si se cambiaron de persona
+    personas_ids = set()
+    for instancia in chain(sesion.new, sesion.dirty, sesion.deleted):
+        if isinstance(instancia, Cuenta):
+            personas_ids.add(instancia.persona_id)
+            personas_ids.update(inspect(instancia).attrs.persona_id.history.deleted)
+        elif isinstance(instancia, Banco) and inspect(instancia).attrs.clave.history.has_changes():
+            actualizar_cuentas_principales(sesion.connection())
+            return
+    personas_ids.discard(None)
+
+    # Actualizar en la misma transaccion
+    if personas_ids:
+        actualizar_cuentas_principales(sesion.connection(), personas_ids)
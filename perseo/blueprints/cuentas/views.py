@@ -7,7 +7,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import get_datatable_parameters, output_datatable_json, project_columns
 from lib.safe_string import safe_clave, safe_message, safe_rfc, safe_string
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.bitacoras.models import Bitacora
@@ -68,8 +68,18 @@ def datatable_json():
         consulta = consulta.filter(
             Persona.apellido_segundo.contains(safe_string(request.form["persona_apellido_segundo"], save_enie=True))
         )
+    # Declarar las columnas que se entregan, las relaciones se unen en la misma consulta
+    columnas = {
+        "id": Cuenta.id,
+        "persona_rfc": (Cuenta.persona, Persona.rfc),
+        "persona_nombres": (Cuenta.persona, Persona.nombres),
+        "persona_apellido_primero": (Cuenta.persona, Persona.apellido_primero),
+        "persona_apellido_segundo": (Cuenta.persona, Persona.apellido_segundo),
+        "banco_nombre": (Cuenta.banco, Banco.nombre),
+        "num_cuenta": Cuenta.num_cuenta,
+    }
     # Ordenar y paginar
-    registros = consulta.order_by(Cuenta.id).offset(start).limit(rows_per_page).all()
+    registros = project_columns(consulta, columnas).order_by(Cuenta.id).offset(start).limit(rows_per_page).all()
     total = consulta.count()
     # Elaborar datos para DataTable
     data = []
@@ -80,9 +90,11 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("cuentas.detail", cuenta_id=resultado.id),
                 },
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "banco_nombre": resultado.banco.nombre,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": (
+                    f"{resultado.persona_nombres} {resultado.persona_apellido_primero} {resultado.persona_apellido_segundo}"
+                ),
+                "banco_nombre": resultado.banco_nombre,
                 "num_cuenta": resultado.num_cuenta,
             }
         )
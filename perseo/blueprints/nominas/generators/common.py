@@ -2,31 +2,40 @@
 Nominas, comunes para los generadores
 """
 
+import hashlib
 import logging
 import re
 
+from sqlalchemy import func, select
+
 from lib.exceptions import MyNotExistsError, MyNotValidParamError
 from lib.safe_string import QUINCENA_REGEXP
-from perseo.app import create_app
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.conceptos.models import Concepto
+from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.quincenas_productos.models import QuincenaProducto
+from perseo.blueprints.tabuladores.models import Tabulador
 from perseo.extensions import database
 
 GCS_BASE_DIRECTORY = "nominas"
 LOCAL_BASE_DIRECTORY = "reports/nominas"
 TIMEZONE = "America/Mexico_City"
+HUELLA_VERSION = 2  # Incrementar cuando cambie el contenido de los archivos, para no reutilizar los anteriores
 
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/nominas.log")
+empunadura = logging.FileHandler("logs/nominas.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def consultar_validar_quincena(quincena_clave: str) -> Quincena:
     """Consultar y validar la quincena"""
@@ -62,6 +71,7 @@ def actualizar_quincena_producto(
     archivo: str = "",
     url: str = "",
     es_satisfactorio: bool = False,
+    huella: str = "",
 ) -> QuincenaProducto:
     """Actualizar la quincena_producto"""
 
@@ -77,6 +87,7 @@ def actualizar_quincena_producto(
             archivo=archivo,
             es_satisfactorio=es_satisfactorio,
             fuente=fuente,
+            huella=huella,
             mensajes="\n".join(mensajes),
             url=url,
         )
@@ -86,9 +97,143 @@ def actualizar_quincena_producto(
         quincena_producto.archivo = archivo
         quincena_producto.es_satisfactorio = es_satisfactorio
         quincena_producto.fuente = fuente
+        quincena_producto.huella = huella
         quincena_producto.mensajes = "\n".join(mensajes)
         quincena_producto.url = url
     quincena_producto.save()
 
     # Entregar la quincena_producto
     return quincena_producto
+
+
+def consultar_percepciones_deducciones_pivote(quincena_id: int, tipo: str) -> tuple[dict, dict]:
+    """Consultar las P-D de la quincena y el tipo, entrega {persona_id: {concepto_clave: importe}} y los duplicados
+
+    Si una persona tiene varias P-D con el mismo concepto NO se suman, se conserva el importe de la última como antes,
+    y se entregan en {persona_id: [concepto_clave, ...]} para avisar.
+    """
+
+    # Consultar los importes con la clave del concepto, ordenados para que la última P-D sea la que se conserva
+    consulta = (
+        select(PercepcionDeduccion.persona_id, Concepto.clave, PercepcionDeduccion.importe)
+        .join(Concepto, PercepcionDeduccion.concepto_id == Concepto.id)
+        .where(PercepcionDeduccion.quincena_id == quincena_id)
+        .where(PercepcionDeduccion.tipo == tipo)
+        .order_by(PercepcionDeduccion.id)
+    )
+
+    # Armar la matriz con las personas como renglones y los conceptos como columnas, juntando los duplicados
+    pivote = {}
+    duplicados = {}
+    for persona_id, concepto_clave, importe in database.session.execute(consulta):
+        importes = pivote.setdefault(persona_id, {})
+        if concepto_clave in importes:
+            duplicados.setdefault(persona_id, []).append(concepto_clave)
+        importes[concepto_clave] = importe
+
+    # Entregar la matriz y los duplicados
+    return pivote, duplicados
+
+
+def consultar_plazas_claves() -> dict:
+    """Consultar las plazas de una sola vez, entrega {plaza_id: plaza_clave}"""
+    return dict(database.session.execute(select(Plaza.id, Plaza.clave)).all())
+
+
+def consultar_cuentas_duplicadas() -> set:
+    """Consultar de una sola vez las cuentas activas que tienen varias personas, entrega {(banco_id, num_cuenta)}"""
+    consulta = (
+        select(Cuenta.banco_id, Cuenta.num_cuenta)
+        .where(Cuenta.estatus == "A")
+        .group_by(Cuenta.banco_id, Cuenta.num_cuenta)
+        .having(func.count(func.distinct(Cuenta.persona_id)) > 1)
+    )
+    return {(banco_id, num_cuenta) for banco_id, num_cuenta in database.session.execute(consulta)}
+
+
+def calcular_huella_datos(quincena_id: int) -> str:
+    """Calcular la huella de los datos que usan los generadores, cambia si se agregan, modifican o eliminan registros
+
+    Se calcula antes de cargar los datos, así un cambio a la mitad hace que la huella no coincida la siguiente vez.
+    De las nominas se toman sus columnas, sin num_cheque ni timbrado_id, porque los generadores y los timbrados
+    los fijan después y con ellos cambia su modificado.
+    """
+    sesion = database.session
+    sha256 = hashlib.sha256(repr((HUELLA_VERSION, quincena_id)).encode("utf8"))
+
+    # Nominas de la quincena: las columnas que van en los archivos
+    consulta = (
+        select(
+            Nomina.id,
+            Nomina.centro_trabajo_id,
+            Nomina.persona_id,
+            Nomina.plaza_id,
+            Nomina.tipo,
+            Nomina.desde_clave,
+            Nomina.hasta_clave,
+            Nomina.percepcion,
+            Nomina.deduccion,
+            Nomina.importe,
+            Nomina.fecha_pago,
+            Nomina.estatus,
+        )
+        .where(Nomina.quincena_id == quincena_id)
+        .order_by(Nomina.id)
+    )
+    for fila in sesion.execute(consulta.execution_options(yield_per=1000)):
+        sha256.update(repr(tuple(fila)).encode("utf8"))
+
+    # P-D de la quincena: cantidad, ultimo id y ultima modificacion
+    partes = []
+    consulta = select(
+        func.count(PercepcionDeduccion.id), func.max(PercepcionDeduccion.id), func.max(PercepcionDeduccion.modificado)
+    )
+    partes.append(tuple(sesion.execute(consulta.where(PercepcionDeduccion.quincena_id == quincena_id)).one()))
+
+    # Personas, cuentas y catalogos: cantidad, ultimo id y ultima modificacion
+    for modelo in (Persona, Cuenta, Tabulador, Puesto, CentroTrabajo, Plaza, Concepto):
+        consulta = select(func.count(modelo.id), func.max(modelo.id), func.max(modelo.modificado))
+        partes.append(tuple(sesion.execute(consulta).one()))
+
+    # Bancos: su modificado cambia con cada consecutivo generado, por eso se toman las columnas que van en los archivos
+    consulta = select(Banco.id, Banco.clave, Banco.nombre, Banco.clave_dispersion_pensionados, Banco.estatus)
+    partes.append([tuple(fila) for fila in sesion.execute(consulta.order_by(Banco.id))])
+
+    # Entregar el SHA-256
+    sha256.update(repr(partes).encode("utf8"))
+    return sha256.hexdigest()
+
+
+def calcular_huella(huella_datos: str, *parametros) -> str:
+    """Calcular la huella de un producto, con la huella de los datos y los parametros del generador"""
+    return hashlib.sha256(repr((huella_datos, *parametros)).encode("utf8")).hexdigest()
+
+
+def reutilizar_quincena_producto(quincena_producto_id: int, quincena_id: int, fuente: str, huella: str) -> str | None:
+    """Si hay un producto anterior con archivo y la misma huella, copiarlo a quincena_producto y entregar el mensaje"""
+
+    # Consultar el primer producto de la quincena y la fuente con archivo y los mismos datos, el que genero el archivo
+    anterior = (
+        QuincenaProducto.query.filter_by(quincena_id=quincena_id, fuente=fuente, huella=huella, estatus="A")
+        .filter(QuincenaProducto.archivo != "")
+        .filter(QuincenaProducto.id != quincena_producto_id)
+        .order_by(QuincenaProducto.id)
+        .first()
+    )
+    if anterior is None:
+        return None
+
+    # Copiar el archivo, el URL y los mensajes del anterior
+    mensaje = f"Sin cambios desde el producto {anterior.id}, se reutiliza {anterior.archivo}"
+    actualizar_quincena_producto(
+        quincena_producto_id=quincena_producto_id,
+        quincena_id=quincena_id,
+        fuente=fuente,
+        mensajes=[mensaje, anterior.mensajes],
+        archivo=anterior.archivo,
+        url=anterior.url,
+        es_satisfactorio=anterior.es_satisfactorio,
+        huella=huella,
+    )
+    bitacora.info(mensaje)
+    return mensaje
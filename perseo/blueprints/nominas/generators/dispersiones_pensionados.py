@@ -6,7 +6,6 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -18,16 +17,19 @@ from lib.exceptions import (
     MyUploadError,
 )
 from lib.google_cloud_storage import upload_file_to_gcs
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
     LOCAL_BASE_DIRECTORY,
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
+    calcular_huella,
+    calcular_huella_datos,
     consultar_validar_quincena,
+    reutilizar_quincena_producto,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 
 FUENTE = "DISPERSIONES PENSIONADOS"
 
@@ -36,8 +38,9 @@ def crear_dispersiones_pensionados(
     quincena_clave: str,
     quincena_producto_id: int,
     tipo: str = "SALARIO",
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con las dispersiones pensionados de una quincena"""
+    """Crear archivo XLSX con las dispersiones pensionados de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Validar el tipo
     if tipo not in ["SALARIO", "AGUINALDO"]:
@@ -49,15 +52,17 @@ def crear_dispersiones_pensionados(
     # Mandar mensaje de inicio a la bitacora
     bitacora.info("Inicia crear dispersiones pensionados %s %s", quincena_clave, tipo)
 
-    # Consultar las nominas de la quincena
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Si los datos no cambiaron desde un producto anterior, reutilizar su archivo
+    huella_datos = snapshot.huella_datos if snapshot is not None else calcular_huella_datos(quincena.id)
+    huella = calcular_huella(huella_datos, FUENTE, tipo)
+    mensaje_reutilizado = reutilizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, huella)
+    if mensaje_reutilizado is not None:
+        return f"Crear dispersiones pensionados: {mensaje_reutilizado}"
+
+    # Cargar de una vez las nominas de la quincena del tipo
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas(tipo)
 
     # Si no hay nominas, provocar error y salir
     if len(nominas) == 0:
@@ -65,14 +70,11 @@ def crear_dispersiones_pensionados(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "CONSECUTIVO",
             "FORMA DE PAGO",
@@ -96,20 +98,8 @@ def crear_dispersiones_pensionados(
         if nomina.persona.modelo != 3:
             continue
 
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se le crea una cuenta con el banco 10
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
-
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
 
         # Si no tiene cuenta bancaria, entonces se le crea una cuenta con el banco 10
         if su_cuenta is None:
@@ -123,7 +113,7 @@ def crear_dispersiones_pensionados(
         concepto_pago = f"QUINCENA {quincena_clave[-2:]} PENSIONADOS"
 
         # Agregar la fila
-        hoja.append(
+        libro.append(
             [
                 contador + 1,
                 "04",
@@ -211,6 +201,7 @@ def crear_dispersiones_pensionados(
         archivo=nombre_archivo_xlsx,
         url=public_url,
         es_satisfactorio=es_satisfactorio,
+        huella=huella,
     )
 
     # Entregar mensaje de termino
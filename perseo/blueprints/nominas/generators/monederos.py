@@ -6,9 +6,9 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
+from lib.cargas_masivas import actualizar_por_lotes
 from lib.exceptions import (
     MyBucketNotFoundError,
     MyEmptyError,
@@ -18,7 +18,8 @@ from lib.exceptions import (
     MyUploadError,
 )
 from lib.google_cloud_storage import upload_file_to_gcs
-from perseo.blueprints.bancos.models import Banco
+from lib.xlsx_writer import XLSXWriter
+from perseo.blueprints.bancos.models import Banco, reservar_consecutivos
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
     LOCAL_BASE_DIRECTORY,
@@ -28,8 +29,8 @@ from perseo.blueprints.nominas.generators.common import (
     consultar_validar_quincena,
     database,
 )
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
 
 FUENTE = "MONEDEROS"
 
@@ -38,8 +39,9 @@ def crear_monederos(
     quincena_clave: str,
     quincena_producto_id: int,
     fijar_num_cheque=False,
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con los monederos de una quincena"""
+    """Crear archivo XLSX con los monederos de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Consultar y validar quincena
     quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
@@ -60,15 +62,10 @@ def crear_monederos(
     # Igualar el consecutivo_generado al consecutivo
     banco.consecutivo_generado = banco.consecutivo
 
-    # Consultar las nominas de la quincena solo tipo DESPENSA
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == "DESPENSA")
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Cargar de una vez las nominas de la quincena solo tipo DESPENSA
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas("DESPENSA")
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -76,14 +73,11 @@ def crear_monederos(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyNotExistsError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "CT_CLASIF",
             "RFC",
@@ -95,64 +89,57 @@ def crear_monederos(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van en el archivo XLSX con la cuenta de cada persona
     personas_sin_cuentas = []
+    filas = []
     for nomina in nominas:
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
-
-        # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave == "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        # Tomar la cuenta de la persona que tenga la clave 9, porque esa clave es la de DESPENSA
+        su_cuenta = snapshot.cuenta_monedero(nomina.persona_id)
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
             personas_sin_cuentas.append(nomina.persona)
             continue
 
-        # Incrementar el consecutivo_generado del banco
-        banco.consecutivo_generado += 1
+        # Juntar la nomina con su cuenta
+        filas.append((nomina, su_cuenta))
 
-        # Elaborar el numero de cheque, juntando la clave del banco y el consecutivo_generado, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{banco.consecutivo_generado:07}"
+    # Si contador es cero, provocar error
+    contador = len(filas)
+    if contador == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
+
+    # Reservar de una vez los consecutivos del banco, y guardarlos para liberar el banco
+    consecutivos = reservar_consecutivos(sesion, {banco.id: contador})[banco.id]
+    sesion.commit()
+
+    # Bucle para crear cada fila del archivo XLSX
+    nominas_num_cheques = []
+    for nomina, su_cuenta in filas:
+        # Elaborar el numero de cheque, juntando la clave del banco y el siguiente consecutivo reservado, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{next(consecutivos):07}"
 
         # Agregar la fila
-        hoja.append(
+        libro.append(
             [
                 "J",
                 nomina.persona.rfc,
                 nomina.importe,
                 num_cheque,
                 su_cuenta.num_cuenta,
-                nomina.quincena.clave,
+                nomina.quincena_clave,
                 nomina.persona.modelo,
             ]
         )
 
-        # Si fijar_num_cheque es verdadero, entonces actualizar el registro de la nominas con el numero de cheque
+        # Si fijar_num_cheque es verdadero, entonces juntar el numero de cheque para actualizar la nomina
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-    # Si contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
+            nominas_num_cheques.append({"id": nomina.id, "num_cheque": num_cheque})
 
-    # Actualizar los consecutivo_generado de cada banco
+    # Actualizar los numeros de cheque por lotes
+    actualizar_por_lotes(sesion, Nomina, nominas_num_cheques)
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX
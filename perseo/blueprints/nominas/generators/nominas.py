@@ -2,13 +2,14 @@
 Nominas, generadores de nominas
 """
 
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
+from lib.cargas_masivas import actualizar_por_lotes
 from lib.exceptions import (
     MyBucketNotFoundError,
     MyEmptyError,
@@ -18,7 +19,9 @@ from lib.exceptions import (
     MyUploadError,
 )
 from lib.google_cloud_storage import upload_file_to_gcs
-from perseo.blueprints.cuentas.models import Cuenta
+from lib.tasks import set_task_progress
+from lib.xlsx_writer import XLSXWriter
+from perseo.blueprints.bancos.models import reservar_consecutivos
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
     LOCAL_BASE_DIRECTORY,
@@ -28,10 +31,11 @@ from perseo.blueprints.nominas.generators.common import (
     consultar_validar_quincena,
     database,
 )
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
 
 FUENTE = "NOMINAS"
+PROGRESO_CADA = 500  # Cada cuantas filas se publica el avance de la tarea
 
 
 def crear_nominas(
@@ -39,8 +43,9 @@ def crear_nominas(
     quincena_producto_id: int,
     fijar_num_cheque: bool = False,
     tipo: str = "SALARIO",
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con las nominas de una quincena"""
+    """Crear archivo XLSX con las nominas de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Validar el tipo
     if tipo not in ["SALARIO", "AGUINALDO"]:
@@ -55,15 +60,10 @@ def crear_nominas(
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
-    # Consultar las nominas de la quincena
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Cargar de una vez las nominas de la quincena con todo lo que se usa para armar cada fila
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas(tipo)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -71,14 +71,14 @@ def crear_nominas(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Consultar de una sola vez las cuentas que tienen varias personas con el mismo banco y numero de cuenta
+    cuentas_duplicadas_indice = snapshot.cuentas_duplicadas()
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "QUINCENA",
             "CENTRO DE TRABAJO",
@@ -95,29 +95,17 @@ def crear_nominas(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van en el archivo XLSX con la cuenta de cada persona
     personas_sin_cuentas = []
     cuentas_duplicadas = []
+    filas = []
     for nomina in nominas:
         # Si el modelo de la persona es 3, se omite
         if nomina.persona.modelo == 3:
             continue
 
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
-
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
@@ -125,61 +113,57 @@ def crear_nominas(
             continue
 
         # Validar que no haya otra persona con el mismo banco y numero de cuenta
-        hay_cuenta_duplicada = False
-        for posible_cuenta_duplicada in (
-            Cuenta.query.filter_by(banco_id=su_cuenta.banco_id)
-            .filter_by(num_cuenta=su_cuenta.num_cuenta)
-            .filter_by(estatus="A")
-            .all()
-        ):
-            if posible_cuenta_duplicada.persona_id != nomina.persona_id:
-                cuentas_duplicadas.append(f"  Duplicada {nomina.persona.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
-                hay_cuenta_duplicada = False
-        if hay_cuenta_duplicada:
-            continue
+        if (su_cuenta.banco_id, su_cuenta.num_cuenta) in cuentas_duplicadas_indice:
+            cuentas_duplicadas.append(f"  Duplicada {nomina.persona.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
 
-        # Tomar el banco de la cuenta de la persona
-        su_banco = su_cuenta.banco
+        # Juntar la nomina con su cuenta
+        filas.append((nomina, su_cuenta))
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+    # Si no hay filas, provocar error
+    contador = len(filas)
+    if contador == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
 
-        # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+    # Reservar de una vez los consecutivos de cada banco, y guardarlos para liberar los bancos
+    consecutivos = reservar_consecutivos(sesion, Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+    sesion.commit()
+
+    # Bucle para crear cada fila del archivo XLSX
+    nominas_num_cheques = []
+    for indice, (nomina, su_cuenta) in enumerate(filas, start=1):
+        # Publicar el avance de la tarea, solo va a Redis, no a la base de datos
+        if indice % PROGRESO_CADA == 0:
+            set_task_progress(max(1, min(99, indice * 100 // contador)), f"Van {indice} de {contador} nominas...")
+
+        # Elaborar el numero de cheque, juntando la clave del banco y el siguiente consecutivo reservado, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{next(consecutivos[su_cuenta.banco_id]):07}"
 
         # Agregar la fila
-        hoja.append(
+        libro.append(
             [
-                nomina.quincena.clave,
+                nomina.quincena_clave,
                 nomina.centro_trabajo.clave,
                 nomina.persona.rfc,
                 nomina.persona.nombre_completo,
                 nomina.persona.num_empleado,
                 nomina.persona.modelo,
-                nomina.plaza.clave,
-                su_banco.nombre,
-                su_banco.clave,
+                nomina.plaza_clave,
+                su_cuenta.banco.nombre,
+                su_cuenta.banco.clave,
                 su_cuenta.num_cuenta,
                 nomina.importe,
                 num_cheque,
             ]
         )
 
-        # Si fijar_num_cheque es verdadero, entonces actualizar el registro de la nominas con el numero de cheque
+        # Si fijar_num_cheque es verdadero, entonces juntar el numero de cheque para actualizar la nomina
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-    # Si el contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
+            nominas_num_cheques.append({"id": nomina.id, "num_cheque": num_cheque})
 
-    # Actualizar los consecutivos de cada banco
+    # Actualizar los numeros de cheque por lotes
+    actualizar_por_lotes(sesion, Nomina, nominas_num_cheques)
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX
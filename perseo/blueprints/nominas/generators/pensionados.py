@@ -2,13 +2,14 @@
 Nominas, generadores de pensionados
 """
 
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
+from lib.cargas_masivas import actualizar_por_lotes
 from lib.exceptions import (
     MyBucketNotFoundError,
     MyEmptyError,
@@ -18,6 +19,8 @@ from lib.exceptions import (
     MyUploadError,
 )
 from lib.google_cloud_storage import upload_file_to_gcs
+from lib.xlsx_writer import XLSXWriter
+from perseo.blueprints.bancos.models import reservar_consecutivos
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
     LOCAL_BASE_DIRECTORY,
@@ -27,8 +30,8 @@ from perseo.blueprints.nominas.generators.common import (
     consultar_validar_quincena,
     database,
 )
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
 
 FUENTE = "PENSIONADOS"
 
@@ -38,8 +41,9 @@ def crear_pensionados(
     quincena_producto_id: int,
     fijar_num_cheque=False,
     tipo: str = "SALARIO",
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con los pensionados de una quincena"""
+    """Crear archivo XLSX con los pensionados de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Validar el tipo
     if tipo not in ["SALARIO", "AGUINALDO"]:
@@ -54,15 +58,10 @@ def crear_pensionados(
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
-    # Consultar las nominas de la quincena, solo tipo SALARIO
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Cargar de una vez las nominas de la quincena del tipo
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas(tipo)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -70,14 +69,11 @@ def crear_pensionados(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "QUINCENA",
             "CENTRO DE TRABAJO",
@@ -94,55 +90,54 @@ def crear_pensionados(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van en el archivo XLSX con la cuenta de cada persona
     personas_sin_cuentas = []
+    filas = []
     for nomina in nominas:
         # Si el modelo de la persona NO es 3, se omite
         if nomina.persona.modelo != 3:
             continue
 
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se le crea una cuenta con el banco 10
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
-
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
 
-        # Si no tiene cuenta bancaria, entonces se le crea una cuenta con el banco 10
+        # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
             personas_sin_cuentas.append(nomina.persona)
             continue
 
-        # Tomar el banco de la cuenta de la persona
-        su_banco = su_cuenta.banco
+        # Juntar la nomina con su cuenta
+        filas.append((nomina, su_cuenta))
+
+    # Si no hay filas, provocar error
+    contador = len(filas)
+    if contador == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+    # Reservar de una vez los consecutivos de cada banco, y guardarlos para liberar los bancos
+    consecutivos = reservar_consecutivos(sesion, Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+    sesion.commit()
 
-        # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+    # Bucle para crear cada fila del archivo XLSX
+    nominas_num_cheques = []
+    for nomina, su_cuenta in filas:
+        # Elaborar el numero de cheque, juntando la clave del banco y el siguiente consecutivo reservado, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{next(consecutivos[su_cuenta.banco_id]):07}"
 
         # Agregar la fila
-        hoja.append(
+        libro.append(
             [
-                nomina.quincena.clave,
+                nomina.quincena_clave,
                 nomina.centro_trabajo.clave,
                 nomina.persona.rfc,
                 nomina.persona.nombre_completo,
                 nomina.persona.num_empleado,
                 nomina.persona.modelo,
-                nomina.plaza.clave,
-                su_banco.nombre,
-                su_banco.clave,
+                nomina.plaza_clave,
+                su_cuenta.banco.nombre,
+                su_cuenta.banco.clave,
                 su_cuenta.num_cuenta,
                 nomina.importe,
                 num_cheque,
@@ -151,19 +146,10 @@ def crear_pensionados(
 
         # Si fijar_num_cheque es veradero, entonces actualizar el registro de la nominas con el numero de cheque
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-    # Si el contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
+            nominas_num_cheques.append({"id": nomina.id, "num_cheque": num_cheque})
 
-    # Actualizar los consecutivo_generado de cada banco
+    # Actualizar los numeros de cheque por lotes
+    actualizar_por_lotes(sesion, Nomina, nominas_num_cheques)
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX
@@ -2,16 +2,18 @@
 Nominas, generadores de primas vacacionales
 """
 
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
+from lib.cargas_masivas import actualizar_por_lotes
 from lib.exceptions import MyBucketNotFoundError, MyEmptyError, MyFileNotAllowedError, MyFileNotFoundError, MyUploadError
 from lib.google_cloud_storage import upload_file_to_gcs
-from perseo.blueprints.cuentas.models import Cuenta
+from lib.xlsx_writer import XLSXWriter
+from perseo.blueprints.bancos.models import reservar_consecutivos
 from perseo.blueprints.nominas.generators.common import (
     GCS_BASE_DIRECTORY,
     LOCAL_BASE_DIRECTORY,
@@ -21,8 +23,8 @@ from perseo.blueprints.nominas.generators.common import (
     consultar_validar_quincena,
     database,
 )
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.personas.models import Persona
 
 FUENTE = "PRIMAS VACACIONALES"
 
@@ -31,8 +33,9 @@ def crear_primas_vacacionales(
     quincena_clave: str,
     quincena_producto_id: int,
     fijar_num_cheque=False,
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con las primas vacacionales de una quincena"""
+    """Crear archivo XLSX con las primas vacacionales de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Consultar y validar quincena
     quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
@@ -43,15 +46,10 @@ def crear_primas_vacacionales(
     # Iniciar sesion con la base de datos para que la alimentacion sea rapida
     sesion = database.session
 
-    # Consultar las nominas de la quincena
-    nominas = (
-        Nomina.query.join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == "PRIMA VACACIONAL")
-        .filter(Nomina.estatus == "A")
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Cargar de una vez las nominas de la quincena solo tipo PRIMA VACACIONAL
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas("PRIMA VACACIONAL")
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -59,14 +57,11 @@ def crear_primas_vacacionales(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "QUINCENA",
             "CENTRO DE TRABAJO",
@@ -83,25 +78,14 @@ def crear_primas_vacacionales(
         ]
     )
 
-    # Bucle para crear cada fila del archivo XLSX
-    contador = 0
+    # Bucle para juntar las nominas que van en el archivo XLSX con la cuenta de cada persona
     personas_sin_cuentas = []
     cuentas_duplicadas = []
+    filas = []
+    cuentas_duplicadas_indice = snapshot.cuentas_duplicadas()
     for nomina in nominas:
-        # Tomar las cuentas de la persona
-        cuentas = nomina.persona.cuentas
-
-        # Si no tiene cuentas, entonces se agrega a la lista de personas_sin_cuentas y se salta
-        if len(cuentas) == 0:
-            personas_sin_cuentas.append(nomina.persona)
-            continue
-
         # Tomar la cuenta de la persona que no tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        for cuenta in cuentas:
-            if cuenta.banco.clave != "9" and cuenta.estatus == "A":
-                su_cuenta = cuenta
-                break
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
@@ -109,40 +93,41 @@ def crear_primas_vacacionales(
             continue
 
         # Validar que no haya otra persona con el mismo banco y numero de cuenta
-        hay_cuenta_duplicada = False
-        for posible_cuenta_duplicada in (
-            Cuenta.query.filter_by(banco_id=su_cuenta.banco_id)
-            .filter_by(num_cuenta=su_cuenta.num_cuenta)
-            .filter_by(estatus="A")
-            .all()
-        ):
-            if posible_cuenta_duplicada.persona_id != nomina.persona_id:
-                cuentas_duplicadas.append(f"  Duplicada {nomina.persona.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
-                hay_cuenta_duplicada = False
-        if hay_cuenta_duplicada:
-            continue
+        if (su_cuenta.banco_id, su_cuenta.num_cuenta) in cuentas_duplicadas_indice:
+            cuentas_duplicadas.append(f"  Duplicada {nomina.persona.rfc} {su_cuenta.banco.nombre} {su_cuenta.num_cuenta}")
 
-        # Tomar el banco de la cuenta de la persona
-        su_banco = su_cuenta.banco
+        # Juntar la nomina con su cuenta
+        filas.append((nomina, su_cuenta))
 
-        # Incrementar la consecutivo del banco
-        su_banco.consecutivo_generado += 1
+    # Si no hay filas, provocar error
+    contador = len(filas)
+    if contador == 0:
+        mensaje = "No hubo filas que agregar al archivo XLSX"
+        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
+        raise MyEmptyError(mensaje)
 
-        # Elaborar el numero de cheque, juntando la clave del banco y la consecutivo, siempre de 9 digitos
-        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{su_banco.consecutivo_generado:07}"
+    # Reservar de una vez los consecutivos de cada banco, y guardarlos para liberar los bancos
+    consecutivos = reservar_consecutivos(sesion, Counter(su_cuenta.banco_id for _, su_cuenta in filas))
+    sesion.commit()
+
+    # Bucle para crear cada fila del archivo XLSX
+    nominas_num_cheques = []
+    for nomina, su_cuenta in filas:
+        # Elaborar el numero de cheque, juntando la clave del banco y el siguiente consecutivo reservado, siempre de 9 digitos
+        num_cheque = f"{su_cuenta.banco.clave.zfill(2)}{next(consecutivos[su_cuenta.banco_id]):07}"
 
         # Agregar la fila
-        hoja.append(
+        libro.append(
             [
-                nomina.quincena.clave,
+                nomina.quincena_clave,
                 nomina.centro_trabajo.clave,
                 nomina.persona.rfc,
                 nomina.persona.nombre_completo,
                 nomina.persona.num_empleado,
                 nomina.persona.modelo,
-                nomina.plaza.clave,
-                su_banco.nombre,
-                su_banco.clave,
+                nomina.plaza_clave,
+                su_cuenta.banco.nombre,
+                su_cuenta.banco.clave,
                 su_cuenta.num_cuenta,
                 nomina.importe,
                 num_cheque,
@@ -151,19 +136,10 @@ def crear_primas_vacacionales(
 
         # Si fijar_num_cheque es verdadero, entonces actualizar el registro de la nominas con el numero de cheque
         if fijar_num_cheque:
-            nomina.num_cheque = num_cheque
-            sesion.add(nomina)
-
-        # Incrementar contador
-        contador += 1
-
-    # Si el contador es cero, provocar error
-    if contador == 0:
-        mensaje = "No hubo filas que agregar al archivo XLSX"
-        actualizar_quincena_producto(quincena_producto_id, quincena.id, FUENTE, [mensaje])
-        raise MyEmptyError(mensaje)
+            nominas_num_cheques.append({"id": nomina.id, "num_cheque": num_cheque})
 
-    # Actualizar los consecutivos de cada banco
+    # Actualizar los numeros de cheque por lotes
+    actualizar_por_lotes(sesion, Nomina, nominas_num_cheques)
     sesion.commit()
 
     # Determinar el nombre del archivo XLSX
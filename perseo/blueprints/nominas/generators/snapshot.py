@@ -0,0 +1,222 @@
+"""
+Nominas, fotografía de la quincena para los generadores
+
+Carga una sola vez, con pocas consultas, las nominas activas de la quincena con sus personas, tabuladores,
+cuentas, centros de trabajo y plazas, en registros compactos con __slots__, para que los generadores
+no recorran persona.cuentas, persona.tabulador, centro_trabajo y plaza fila por fila.
+La cuenta de nomina y la de monedero de cada persona se toman de personas.cuenta_nomina_id y cuenta_monedero_id.
+
+    snapshot = QuincenaSnapshot(quincena)
+    for nomina in snapshot.nominas("SALARIO"):
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
+
+Los registros no están ligados a una sesión, así que varios generadores en hilos distintos pueden
+compartir la misma fotografía. El consecutivo_generado de cada banco NO se guarda aquí, cada generador
+reserva sus consecutivos en la base de datos con reservar_consecutivos.
+"""
+
+import threading
+
+from sqlalchemy import or_, select
+
+from perseo.blueprints.bancos.models import Banco
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
+from perseo.blueprints.cuentas.models import Cuenta
+from perseo.blueprints.nominas.generators.common import (
+    calcular_huella_datos,
+    consultar_cuentas_duplicadas,
+    consultar_percepciones_deducciones_pivote,
+    consultar_plazas_claves,
+    database,
+)
+from perseo.blueprints.nominas.models import Nomina
+from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.puestos.models import Puesto
+from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.tabuladores.models import Tabulador
+
+
+class Registro:
+    """Registro compacto, toma de la fila de la consulta las columnas con el nombre de cada slot"""
+
+    __slots__ = ()
+    columnas = ()
+
+    def __init__(self, fila):
+        for columna in self.columnas:
+            setattr(self, columna, getattr(fila, columna))
+
+
+class TabuladorRegistro(Registro):
+    """Tabulador con la clave de su puesto"""
+
+    columnas = ("id", "salario_diario", "salario_diario_integrado", "puesto_clave")
+    __slots__ = columnas
+
+
+class PersonaRegistro(Registro):
+    """Persona con su tabulador"""
+
+    columnas = (
+        "id",
+        "rfc",
+        "nombres",
+        "apellido_primero",
+        "apellido_segundo",
+        "curp",
+        "num_empleado",
+        "modelo",
+        "seguridad_social",
+        "ingreso_pj_fecha",
+        "codigo_postal_fiscal",
+        "ultimo_plaza_id",
+        "nivel",
+        "puesto_equivalente",
+        "tabulador_id",
+        "cuenta_nomina_id",
+        "cuenta_monedero_id",
+    )
+    __slots__ = columnas + ("tabulador",)
+
+    @property
+    def nombre_completo(self):
+        """Nombre completo"""
+        return f"{self.nombres} {self.apellido_primero} {self.apellido_segundo}"
+
+
+class CentroTrabajoRegistro(Registro):
+    """Centro de trabajo"""
+
+    columnas = ("id", "clave", "descripcion")
+    __slots__ = columnas
+
+
+class BancoRegistro(Registro):
+    """Banco, sin el consecutivo"""
+
+    columnas = ("id", "clave", "nombre", "clave_dispersion_pensionados")
+    __slots__ = columnas
+
+
+class CuentaRegistro(Registro):
+    """Cuenta con su banco"""
+
+    columnas = ("id", "persona_id", "banco_id", "num_cuenta", "estatus")
+    __slots__ = columnas + ("banco",)
+
+
+class NominaRegistro(Registro):
+    """Nomina con su persona, centro de trabajo y clave de la plaza"""
+
+    columnas = ("id", "persona_id", "centro_trabajo_id", "plaza_id", "tipo", "importe", "fecha_pago")
+    __slots__ = columnas + ("persona", "centro_trabajo", "plaza_clave", "quincena_clave")
+
+
+class QuincenaSnapshot:
+    """Nominas activas de la quincena con sus personas, tabuladores, cuentas, centros de trabajo y plazas"""
+
+    def __init__(self, quincena: Quincena):
+        self.quincena_id = quincena.id
+        self.quincena_clave = quincena.clave
+        self._pivotes = {}
+        self._cuentas_duplicadas = None
+        self._candado = threading.Lock()
+        sesion = database.session
+
+        # Huella de los datos, antes de cargarlos, para los generadores que reutilizan sus archivos
+        self.huella_datos = calcular_huella_datos(self.quincena_id)
+
+        # Subconsulta con las personas que tienen nominas activas en la quincena
+        personas_ids = select(Nomina.persona_id).where(Nomina.quincena_id == self.quincena_id, Nomina.estatus == "A")
+
+        # Bancos
+        consulta = select(*[getattr(Banco, columna) for columna in BancoRegistro.columnas])
+        self.bancos = {fila.id: BancoRegistro(fila) for fila in sesion.execute(consulta)}
+
+        # Plazas, de todas solo la clave, porque timbrados usa la ultima plaza de la persona
+        self.plazas_claves = consultar_plazas_claves()
+
+        # Tabuladores de las personas, con la clave de su puesto
+        consulta = (
+            select(
+                Tabulador.id,
+                Tabulador.salario_diario,
+                Tabulador.salario_diario_integrado,
+                Puesto.clave.label("puesto_clave"),
+            )
+            .join(Puesto, Tabulador.puesto_id == Puesto.id)
+            .where(Tabulador.id.in_(select(Persona.tabulador_id).where(Persona.id.in_(personas_ids))))
+        )
+        tabuladores = {fila.id: TabuladorRegistro(fila) for fila in sesion.execute(consulta)}
+
+        # Personas con su tabulador
+        consulta = select(*[getattr(Persona, columna) for columna in PersonaRegistro.columnas])
+        consulta = consulta.where(Persona.id.in_(personas_ids))
+        self.personas = {}
+        for fila in sesion.execute(consulta):
+            persona = PersonaRegistro(fila)
+            persona.tabulador = tabuladores.get(persona.tabulador_id)
+            self.personas[persona.id] = persona
+
+        # Cuentas de nomina y de monedero de las personas, las que se mantienen en personas, con su banco
+        consulta = select(*[getattr(Cuenta, columna) for columna in CuentaRegistro.columnas]).where(
+            or_(
+                Cuenta.id.in_(select(Persona.cuenta_nomina_id).where(Persona.id.in_(personas_ids))),
+                Cuenta.id.in_(select(Persona.cuenta_monedero_id).where(Persona.id.in_(personas_ids))),
+            )
+        )
+        self.cuentas = {}
+        for fila in sesion.execute(consulta):
+            cuenta = CuentaRegistro(fila)
+            cuenta.banco = self.bancos[cuenta.banco_id]
+            self.cuentas[cuenta.id] = cuenta
+
+        # Centros de trabajo de las nominas
+        consulta = select(CentroTrabajo.id, CentroTrabajo.clave, CentroTrabajo.descripcion).where(
+            CentroTrabajo.id.in_(select(Nomina.centro_trabajo_id).where(Nomina.quincena_id == self.quincena_id))
+        )
+        centros_trabajos = {fila.id: CentroTrabajoRegistro(fila) for fila in sesion.execute(consulta)}
+
+        # Nominas activas de la quincena, ordenadas por el RFC de la persona
+        consulta = (
+            select(*[getattr(Nomina, columna) for columna in NominaRegistro.columnas])
+            .join(Persona, Nomina.persona_id == Persona.id)
+            .where(Nomina.quincena_id == self.quincena_id, Nomina.estatus == "A")
+            .order_by(Persona.rfc, Nomina.id)
+        )
+        self._nominas = []
+        for fila in sesion.execute(consulta):
+            nomina = NominaRegistro(fila)
+            nomina.persona = self.personas[nomina.persona_id]
+            nomina.centro_trabajo = centros_trabajos[nomina.centro_trabajo_id]
+            nomina.plaza_clave = self.plazas_claves.get(nomina.plaza_id, "")
+            nomina.quincena_clave = self.quincena_clave
+            self._nominas.append(nomina)
+
+    def nominas(self, tipo: str, modelos: list = None) -> list[NominaRegistro]:
+        """Nominas del tipo, y si se dan, solo de las personas con esos modelos, ordenadas por RFC"""
+        return [
+            nomina for nomina in self._nominas if nomina.tipo == tipo and (modelos is None or nomina.persona.modelo in modelos)
+        ]
+
+    def cuenta_bancaria(self, persona_id: int) -> CuentaRegistro | None:
+        """Cuenta de nomina de la persona, la primera activa que NO es del banco de los monederos"""
+        return self.cuentas.get(self.personas[persona_id].cuenta_nomina_id)
+
+    def cuenta_monedero(self, persona_id: int) -> CuentaRegistro | None:
+        """Cuenta de monedero de la persona, la primera activa del banco de los monederos"""
+        return self.cuentas.get(self.personas[persona_id].cuenta_monedero_id)
+
+    def percepciones_deducciones_pivote(self, tipo: str) -> tuple[dict, dict]:
+        """Matriz {persona_id: {concepto_clave: importe}} de las P-D del tipo y sus duplicados, se consulta una vez por tipo"""
+        with self._candado:
+            if tipo not in self._pivotes:
+                self._pivotes[tipo] = consultar_percepciones_deducciones_pivote(self.quincena_id, tipo)
+            return self._pivotes[tipo]
+
+    def cuentas_duplicadas(self) -> set:
+        """Cuentas activas que tienen varias personas {(banco_id, num_cuenta)}, se consulta una vez"""
+        with self._candado:
+            if self._cuentas_duplicadas is None:
+                self._cuentas_duplicadas = consultar_cuentas_duplicadas()
+            return self._cuentas_duplicadas
@@ -6,7 +6,6 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -20,6 +19,7 @@ from lib.exceptions import (
 )
 from lib.fechas import quincena_to_fecha
 from lib.google_cloud_storage import upload_file_to_gcs
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.cuentas.models import Cuenta
@@ -29,13 +29,13 @@ from perseo.blueprints.nominas.generators.common import (
     TIMEZONE,
     actualizar_quincena_producto,
     bitacora,
+    calcular_huella,
+    calcular_huella_datos,
     consultar_validar_quincena,
     database,
+    reutilizar_quincena_producto,
 )
-from perseo.blueprints.nominas.models import Nomina
-from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
-from perseo.blueprints.personas.models import Persona
-from perseo.blueprints.plazas.models import Plaza
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.tabuladores.models import Tabulador
 
@@ -50,8 +50,9 @@ def crear_timbrados(
     quincena_producto_id: int,
     modelos: list = None,
     tipo: str = "SALARIO",
+    snapshot: QuincenaSnapshot = None,
 ) -> str:
-    """Crear archivo XLSX con los timbrados de una quincena"""
+    """Crear archivo XLSX con los timbrados de una quincena, si se da snapshot se usan sus datos ya cargados"""
 
     # Consultar quincena
     quincena = Quincena.query.filter_by(clave=quincena_clave).first()
@@ -90,6 +91,13 @@ def crear_timbrados(
     elif modelos == [1, 2]:
         fuente = "TIMBRADOS EMPLEADOS ACTIVOS"
 
+    # Si los datos no cambiaron desde un producto anterior, reutilizar su archivo
+    huella_datos = snapshot.huella_datos if snapshot is not None else calcular_huella_datos(quincena.id)
+    huella = calcular_huella(huella_datos, fuente, tipo, modelos)
+    mensaje_reutilizado = reutilizar_quincena_producto(quincena_producto_id, quincena.id, fuente, huella)
+    if mensaje_reutilizado is not None:
+        return f"Termina crear timbrados: {mensaje_reutilizado}"
+
     # Inicializar el diccionario de conceptos
     conceptos_dict = {}
 
@@ -149,17 +157,10 @@ def crear_timbrados(
     descripcion = f"timbrados {quincena_clave} {tipo} modelos {modelos}"
     bitacora.info("Inicia crear %s", descripcion)
 
-    # Consultar Nominas activas de la quincena, del tipo dado, juntar con personas
-    nominas = (
-        session.query(Nomina)
-        .join(Persona)
-        .filter(Nomina.quincena_id == quincena.id)
-        .filter(Nomina.tipo == tipo)
-        .filter(Nomina.estatus == "A")
-        .filter(Persona.modelo.in_(modelos))
-        .order_by(Persona.rfc)
-        .all()
-    )
+    # Cargar de una vez las nominas activas de la quincena, del tipo dado, de las personas con los modelos
+    if snapshot is None:
+        snapshot = QuincenaSnapshot(quincena)
+    nominas = snapshot.nominas(tipo, modelos)
 
     # Si no hay registros, provocar error
     if len(nominas) == 0:
@@ -167,11 +168,14 @@ def crear_timbrados(
         actualizar_quincena_producto(quincena_producto_id, quincena.id, fuente, [mensaje])
         raise MyEmptyError(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Consultar de una sola vez las P-D de la quincena y el tipo como matriz {persona_id: {concepto_clave: importe}}
+    percepciones_deducciones_pivote, percepciones_deducciones_duplicadas = snapshot.percepciones_deducciones_pivote(tipo)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Tomar las claves de las plazas, cargadas de una sola vez
+    plazas_claves = snapshot.plazas_claves
+
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Encabezados primera parte
     encabezados_parte_1 = [
@@ -234,11 +238,13 @@ def crear_timbrados(
     ]
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(encabezados_parte_1 + encabezados_parte_2 + encabezados_parte_3)
+    libro.append(encabezados_parte_1 + encabezados_parte_2 + encabezados_parte_3)
 
     # Inicializar el contador
     contador = 0
     personas_sin_cuentas = []
+    conceptos_duplicados = []
+    personas_avisadas = set()
 
     # Bucle para crear cada fila del archivo XLSX
     for nomina in nominas:
@@ -247,16 +253,11 @@ def crear_timbrados(
         #     continue
 
         # De las cuentas hay que tomar la que NO tenga la clave 9, porque esa clave es la de DESPENSA
-        su_cuenta = None
-        su_cuenta_id = 0
-        for cuenta in nomina.persona.cuentas:
-            if cuenta.estatus == "A" and cuenta.banco.clave != "9" and cuenta.id > su_cuenta_id:
-                su_cuenta = cuenta
-                break
+        su_cuenta = snapshot.cuenta_bancaria(nomina.persona_id)
 
         # Si no tiene cuenta bancaria, entonces se agrega a la lista de personas_sin_cuentas y se salta
         if su_cuenta is None:
-            personas_sin_cuentas.append(nomina.persona.rfc)
+            personas_sin_cuentas.append(nomina.persona)
             continue
 
         # Incrementar contador
@@ -305,132 +306,29 @@ def crear_timbrados(
             "04" if tipo == "SALARIO" else "99",  # FORMA DE PAGO para la ayuda es 99 y para los salarios es 04
             nomina.centro_trabajo.clave,  # CLAVE DEPARTAMENTO
             nomina.centro_trabajo.descripcion,  # NOMBRE DEPARTAMENTO
-            nomina.persona.tabulador.puesto.clave,  # NOMBRE PUESTO por lo pronto es la clave del puesto
+            nomina.persona.tabulador.puesto_clave,  # NOMBRE PUESTO por lo pronto es la clave del puesto
         ]
 
-        # Fila parte 2
+        # Fila parte 2, tomar los importes de la matriz de P-D de la persona, con cero si no tiene el concepto
         fila_parte_2 = []
-        if tipo == "SALARIO":
-            # Consultar TODAS las P-D de la quincena y la persona
-            percepciones_deducciones = (
-                session.query(PercepcionDeduccion)
-                .filter_by(quincena_id=quincena.id)
-                .filter_by(persona_id=nomina.persona_id)
-                .all()
-            )
-            # Bucle por las P-D para definir un diccionario con las claves y los importes
-            percepciones_deducciones_dict = {}
-            for percepcion_deduccion in percepciones_deducciones:
-                percepciones_deducciones_dict[percepcion_deduccion.concepto.clave] = percepcion_deduccion.importe
-            # Bucle por los conceptos
-            for _, concepto in conceptos_dict.items():
-                # Si el concepto esta en el diccionario de P-D, entonces agregar el importe
-                if concepto.clave in percepciones_deducciones_dict:
-                    fila_parte_2.append(percepciones_deducciones_dict[concepto.clave])
-                else:
-                    fila_parte_2.append(0)  # De lo contrario agregar cero
-        elif tipo == "APOYO ANUAL":
-            # Consultar la PercepcionDeduccion con concepto PAZ
-            percepcion_deduccion_paz = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "PAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_paz.importe if percepcion_deduccion_paz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto DAZ
-            percepcion_deduccion_daz = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "DAZ")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_daz.importe if percepcion_deduccion_daz is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto D62
-            percepcion_deduccion_d62 = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "APOYO ANUAL")
-                .filter(Concepto.clave == "D62")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_d62.importe if percepcion_deduccion_d62 is not None else 0)
-        elif tipo == "PRIMA VACACIONAL":
-            # Consultar la PercepcionDeduccion con concepto P20
-            percepcion_deduccion_p20 = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "PRIMA VACACIONAL")
-                .filter(Concepto.clave == "P20")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_p20.importe if percepcion_deduccion_p20 is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto PGP
-            percepcion_deduccion_pgp = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "PRIMA VACACIONAL")
-                .filter(Concepto.clave == "PGP")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_pgp.importe if percepcion_deduccion_pgp is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto PGV
-            percepcion_deduccion_pgv = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "PRIMA VACACIONAL")
-                .filter(Concepto.clave == "PGV")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_pgv.importe if percepcion_deduccion_pgv is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto D1R
-            percepcion_deduccion_d1r = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "PRIMA VACACIONAL")
-                .filter(Concepto.clave == "D1R")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_d1r.importe if percepcion_deduccion_d1r is not None else 0)
-            # Consultar la PercepcionDeduccion con concepto D62
-            percepcion_deduccion_d62 = (
-                session.query(PercepcionDeduccion)
-                .join(Concepto)
-                .filter(PercepcionDeduccion.quincena_id == quincena.id)
-                .filter(PercepcionDeduccion.persona_id == nomina.persona_id)
-                .filter(PercepcionDeduccion.tipo == "PRIMA VACACIONAL")
-                .filter(Concepto.clave == "D62")
-                .first()
-            )
-            fila_parte_2.append(percepcion_deduccion_d62.importe if percepcion_deduccion_d62 is not None else 0)
+        if tipo in ["SALARIO", "APOYO ANUAL", "PRIMA VACACIONAL"]:
+            importes = percepciones_deducciones_pivote.get(nomina.persona_id, {})
+            fila_parte_2 = [importes.get(concepto_clave, 0) for concepto_clave in conceptos_dict]
+            # Si la persona tiene varias P-D con el mismo concepto, se uso la ultima y se avisa una vez
+            if nomina.persona_id in percepciones_deducciones_duplicadas and nomina.persona_id not in personas_avisadas:
+                personas_avisadas.add(nomina.persona_id)
+                for concepto_clave in percepciones_deducciones_duplicadas[nomina.persona_id]:
+                    conceptos_duplicados.append(f"- {nomina.persona.rfc} {concepto_clave}")
 
         # Si el codigo postal fiscal es cero, entonces se usa 00000
         codigo_postal_fiscal = "00000"
         if nomina.persona.codigo_postal_fiscal:
             codigo_postal_fiscal = str(nomina.persona.codigo_postal_fiscal).zfill(5)
 
-        # Consultar la clave de la plaza a partir de persona.ultimo_plaza_id
+        # Tomar la clave de la plaza a partir de persona.ultimo_plaza_id
         plaza_clave = ""
         if nomina.persona.ultimo_plaza_id:
-            plaza = Plaza.query.filter_by(id=nomina.persona.ultimo_plaza_id).first()
-            if plaza is not None:
-                plaza_clave = plaza.clave
+            plaza_clave = plazas_claves.get(nomina.persona.ultimo_plaza_id, "")
 
         # Fila parte 3
         fila_parte_3 = [
@@ -444,7 +342,7 @@ def crear_timbrados(
         ]
 
         # Agregar la fila
-        hoja.append(fila_parte_1 + fila_parte_2 + fila_parte_3)
+        libro.append(fila_parte_1 + fila_parte_2 + fila_parte_3)
 
         # Mandar a la bitacora el contador cada 100 filas
         if contador % 100 == 0:
@@ -513,6 +411,11 @@ def crear_timbrados(
         mensajes.append(f"AVISO: Hubo {len(personas_sin_cuentas)} personas sin cuentas:")
         mensajes += [f"- {p.rfc} {p.nombre_completo}" for p in personas_sin_cuentas]
 
+    # Si hubo P-D con el mismo concepto en una persona, entonces juntarlas para mensajes
+    if len(conceptos_duplicados) > 0:
+        mensajes.append(f"AVISO: Hubo {len(conceptos_duplicados)} P-D con concepto repetido, se tomo el importe de la ultima:")
+        mensajes += conceptos_duplicados
+
     # Si hubo mensajes, entonces no es satifactorio
     es_satisfactorio = True
     if len(mensajes) > 0:
@@ -533,6 +436,7 @@ def crear_timbrados(
         archivo=nombre_archivo_xlsx,
         url=public_url,
         es_satisfactorio=es_satisfactorio,
+        huella=huella,
     )
 
     # Entregar mensaje de termino
@@ -0,0 +1,112 @@
+"""
+Nominas, generador de todos los productos de una quincena
+
+Carga una sola vez la fotografía de la quincena y ejecuta los generadores como un grafo de dependencias,
+los independientes al mismo tiempo en hilos, cada uno con su propio contexto y sesión, y cada uno sube
+su archivo a Google Cloud Storage y actualiza su quincena_producto en cuanto termina.
+
+Nominas, pensionados y primas vacacionales van en cadena porque reservan los consecutivos de los mismos bancos,
+así los números de cheque salen en el mismo orden que cuando se generaban uno tras otro.
+"""
+
+from functools import partial
+
+from flask import current_app
+
+from lib.grafo import Nodo, ejecutar_grafo
+from lib.tasks import set_task_progress
+from perseo.blueprints.bancos.tasks import reiniciar_consecutivos_generados
+from perseo.blueprints.nominas.generators.common import bitacora, consultar_validar_quincena, database
+from perseo.blueprints.nominas.generators.dispersiones_pensionados import crear_dispersiones_pensionados
+from perseo.blueprints.nominas.generators.monederos import crear_monederos
+from perseo.blueprints.nominas.generators.nominas import crear_nominas
+from perseo.blueprints.nominas.generators.pensionados import crear_pensionados
+from perseo.blueprints.nominas.generators.primas_vacacionales import crear_primas_vacacionales
+from perseo.blueprints.nominas.generators.snapshot import QuincenaSnapshot
+from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
+from perseo.blueprints.quincenas_productos.models import QuincenaProducto
+
+HILOS = 4  # Cuantos generadores se ejecutan al mismo tiempo
+
+
+def crear_todos(quincena_clave: str, hilos: int = HILOS) -> str:
+    """Crear todos los archivos XLSX de una quincena"""
+
+    # Consultar y validar quincena
+    quincena = consultar_validar_quincena(quincena_clave)  # Puede provocar una excepcion
+
+    # Mandar mensaje de inicio a la bitacora
+    bitacora.info("Inicia crear todos %s", quincena_clave)
+
+    # Reiniciar los consecutivos generados de los bancos
+    mensajes = [reiniciar_consecutivos_generados()]  # Puede provocar una excepcion
+    set_task_progress(5, mensajes[0])
+
+    # Cargar una sola vez las nominas, personas, cuentas y catalogos que comparten los generadores
+    snapshot = QuincenaSnapshot(quincena)
+
+    # Definir los productos: fuente, generador, parametros y las fuentes que deben terminar antes
+    productos = [
+        ("NOMINAS", crear_nominas, {"fijar_num_cheque": True}, ()),
+        ("PENSIONADOS", crear_pensionados, {"fijar_num_cheque": True}, ("NOMINAS",)),
+        ("MONEDEROS", crear_monederos, {"fijar_num_cheque": True}, ()),
+        ("DISPERSIONES PENSIONADOS", crear_dispersiones_pensionados, {}, ()),
+        ("TIMBRADOS EMPLEADOS ACTIVOS", crear_timbrados, {"modelos": [1, 2]}, ()),
+        ("TIMBRADOS PENSIONADOS", crear_timbrados, {"modelos": [3]}, ()),
+    ]
+    if quincena.tiene_primas_vacacionales is True:
+        productos += [
+            ("PRIMAS VACACIONALES", crear_primas_vacacionales, {"fijar_num_cheque": True}, ("PENSIONADOS",)),
+            ("TIMBRADOS PRIMAS VACACIONALES", crear_timbrados, {"tipo": "PRIMA VACACIONAL"}, ()),
+        ]
+
+    # Agregar los productos para que se vean en espera, cada generador actualiza el suyo al terminar
+    app = current_app._get_current_object()
+    mensaje_en_espera = f"En espera de crear todos los archivos XLSX de {quincena_clave}..."
+    quincenas_productos_ids = {}
+    nodos = []
+    for fuente, generador, parametros, depende_de in productos:
+        quincena_producto = QuincenaProducto(
+            quincena_id=quincena.id,
+            archivo="",
+            es_satisfactorio=False,
+            fuente=fuente,
+            mensajes=mensaje_en_espera,
+            url="",
+        )
+        quincena_producto.save()
+        quincenas_productos_ids[fuente] = quincena_producto.id
+        funcion = partial(generador, quincena_clave, quincena_producto.id, snapshot=snapshot, **parametros)
+        nodos.append(Nodo(fuente, partial(_ejecutar_en_contexto, app, funcion), depende_de))
+
+    # Ejecutar el grafo, publicando el avance conforme termina cada generador
+    errores = {}
+    try:
+        for cantidad, resultado in enumerate(ejecutar_grafo(nodos, hilos), start=1):
+            if resultado.es_exitoso:
+                mensaje = resultado.mensaje
+            else:
+                mensaje = f"ERROR en {resultado.nombre}: {resultado.mensaje}"
+                errores[resultado.nombre] = mensaje
+                bitacora.error(mensaje)
+            mensajes.append(mensaje)
+            set_task_progress(min(99, 5 + cantidad * 95 // len(nodos)), mensaje)
+    finally:
+        # Los productos que sigan en espera, porque su generador fallo sin actualizarlo o no se ejecuto, se marcan con el error
+        database.session.rollback()
+        for fuente, quincena_producto_id in quincenas_productos_ids.items():
+            quincena_producto = database.session.get(QuincenaProducto, quincena_producto_id)
+            if quincena_producto.mensajes == mensaje_en_espera:
+                quincena_producto.mensajes = errores.get(fuente, f"ERROR en {fuente}: No se termino de crear")
+                quincena_producto.save()
+
+    # Entregar mensaje de termino
+    mensaje_termino = "\n".join(mensajes)
+    bitacora.info("Termina crear todos %s", quincena_clave)
+    return mensaje_termino
+
+
+def _ejecutar_en_contexto(app, funcion) -> str:
+    """Ejecutar el generador en el hilo con su propio contexto de la aplicacion, y por lo tanto con su propia sesion"""
+    with app.app_context():
+        return funcion()
@@ -6,7 +6,7 @@ from datetime import date
 from decimal import Decimal, getcontext
 from typing import List, Optional
 
-from sqlalchemy import Enum, ForeignKey, Numeric, String
+from sqlalchemy import Enum, ForeignKey, Index, Numeric, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from lib.universal_mixin import UniversalMixin
@@ -31,6 +31,13 @@ class Nomina(database.Model, UniversalMixin):
     # Nombre de la tabla
     __tablename__ = "nominas"
 
+    # Indices para las consultas por quincena, tipo y estatus; por persona y quincena; y por timbrado
+    __table_args__ = (
+        Index("ix_nominas_quincena_id_tipo_estatus", "quincena_id", "tipo", "estatus"),
+        Index("ix_nominas_persona_id_quincena_id", "persona_id", "quincena_id"),
+        Index("ix_nominas_timbrado_id", "timbrado_id"),
+    )
+
     # Clave primaria
     id: Mapped[int] = mapped_column(primary_key=True)
 
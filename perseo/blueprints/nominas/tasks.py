@@ -4,7 +4,6 @@ Nominas, tareas en el fondo
 
 from lib.exceptions import MyAnyError
 from lib.tasks import set_task_error, set_task_progress
-from perseo.blueprints.bancos.tasks import reiniciar_consecutivos_generados
 from perseo.blueprints.nominas.generators.common import bitacora
 from perseo.blueprints.nominas.generators.dispersiones_pensionados import crear_dispersiones_pensionados
 from perseo.blueprints.nominas.generators.monederos import crear_monederos
@@ -12,9 +11,11 @@ from perseo.blueprints.nominas.generators.nominas import crear_nominas
 from perseo.blueprints.nominas.generators.pensionados import crear_pensionados
 from perseo.blueprints.nominas.generators.primas_vacacionales import crear_primas_vacacionales
 from perseo.blueprints.nominas.generators.timbrados import crear_timbrados
-from perseo.blueprints.quincenas.models import Quincena
+from perseo.blueprints.nominas.generators.todos import crear_todos
+from perseo.worker import con_aplicacion
 
 
+@con_aplicacion
 def lanzar_generar_nominas(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con las nominas de una quincena"""
 
@@ -35,6 +36,7 @@ def lanzar_generar_nominas(quincena_clave: str, quincena_producto_id: int) -> st
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_monederos(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los monederos de una quincena"""
 
@@ -55,6 +57,7 @@ def lanzar_generar_monederos(quincena_clave: str, quincena_producto_id: int) ->
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_pensionados(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los pensionados de una quincena"""
 
@@ -75,6 +78,7 @@ def lanzar_generar_pensionados(quincena_clave: str, quincena_producto_id: int) -
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_primas_vacacionales(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con las primas vacacionales de una quincena"""
 
@@ -95,6 +99,7 @@ def lanzar_generar_primas_vacacionales(quincena_clave: str, quincena_producto_id
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_dispersiones_pensionados(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con las dispersiones pensionados de una quincena"""
 
@@ -115,6 +120,7 @@ def lanzar_generar_dispersiones_pensionados(quincena_clave: str, quincena_produc
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_timbrados(quincena_clave: str, quincena_producto_id: int, modelos: list) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los timbrados de una quincena"""
 
@@ -139,6 +145,7 @@ def lanzar_generar_timbrados(quincena_clave: str, quincena_producto_id: int, mod
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_timbrados_aguinaldos(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los timbrados aguinaldos de una quincena"""
 
@@ -163,6 +170,7 @@ def lanzar_generar_timbrados_aguinaldos(quincena_clave: str, quincena_producto_i
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_timbrados_apoyos_anuales(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los timbrados apoyos anuales de una quincena"""
 
@@ -187,6 +195,7 @@ def lanzar_generar_timbrados_apoyos_anuales(quincena_clave: str, quincena_produc
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_timbrados_primas_vacacionales(quincena_clave: str, quincena_producto_id: int) -> str:
     """Tarea en el fondo para crear un archivo XLSX con los timbrados primas vacacionales de una quincena"""
 
@@ -211,48 +220,27 @@ def lanzar_generar_timbrados_primas_vacacionales(quincena_clave: str, quincena_p
     return mensaje_termino
 
 
+@con_aplicacion
 def lanzar_generar_todos(quincena_clave: str) -> str:
-    """Ejecutar todas las tareas en el fondo"""
+    """Tarea en el fondo para crear todos los archivos XLSX de una quincena"""
 
     # Iniciar la tarea en el fondo
     set_task_progress(0, f"Generar todos los archivos XLSX de {quincena_clave}...")
 
-    # Consultar la quincena
-    try:
-        quincena = Quincena.query.filter_by(clave=quincena_clave).one()
-    except Exception:
-        mensaje_error = f"No existe la quincena {quincena_clave}."
-        set_task_error(mensaje_error)
-        bitacora.error(mensaje_error)
-        return mensaje_error
-
-    # Si la quincena NO esta ABIERTA, causar error y salir
-    if quincena.estado != "ABIERTA":
-        mensaje_error = f"La quincena {quincena_clave} NO esta abierta."
-        set_task_error(mensaje_error)
-        bitacora.error(mensaje_error)
-        return mensaje_error
-
-    # Ejecutar cada uno de los generadores
-    mensajes = []
+    # Ejecutar el creador
     try:
-        mensajes.append(msg := reiniciar_consecutivos_generados())
-        set_task_progress(25, msg)
-        mensajes.append(msg := crear_nominas(quincena_clave, 0, True))
-        set_task_progress(50, msg)
-        mensajes.append(msg := crear_monederos(quincena_clave, 0, True))
-        set_task_progress(75, msg)
-        mensajes.append(msg := crear_pensionados(quincena_clave, 0, True))
-        if quincena.tiene_primas_vacacionales is True:
-            mensajes.append(msg := crear_primas_vacacionales(quincena_clave, 0, True))
-        set_task_progress(100, msg)
+        mensaje_termino = crear_todos(quincena_clave)
     except MyAnyError as error:
         mensaje_error = str(error)
         set_task_error(mensaje_error)
         bitacora.error(mensaje_error)
         return mensaje_error
+    except Exception as error:  # Cualquier otro error tambien debe terminar la tarea
+        mensaje_error = f"Error inesperado: {type(error).__name__}: {error}"
+        set_task_error(mensaje_error)
+        bitacora.exception(mensaje_error)
+        return mensaje_error
 
-    # Entregar mensajes de termino
-    mensaje_termino = "\n".join(mensajes)
+    # Terminar la tarea en el fondo y entregar el mensaje de termino
     set_task_progress(100, mensaje_termino)
     return mensaje_termino
@@ -7,7 +7,14 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import (
+    count_cached,
+    get_datatable_cache_key,
+    get_datatable_parameters,
+    output_datatable_json,
+    paginate_keyset,
+    project_columns,
+)
 from lib.safe_string import safe_message, safe_quincena, safe_rfc, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
@@ -84,9 +91,32 @@ def datatable_json():
         consulta = consulta.filter(
             Persona.apellido_segundo.contains(safe_string(request.form["persona_apellido_segundo"], save_enie=True))
         )
-    # Ordenar y paginar
-    registros = consulta.order_by(Quincena.clave.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    # Declarar las columnas que se entregan, las relaciones se unen en la misma consulta
+    columnas = {
+        "id": Nomina.id,
+        "quincena_clave": Quincena.clave,
+        "persona_rfc": (Nomina.persona, Persona.rfc),
+        "persona_nombres": (Nomina.persona, Persona.nombres),
+        "persona_apellido_primero": (Nomina.persona, Persona.apellido_primero),
+        "persona_apellido_segundo": (Nomina.persona, Persona.apellido_segundo),
+        "centro_trabajo_clave": (Nomina.centro_trabajo, CentroTrabajo.clave),
+        "plaza_clave": (Nomina.plaza, Plaza.clave),
+        "tipo": Nomina.tipo,
+        "desde_clave": Nomina.desde_clave,
+        "hasta_clave": Nomina.hasta_clave,
+        "percepcion": Nomina.percepcion,
+        "deduccion": Nomina.deduccion,
+        "importe": Nomina.importe,
+        "num_cheque": Nomina.num_cheque,
+        "fecha_pago": Nomina.fecha_pago,
+        "timbrado_id": Nomina.timbrado_id,
+    }
+    # Ordenar y paginar por llaves (keyset) con el total en cache por unos segundos
+    cache_key = get_datatable_cache_key("nominas")
+    registros = paginate_keyset(
+        project_columns(consulta, columnas), [Quincena.clave, Nomina.id], start, rows_per_page, cache_key
+    )
+    total = count_cached(consulta, cache_key)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -96,11 +126,13 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("nominas.detail", nomina_id=resultado.id),
                 },
-                "quincena_clave": resultado.quincena.clave,
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "centro_trabajo_clave": resultado.centro_trabajo.clave,
-                "plaza_clave": resultado.plaza.clave,
+                "quincena_clave": resultado.quincena_clave,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": (
+                    f"{resultado.persona_nombres} {resultado.persona_apellido_primero} {resultado.persona_apellido_segundo}"
+                ),
+                "centro_trabajo_clave": resultado.centro_trabajo_clave,
+                "plaza_clave": resultado.plaza_clave,
                 "tipo": resultado.tipo,
                 "desde_clave": resultado.desde_clave,
                 "hasta_clave": resultado.hasta_clave,
@@ -4,7 +4,7 @@ Percepciones Deducciones, modelos
 
 from decimal import Decimal, getcontext
 
-from sqlalchemy import Enum, ForeignKey, Numeric
+from sqlalchemy import Enum, ForeignKey, Index, Numeric
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from lib.universal_mixin import UniversalMixin
@@ -28,6 +28,13 @@ class PercepcionDeduccion(database.Model, UniversalMixin):
     # Nombre de la tabla
     __tablename__ = "percepciones_deducciones"
 
+    # Indices para las consultas por quincena, tipo y estatus; por persona y quincena; y por concepto
+    __table_args__ = (
+        Index("ix_percepciones_deducciones_quincena_id_tipo_estatus", "quincena_id", "tipo", "estatus"),
+        Index("ix_percepciones_deducciones_persona_id_quincena_id", "persona_id", "quincena_id"),
+        Index("ix_percepciones_deducciones_concepto_id", "concepto_id"),
+    )
+
     # Clave primaria
     id: Mapped[int] = mapped_column(primary_key=True)
 
@@ -7,15 +7,24 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import (
+    count_cached,
+    get_datatable_cache_key,
+    get_datatable_parameters,
+    output_datatable_json,
+    paginate_keyset,
+    project_columns,
+)
 from lib.safe_string import safe_clave, safe_message, safe_quincena, safe_rfc
 from perseo.blueprints.bitacoras.models import Bitacora
+from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.conceptos.models import Concepto
 from perseo.blueprints.modulos.models import Modulo
 from perseo.blueprints.percepciones_deducciones.forms import PercepcionDeduccionEditForm
 from perseo.blueprints.percepciones_deducciones.models import PercepcionDeduccion
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.personas.models import Persona
+from perseo.blueprints.plazas.models import Plaza
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.blueprints.usuarios.decorators import permission_required
 
@@ -66,9 +75,27 @@ def datatable_json():
     if "persona_rfc" in request.form:
         consulta = consulta.join(Persona)
         consulta = consulta.filter(Persona.rfc.contains(safe_rfc(request.form["persona_rfc"], search_fragment=True)))
-    # Ordenar y paginar
-    registros = consulta.order_by(Quincena.clave.desc()).offset(start).limit(rows_per_page).all()
-    total = consulta.count()
+    # Declarar las columnas que se entregan, las relaciones se unen en la misma consulta
+    columnas = {
+        "id": PercepcionDeduccion.id,
+        "persona_rfc": (PercepcionDeduccion.persona, Persona.rfc),
+        "persona_nombres": (PercepcionDeduccion.persona, Persona.nombres),
+        "persona_apellido_primero": (PercepcionDeduccion.persona, Persona.apellido_primero),
+        "persona_apellido_segundo": (PercepcionDeduccion.persona, Persona.apellido_segundo),
+        "centro_trabajo_clave": (PercepcionDeduccion.centro_trabajo, CentroTrabajo.clave),
+        "concepto_clave": (PercepcionDeduccion.concepto, Concepto.clave),
+        "concepto_descripcion": (PercepcionDeduccion.concepto, Concepto.descripcion),
+        "plaza_clave": (PercepcionDeduccion.plaza, Plaza.clave),
+        "tipo": PercepcionDeduccion.tipo,
+        "quincena_clave": Quincena.clave,
+        "importe": PercepcionDeduccion.importe,
+    }
+    # Ordenar y paginar por llaves (keyset) con el total en cache por unos segundos
+    cache_key = get_datatable_cache_key("percepciones_deducciones")
+    registros = paginate_keyset(
+        project_columns(consulta, columnas), [Quincena.clave, PercepcionDeduccion.id], start, rows_per_page, cache_key
+    )
+    total = count_cached(consulta, cache_key)
     # Elaborar datos para DataTable
     data = []
     for resultado in registros:
@@ -78,14 +105,16 @@ def datatable_json():
                     "id": resultado.id,
                     "url": url_for("percepciones_deducciones.detail", percepcion_deduccion_id=resultado.id),
                 },
-                "persona_rfc": resultado.persona.rfc,
-                "persona_nombre_completo": resultado.persona.nombre_completo,
-                "centro_trabajo_clave": resultado.centro_trabajo.clave,
-                "concepto_clave": resultado.concepto.clave,
-                "concepto_descripcion": resultado.concepto.descripcion,
-                "plaza_clave": resultado.plaza.clave,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": (
+                    f"{resultado.persona_nombres} {resultado.persona_apellido_primero} {resultado.persona_apellido_segundo}"
+                ),
+                "centro_trabajo_clave": resultado.centro_trabajo_clave,
+                "concepto_clave": resultado.concepto_clave,
+                "concepto_descripcion": resultado.concepto_descripcion,
+                "plaza_clave": resultado.plaza_clave,
                 "tipo": resultado.tipo,
-                "quincena_clave": resultado.quincena.clave,
+                "quincena_clave": resultado.quincena_clave,
                 "importe": resultado.importe,
             }
         )
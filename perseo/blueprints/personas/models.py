@@ -3,7 +3,7 @@ Personas, modelos
 """
 
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 from sqlalchemy import ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -59,6 +59,11 @@ class Persona(database.Model, UniversalMixin):
     ultimo_plaza_id: Mapped[int] = mapped_column(Integer, default=2182)
     ultimo_puesto_id: Mapped[int] = mapped_column(Integer, default=135)
 
+    # Columnas para mantener la cuenta de nomina (primera activa que NO es del banco 9) y la de monedero (del banco 9)
+    # que se actualizan cada vez que se agrega, modifica o elimina una cuenta
+    cuenta_nomina_id: Mapped[Optional[int]] = mapped_column(Integer)
+    cuenta_monedero_id: Mapped[Optional[int]] = mapped_column(Integer)
+
     # Columnas para sindicalizados
     sub_sis: Mapped[int] = mapped_column(Integer, default=0)
     nivel: Mapped[int] = mapped_column(Integer, default=0)
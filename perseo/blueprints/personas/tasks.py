@@ -7,7 +7,7 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
+from sqlalchemy import exists, func, or_, select, update
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -22,13 +22,14 @@ from lib.exceptions import (
 )
 from lib.google_cloud_storage import upload_file_to_gcs
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
 from perseo.blueprints.nominas.models import Nomina
 from perseo.blueprints.personas.models import Persona
 from perseo.blueprints.plazas.models import Plaza
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 GCS_BASE_DIRECTORY = "personas"
 LOCAL_BASE_DIRECTORY = "exports/personas"
@@ -37,14 +38,10 @@ TIMEZONE = "America/Mexico_City"
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/personas.log")
+empunadura = logging.FileHandler("logs/personas.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
     """Actualizar último centro de trabajo y plaza de las Personas"""
@@ -61,9 +58,9 @@ def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
             mensaje_error = f"La Persona con ID {persona_id} está eliminada"
             bitacora.error(mensaje_error)
             raise MyIsDeletedError(mensaje_error)
-        personas = [persona]
-    else:
-        personas = Persona.query.filter_by(estatus="A").order_by(Persona.rfc).all()
+
+    # Iniciar sesion con la base de datos
+    sesion = database.session
 
     # Definir la instancia con el centro de trabajo "NO DEFINIDO"
     centro_trabajo_no_definido = CentroTrabajo.query.filter_by(clave="ND").first()
@@ -90,14 +87,11 @@ def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
     bitacora.info(mensaje)
     mensajes.append(mensaje)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "ES ACTIVO",
             "RFC",
@@ -115,74 +109,94 @@ def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
         ]
     )
 
-    # Bucle por las Personas
-    contador = 0
-    activos_contador = 0
-    inactivos_contador = 0
-    actualizaciones_contador = 0
-    for persona in personas:
-        # Incrementar el contador
-        contador += 1
-
-        # Consultar la última nómina de la Persona y de la Quincena tomada
-        nomina = (
-            Nomina.query.filter(Nomina.persona_id == persona.id)
-            .filter(Nomina.quincena_id == quincena.id)
-            .filter_by(tipo="SALARIO")
-            .first()
+    # Filtrar las Personas activas, o solo la Persona con el ID proporcionado
+    filtros = [Persona.estatus == "A"]
+    if persona_id is not None:
+        filtros.append(Persona.id == persona_id)
+
+    # Subconsulta con la primera nómina SALARIO de cada Persona en la Quincena tomada
+    primeras_nominas = (
+        select(Nomina.persona_id, func.min(Nomina.id).label("nomina_id"))
+        .where(Nomina.quincena_id == quincena.id)
+        .where(Nomina.tipo == "SALARIO")
+        .group_by(Nomina.persona_id)
+        .subquery()
+    )
+    ultimos = (
+        select(Nomina.persona_id, Nomina.centro_trabajo_id, Nomina.plaza_id)
+        .join(primeras_nominas, Nomina.id == primeras_nominas.c.nomina_id)
+        .subquery()
+    )
+
+    # Actualizar en una sola sentencia a las Personas con nómina y cuyos últimos cambian, entrega sus ID
+    activar = (
+        update(Persona)
+        .where(*filtros)
+        .where(Persona.id == ultimos.c.persona_id)
+        .where(
+            or_(
+                Persona.ultimo_centro_trabajo_id.is_distinct_from(ultimos.c.centro_trabajo_id),
+                Persona.ultimo_plaza_id.is_distinct_from(ultimos.c.plaza_id),
+                Persona.es_activa.is_not(True),
+            )
+        )
+        .values(ultimo_centro_trabajo_id=ultimos.c.centro_trabajo_id, ultimo_plaza_id=ultimos.c.plaza_id, es_activa=True)
+        .returning(Persona.id)
+    )
+    actualizados = set(sesion.scalars(activar, execution_options={"synchronize_session": False}))
+
+    # Actualizar en una sola sentencia a las Personas sin nómina, sus últimos son los NO DEFINIDOS y se desactivan
+    tiene_nomina = exists().where(Nomina.persona_id == Persona.id, Nomina.quincena_id == quincena.id, Nomina.tipo == "SALARIO")
+    desactivar = (
+        update(Persona)
+        .where(*filtros)
+        .where(~tiene_nomina)
+        .where(
+            or_(
+                Persona.ultimo_centro_trabajo_id.is_distinct_from(centro_trabajo_no_definido.id),
+                Persona.ultimo_plaza_id.is_distinct_from(plaza_no_definida.id),
+                Persona.es_activa.is_not(False),
+            )
         )
+        .values(ultimo_centro_trabajo_id=centro_trabajo_no_definido.id, ultimo_plaza_id=plaza_no_definida.id, es_activa=False)
+        .returning(Persona.id)
+    )
+    actualizados.update(sesion.scalars(desactivar, execution_options={"synchronize_session": False}))
+    sesion.commit()
+    actualizaciones_contador = len(actualizados)
+
+    # Consultar las Personas con sus últimos centro de trabajo y plaza para el reporte
+    consulta = (
+        select(
+            Persona.id,
+            Persona.es_activa,
+            Persona.rfc,
+            Persona.nombres,
+            Persona.apellido_primero,
+            Persona.apellido_segundo,
+            Persona.curp,
+            Persona.modelo,
+            Persona.num_empleado,
+            CentroTrabajo.clave.label("centro_trabajo_clave"),
+            CentroTrabajo.descripcion.label("centro_trabajo_descripcion"),
+            Plaza.clave.label("plaza_clave"),
+            Plaza.descripcion.label("plaza_descripcion"),
+        )
+        .outerjoin(CentroTrabajo, CentroTrabajo.id == Persona.ultimo_centro_trabajo_id)
+        .outerjoin(Plaza, Plaza.id == Persona.ultimo_plaza_id)
+        .where(*filtros)
+        .order_by(Persona.rfc)
+    )
 
-        # Si no hay nómina..
-        if nomina is None:
-            # Entonces los ultimos seran no definidos y se desactiva
-            ultimo_centro_trabajo_id = centro_trabajo_no_definido.id
-            ultimo_plaza_id = plaza_no_definida.id
-            es_activa_o_inactiva = False
-            inactivos_contador += 1
-        else:
-            # De lo contrario, se toman los valores de la nómina
-            ultimo_centro_trabajo_id = nomina.centro_trabajo_id
-            ultimo_plaza_id = nomina.plaza_id
-            es_activa_o_inactiva = True
+    # Bucle por las Personas para agregar las filas al archivo XLSX
+    activos_contador = 0
+    inactivos_contador = 0
+    for persona in sesion.execute(consulta.execution_options(yield_per=1000)):
+        if persona.es_activa:
             activos_contador += 1
-
-        # Iniciar bandera para saber si se va a actualizar
-        se_va_a_actualizar = False
-
-        # Si cambia el último centro de trabajo
-        if persona.ultimo_centro_trabajo_id != ultimo_centro_trabajo_id:
-            persona.ultimo_centro_trabajo_id = ultimo_centro_trabajo_id
-            se_va_a_actualizar = True
-
-        # Si cambia la última plaza
-        if persona.ultimo_plaza_id != ultimo_plaza_id:
-            persona.ultimo_plaza_id = ultimo_plaza_id
-            se_va_a_actualizar = True
-
-        # Si cambia es_activo
-        if persona.es_activa != es_activa_o_inactiva:
-            persona.es_activa = es_activa_o_inactiva
-            se_va_a_actualizar = True
-
-        # Si se va a actualizar
-        if se_va_a_actualizar:
-            persona.save()
-            actualizaciones_contador += 1
-
-        # Si el ultimo centro de trabajo NO es NO DEFINIDO, se consulta
-        if persona.ultimo_centro_trabajo_id != centro_trabajo_no_definido.id:
-            ultimo_centro_trabajo = CentroTrabajo.query.filter_by(id=persona.ultimo_centro_trabajo_id).first()
-        else:
-            ultimo_centro_trabajo = centro_trabajo_no_definido
-
-        # Si la última plaza NO es NO DEFINIDA, se consulta
-        if persona.ultimo_plaza_id != plaza_no_definida.id:
-            ultimo_plaza = Plaza.query.filter_by(id=persona.ultimo_plaza_id).first()
         else:
-            ultimo_plaza = plaza_no_definida
-
-        # Agregar la fila con los datos
-        hoja.append(
+            inactivos_contador += 1
+        libro.append(
             [
                 int(persona.es_activa),
                 persona.rfc,
@@ -192,11 +206,11 @@ def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
                 persona.curp,
                 persona.modelo,
                 persona.num_empleado,
-                ultimo_centro_trabajo.clave,
-                ultimo_centro_trabajo.descripcion,
-                ultimo_plaza.clave,
-                ultimo_plaza.descripcion,
-                int(se_va_a_actualizar),
+                persona.centro_trabajo_clave,
+                persona.centro_trabajo_descripcion,
+                persona.plaza_clave,
+                persona.plaza_descripcion,
+                int(persona.id in actualizados),
             ]
         )
 
@@ -253,6 +267,7 @@ def actualizar_ultimos_xlsx(persona_id: int = None) -> tuple[str, str, str]:
     return mensaje_termino, nombre_archivo_xlsx, public_url
 
 
+@con_aplicacion
 def lanzar_actualizar_ultimos_xlsx(persona_id: int = None):
     """Actualizar último centro de trabajo, plaza y puesto de las Personas"""
 
@@ -276,17 +291,14 @@ def exportar_xlsx() -> tuple[str, str, str]:
     """Exportar Personas a un archivo XLSX"""
     bitacora.info("Inicia exportar Personas a un archivo XLSX")
 
-    # Consultar Personas
-    personas = Persona.query.filter_by(estatus="A").order_by(Persona.rfc).all()
+    # Consultar Personas, se leen de mil en mil para no cargarlas todas en memoria
+    personas = Persona.query.filter_by(estatus="A").order_by(Persona.rfc).yield_per(1000)
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "ID",
             "RFC",
@@ -304,32 +316,25 @@ def exportar_xlsx() -> tuple[str, str, str]:
         ]
     )
 
-    # Inicializar el contador
-    contador = 0
-
-    # Bucle por las Personas
-    for persona in personas:
-        # Agregar la fila con los datos
-        hoja.append(
-            [
-                persona.id,
-                persona.rfc,
-                persona.nombres,
-                persona.apellido_primero,
-                persona.apellido_segundo,
-                persona.curp,
-                persona.codigo_postal_fiscal,
-                persona.modelo,
-                persona.num_empleado,
-                persona.seguridad_social,
-                persona.ingreso_gobierno_fecha,
-                persona.ingreso_pj_fecha,
-                persona.nacimiento_fecha,
-            ]
-        )
-
-        # Incrementar el contador
-        contador += 1
+    # Agregar las filas con los datos conforme se leen de la consulta, entrega cuantas se agregaron
+    contador = libro.append_rows(
+        [
+            persona.id,
+            persona.rfc,
+            persona.nombres,
+            persona.apellido_primero,
+            persona.apellido_segundo,
+            persona.curp,
+            persona.codigo_postal_fiscal,
+            persona.modelo,
+            persona.num_empleado,
+            persona.seguridad_social,
+            persona.ingreso_gobierno_fecha,
+            persona.ingreso_pj_fecha,
+            persona.nacimiento_fecha,
+        ]
+        for persona in personas
+    )
 
     # Si el contador es 0, entonces no hay Personas
     if contador == 0:
@@ -379,6 +384,7 @@ def exportar_xlsx() -> tuple[str, str, str]:
     return mensaje_termino, nombre_archivo_xlsx, public_url
 
 
+@con_aplicacion
 def lanzar_exportar_xlsx():
     """Exportar Personas a un archivo XLSX"""
 
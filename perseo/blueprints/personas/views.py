@@ -7,7 +7,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import get_datatable_parameters, output_datatable_json, project_columns
 from lib.safe_string import safe_curp, safe_message, safe_rfc, safe_string
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.centros_trabajos.models import CentroTrabajo
@@ -67,8 +67,21 @@ def datatable_json():
             consulta = consulta.filter_by(modelo=modelo)
         except ValueError:
             pass
+    # Declarar las columnas que se entregan, sin cargar el tabulador de cada persona
+    columnas = {
+        "id": Persona.id,
+        "rfc": Persona.rfc,
+        "tabulador_id": Persona.tabulador_id,
+        "nombres": Persona.nombres,
+        "apellido_primero": Persona.apellido_primero,
+        "apellido_segundo": Persona.apellido_segundo,
+        "curp": Persona.curp,
+        "num_empleado": Persona.num_empleado,
+        "modelo": Persona.modelo,
+        "codigo_postal_fiscal": Persona.codigo_postal_fiscal,
+    }
     # Ordenar y paginar
-    registros = consulta.order_by(Persona.rfc).offset(start).limit(rows_per_page).all()
+    registros = project_columns(consulta, columnas).order_by(Persona.rfc).offset(start).limit(rows_per_page).all()
     total = consulta.count()
     # Elaborar datos para DataTable
     data = []
@@ -80,7 +93,7 @@ def datatable_json():
                     "url": url_for("personas.detail", persona_id=resultado.id),
                 },
                 "tabulador": {
-                    "id": resultado.tabulador.id,
+                    "id": resultado.tabulador_id,
                     "url": url_for("tabuladores.detail", tabulador_id=resultado.tabulador_id),
                 },
                 "nombres": resultado.nombres,
@@ -7,7 +7,6 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -20,9 +19,9 @@ from lib.exceptions import (
 )
 from lib.google_cloud_storage import upload_file_to_gcs
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.plazas.models import Plaza
-from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 GCS_BASE_DIRECTORY = "plazas"
 LOCAL_BASE_DIRECTORY = "exports/plazas"
@@ -31,30 +30,23 @@ TIMEZONE = "America/Mexico_City"
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/plazas.log")
+empunadura = logging.FileHandler("logs/plazas.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def exportar_xlsx() -> tuple[str, str, str]:
     """Exportar Plazas a un archivo XLSX"""
     bitacora.info("Inicia exportar Plazas a un archivo XLSX")
 
-    # Consultar Plazas
-    plazas = Plaza.query.filter_by(estatus="A").order_by(Plaza.clave).all()
-
-    # Iniciar el archivo XLSX
-    libro = Workbook()
+    # Consultar Plazas, se leen de mil en mil para no cargarlas todas en memoria
+    plazas = Plaza.query.filter_by(estatus="A").order_by(Plaza.clave).yield_per(1000)
 
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "ID",
             "CLAVE",
@@ -62,22 +54,15 @@ def exportar_xlsx() -> tuple[str, str, str]:
         ]
     )
 
-    # Inicializar el contador
-    contador = 0
-
-    # Bucle por los Plazas
-    for plaza in plazas:
-        # Agregar la fila con los datos
-        hoja.append(
-            [
-                plaza.id,
-                plaza.clave,
-                plaza.descripcion,
-            ]
-        )
-
-        # Incrementar el contador
-        contador += 1
+    # Agregar las filas con los datos conforme se leen de la consulta, entrega cuantas se agregaron
+    contador = libro.append_rows(
+        [
+            plaza.id,
+            plaza.clave,
+            plaza.descripcion,
+        ]
+        for plaza in plazas
+    )
 
     # Si el contador es cero, entonces no hay Plazas
     if contador == 0:
@@ -127,6 +112,7 @@ def exportar_xlsx() -> tuple[str, str, str]:
     return mensaje_termino, nombre_archivo_xlsx, public_url
 
 
+@con_aplicacion
 def lanzar_exportar_xlsx():
     """Exportar Plazas a un archivo XLSX"""
 
@@ -6,10 +6,10 @@ import logging
 
 from lib.exceptions import MyAnyError, MyNotExistsError
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
 from perseo.blueprints.bancos.models import Banco
 from perseo.blueprints.quincenas.models import Quincena
 from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 GCS_BASE_DIRECTORY = "reports/quincenas"
 LOCAL_BASE_DIRECTORY = "reports/quincenas"
@@ -18,14 +18,10 @@ TIMEZONE = "America/Mexico_City"
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/quincenas.log")
+empunadura = logging.FileHandler("logs/quincenas.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def cerrar() -> str:
     """Cerrar TODAS las quincenas con estado ABIERTA"""
@@ -78,6 +74,7 @@ def cerrar() -> str:
     return f"Quincenas cerradas: {quincenas_cerradas_str}. Bancos actualizados {bancos_actualizados_str}"
 
 
+@con_aplicacion
 def lanzar_cerrar() -> str:
     """Cerrar TODAS las quincenas con estado ABIERTA"""
 
@@ -40,6 +40,7 @@ class QuincenaProducto(database.Model, UniversalMixin):
     archivo: Mapped[str] = mapped_column(String(256), default="", server_default="")
     es_satisfactorio: Mapped[bool] = mapped_column(default=False)
     fuente: Mapped[str] = mapped_column(Enum(*FUENTES, name="quincenas_productos_fuentes"), index=True)
+    huella: Mapped[str] = mapped_column(String(64), default="", server_default="")  # SHA-256 de los datos que uso
     mensajes: Mapped[str] = mapped_column(Text, default="", server_default="")
     url: Mapped[str] = mapped_column(String(512), default="", server_default="")
 
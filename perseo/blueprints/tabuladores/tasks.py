@@ -7,7 +7,7 @@ from datetime import datetime
 from pathlib import Path
 
 import pytz
-from openpyxl import Workbook
+from sqlalchemy.orm import contains_eager
 
 from config.settings import get_settings
 from lib.exceptions import (
@@ -20,10 +20,10 @@ from lib.exceptions import (
 )
 from lib.google_cloud_storage import upload_file_to_gcs
 from lib.tasks import set_task_error, set_task_progress
-from perseo.app import create_app
+from lib.xlsx_writer import XLSXWriter
 from perseo.blueprints.puestos.models import Puesto
 from perseo.blueprints.tabuladores.models import Tabulador
-from perseo.extensions import database
+from perseo.worker import con_aplicacion
 
 GCS_BASE_DIRECTORY = "tabuladores"
 LOCAL_BASE_DIRECTORY = "exports/tabuladores"
@@ -32,35 +32,29 @@ TIMEZONE = "America/Mexico_City"
 bitacora = logging.getLogger(__name__)
 bitacora.setLevel(logging.INFO)
 formato = logging.Formatter("%(asctime)s:%(levelname)s:%(message)s")
-empunadura = logging.FileHandler("logs/tabuladores.log")
+empunadura = logging.FileHandler("logs/tabuladores.log", delay=True)
 empunadura.setFormatter(formato)
 bitacora.addHandler(empunadura)
 
-app = create_app()
-app.app_context().push()
-database.app = app
-
 
 def exportar_xlsx() -> tuple[str, str, str]:
     """Exportar Tabuladores a un archivo XLSX"""
     bitacora.info("Inicia exportar Tabuladores a un archivo XLSX")
 
-    # Consultar Tabuladores
+    # Consultar Tabuladores, se leen de mil en mil para no cargarlos todos en memoria
     tabuladores = (
         Tabulador.query.join(Puesto)
         .filter(Tabulador.estatus == "A")
+        .options(contains_eager(Tabulador.puesto))
         .order_by(Puesto.clave, Tabulador.modelo, Tabulador.nivel, Tabulador.quinquenio)
-        .all()
+        .yield_per(1000)
     )
 
-    # Iniciar el archivo XLSX
-    libro = Workbook()
-
-    # Tomar la hoja del libro XLSX
-    hoja = libro.active
+    # Iniciar el archivo XLSX de solo escritura
+    libro = XLSXWriter()
 
     # Agregar la fila con las cabeceras de las columnas
-    hoja.append(
+    libro.append(
         [
             "ID",
             "PUESTO CLAVE",
@@ -90,44 +84,37 @@ def exportar_xlsx() -> tuple[str, str, str]:
         ]
     )
 
-    # Inicializar el contador
-    contador = 0
-
-    # Bucle por los Tabuladores
-    for tabulador in tabuladores:
-        # Agregar la fila con los datos
-        hoja.append(
-            [
-                tabulador.id,
-                tabulador.puesto.clave,
-                tabulador.modelo,
-                tabulador.nivel,
-                tabulador.quinquenio,
-                tabulador.fecha,
-                tabulador.sueldo_base,
-                tabulador.incentivo,
-                tabulador.monedero,
-                tabulador.rec_cul_dep,
-                tabulador.sobresueldo,
-                tabulador.rec_dep_cul_gravado,
-                tabulador.rec_dep_cul_excento,
-                tabulador.ayuda_transp,
-                tabulador.monto_quinquenio,
-                tabulador.total_percepciones,
-                tabulador.salario_diario,
-                tabulador.prima_vacacional_mensual,
-                tabulador.aguinaldo_mensual,
-                tabulador.prima_vacacional_mensual_adicional,
-                tabulador.total_percepciones_integrado,
-                tabulador.salario_diario_integrado,
-                tabulador.pension_vitalicia_excento,
-                tabulador.pension_vitalicia_gravable,
-                tabulador.pension_bonificacion,
-            ]
-        )
-
-        # Incrementar el contador
-        contador += 1
+    # Agregar las filas con los datos conforme se leen de la consulta, entrega cuantas se agregaron
+    contador = libro.append_rows(
+        [
+            tabulador.id,
+            tabulador.puesto.clave,
+            tabulador.modelo,
+            tabulador.nivel,
+            tabulador.quinquenio,
+            tabulador.fecha,
+            tabulador.sueldo_base,
+            tabulador.incentivo,
+            tabulador.monedero,
+            tabulador.rec_cul_dep,
+            tabulador.sobresueldo,
+            tabulador.rec_dep_cul_gravado,
+            tabulador.rec_dep_cul_excento,
+            tabulador.ayuda_transp,
+            tabulador.monto_quinquenio,
+            tabulador.total_percepciones,
+            tabulador.salario_diario,
+            tabulador.prima_vacacional_mensual,
+            tabulador.aguinaldo_mensual,
+            tabulador.prima_vacacional_mensual_adicional,
+            tabulador.total_percepciones_integrado,
+            tabulador.salario_diario_integrado,
+            tabulador.pension_vitalicia_excento,
+            tabulador.pension_vitalicia_gravable,
+            tabulador.pension_bonificacion,
+        ]
+        for tabulador in tabuladores
+    )
 
     # Si el contador es cero, entonces no hay Tabuladores
     if contador == 0:
@@ -177,6 +164,7 @@ def exportar_xlsx() -> tuple[str, str, str]:
     return mensaje_termino, nombre_archivo_xlsx, public_url
 
 
+@con_aplicacion
 def lanzar_exportar_xlsx():
     """Exportar Tabuladores a un archivo XLSX"""
 
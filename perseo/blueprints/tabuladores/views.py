@@ -7,7 +7,7 @@ import json
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import get_datatable_parameters, output_datatable_json, project_columns
 from lib.safe_string import safe_clave, safe_message
 from perseo.blueprints.bitacoras.models import Bitacora
 from perseo.blueprints.modulos.models import Modulo
@@ -58,8 +58,20 @@ def datatable_json():
                 consulta = consulta.filter(Puesto.clave.contains(puesto_clave))
         except ValueError:
             pass
+    # Declarar las columnas que se entregan, las relaciones se unen en la misma consulta
+    columnas = {
+        "id": Tabulador.id,
+        "puesto_id": Tabulador.puesto_id,
+        "puesto_clave": (Tabulador.puesto, Puesto.clave),
+        "modelo": Tabulador.modelo,
+        "nivel": Tabulador.nivel,
+        "quinquenio": Tabulador.quinquenio,
+        "fecha": Tabulador.fecha,
+        "sueldo_base": Tabulador.sueldo_base,
+        "monedero": Tabulador.monedero,
+    }
     # Ordenar y paginar
-    registros = consulta.order_by(Tabulador.id).offset(start).limit(rows_per_page).all()
+    registros = project_columns(consulta, columnas).order_by(Tabulador.id).offset(start).limit(rows_per_page).all()
     total = consulta.count()
     # Elaborar datos para DataTable
     data = []
@@ -71,7 +83,7 @@ def datatable_json():
                     "url": url_for("tabuladores.detail", tabulador_id=resultado.id),
                 },
                 "puesto": {
-                    "clave": resultado.puesto.clave,
+                    "clave": resultado.puesto_clave,
                     "url": url_for("puestos.detail", puesto_id=resultado.puesto_id),
                 },
                 "modelo": resultado.modelo,
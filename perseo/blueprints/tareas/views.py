@@ -6,10 +6,12 @@ import json
 
 from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from redis.exceptions import RedisError
 
 from lib.datatables import get_datatable_parameters, output_datatable_json
 from lib.exceptions import MyAnyError
 from lib.google_cloud_storage import get_blob_name_from_url, get_file_from_gcs
+from lib.tasks import get_task_last_event_key
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.tareas.models import Tarea
 from perseo.blueprints.usuarios.decorators import permission_required
@@ -105,6 +107,33 @@ def detail(tarea_id):
     return render_template("tareas/detail.jinja2", tarea=tarea)
 
 
+@tareas.route("/tareas/<tarea_id>/progreso")
+@login_required
+def progress(tarea_id):
+    """Progreso de una Tarea en JSON, el detalle lo consulta cada pocos segundos mientras no termine"""
+
+    # Consultar la Tarea
+    tarea = Tarea.query.get_or_404(tarea_id)
+
+    # Tomar el último evento de Redis
+    try:
+        ultimo = current_app.redis.get(get_task_last_event_key(tarea.id))
+    except RedisError:
+        ultimo = None
+    if ultimo is not None:
+        return json.loads(ultimo)
+
+    # Si no hay un último evento en Redis, elaborarlo con la Tarea
+    return {
+        "progreso": 100 if tarea.ha_terminado else 0,
+        "mensaje": tarea.mensaje,
+        "archivo": tarea.archivo,
+        "url": tarea.url,
+        "ha_terminado": tarea.ha_terminado,
+        "error": False,
+    }
+
+
 @tareas.route("/tareas/<tarea_id>/xlsx")
 @login_required
 def download_xlsx(tarea_id):
@@ -7,7 +7,7 @@ import json
 from flask import Blueprint, current_app, flash, make_response, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
-from lib.datatables import get_datatable_parameters, output_datatable_json
+from lib.datatables import get_datatable_parameters, output_datatable_json, project_columns
 from lib.exceptions import MyAnyError
 from lib.google_cloud_storage import get_blob_name_from_url, get_file_from_gcs
 from lib.safe_string import safe_message, safe_quincena, safe_rfc
@@ -61,8 +61,18 @@ def datatable_json():
     if "persona_rfc" in request.form:
         consulta = consulta.join(Persona)
         consulta = consulta.filter(Persona.rfc.contains(safe_rfc(request.form["persona_rfc"], search_fragment=True)))
+    # Declarar las columnas que se entregan, las relaciones se unen en la misma consulta
+    columnas = {
+        "id": Timbrado.id,
+        "tfd_uuid": Timbrado.tfd_uuid,
+        "quincena_clave": (Timbrado.nomina, Nomina.quincena, Quincena.clave),
+        "persona_rfc": (Timbrado.nomina, Nomina.persona, Persona.rfc),
+        "persona_nombres": (Timbrado.nomina, Nomina.persona, Persona.nombres),
+        "persona_apellido_primero": (Timbrado.nomina, Nomina.persona, Persona.apellido_primero),
+        "persona_apellido_segundo": (Timbrado.nomina, Nomina.persona, Persona.apellido_segundo),
+    }
     # Ordenar y paginar
-    registros = consulta.order_by(Timbrado.id.desc()).offset(start).limit(rows_per_page).all()
+    registros = project_columns(consulta, columnas).order_by(Timbrado.id.desc()).offset(start).limit(rows_per_page).all()
     total = consulta.count()
     # Elaborar datos para DataTable
     data = []
@@ -73,9 +83,11 @@ def datatable_json():
                     "tfd_uuid": resultado.tfd_uuid,
                     "url": url_for("timbrados.detail", timbrado_id=resultado.id),
                 },
-                "quincena_clave": resultado.nomina.quincena.clave,
-                "persona_rfc": resultado.nomina.persona.rfc,
-                "persona_nombre_completo": resultado.nomina.persona.nombre_completo,
+                "quincena_clave": resultado.quincena_clave,
+                "persona_rfc": resultado.persona_rfc,
+                "persona_nombre_completo": (
+                    f"{resultado.persona_nombres} {resultado.persona_apellido_primero} {resultado.persona_apellido_segundo}"
+                ),
             }
         )
     # Entregar JSON
@@ -0,0 +1,134 @@
+"""
+Usuarios, cache de permisos
+
+Los permisos y el menú principal de cada usuario se compilan con una sola consulta
+y se guardan en Redis con la versión vigente de los permisos en la clave:
+
+    permisos:usuario:{usuario_id}:v{version}
+
+Cuando se confirma (commit) un cambio en Permiso, Rol, UsuarioRol o Modulo se incrementa
+la versión, así las claves anteriores dejan de usarse y vencen solas.
+Si Redis no está disponible se compilan desde la base de datos en cada petición.
+"""
+
+import json
+
+from flask import current_app, has_app_context
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from perseo.blueprints.modulos.models import Modulo
+from perseo.blueprints.permisos.models import Permiso
+from perseo.blueprints.roles.models import Rol
+from perseo.blueprints.usuarios_roles.models import UsuarioRol
+from perseo.extensions import database
+
+PERMISOS_CACHE_TTL = 3600  # Segundos que se conserva lo compilado de cada usuario
+PERMISOS_VERSION_KEY = "permisos:version"
+MODELOS_CON_PERMISOS = (Modulo, Permiso, Rol, UsuarioRol)
+
+
+def get_permisos_version() -> int | None:
+    """Consultar la versión vigente de los permisos, entrega None si Redis no está disponible"""
+    try:
+        version = current_app.redis.get(PERMISOS_VERSION_KEY)
+    except RedisError:
+        return None
+    if version is None:
+        return 0
+    return int(version)
+
+
+def bump_permisos_version() -> None:
+    """Incrementar la versión de los permisos para que se compilen de nuevo"""
+    try:
+        current_app.redis.incr(PERMISOS_VERSION_KEY)
+    except RedisError:
+        pass
+
+
+def compilar_permisos(usuario_id: int) -> dict:
+    """Compilar en una sola consulta los permisos y los módulos del menú principal del usuario"""
+
+    # Consultar los permisos activos de los roles activos del usuario, con su módulo
+    renglones = (
+        database.session.query(
+            Modulo.nombre,
+            Modulo.nombre_corto,
+            Modulo.icono,
+            Modulo.ruta,
+            Modulo.en_navegacion,
+            Permiso.nivel,
+        )
+        .select_from(UsuarioRol)
+        .join(Permiso, Permiso.rol_id == UsuarioRol.rol_id)
+        .join(Modulo, Modulo.id == Permiso.modulo_id)
+        .filter(UsuarioRol.usuario_id == usuario_id)
+        .filter(UsuarioRol.estatus == "A")
+        .filter(Permiso.estatus == "A")
+        .all()
+    )
+
+    # Tomar el nivel más alto de cada módulo y los módulos que van en la navegación
+    permisos = {}
+    menu = {}
+    for nombre, nombre_corto, icono, ruta, en_navegacion, nivel in renglones:
+        if nombre not in permisos or nivel > permisos[nombre]:
+            permisos[nombre] = nivel
+        if nivel > 0 and en_navegacion and nombre not in menu:
+            menu[nombre] = {"nombre": nombre, "nombre_corto": nombre_corto, "icono": icono, "ruta": ruta}
+
+    # Entregar los permisos y el menú ordenado por el nombre corto
+    return {
+        "permisos": permisos,
+        "modulos_menu_principal": sorted(menu.values(), key=lambda modulo: modulo["nombre_corto"]),
+    }
+
+
+def get_permisos_compilados(usuario_id: int) -> dict:
+    """Entregar los permisos compilados del usuario, de Redis si están vigentes o compilándolos"""
+
+    # Si Redis no está disponible, compilar
+    version = get_permisos_version()
+    if version is None:
+        return compilar_permisos(usuario_id)
+
+    # Buscar en Redis lo compilado con la versión vigente
+    clave = f"permisos:usuario:{usuario_id}:v{version}"
+    try:
+        compilado = current_app.redis.get(clave)
+        if compilado is not None:
+            return json.loads(compilado)
+    except RedisError:
+        return compilar_permisos(usuario_id)
+
+    # Compilar y guardar en Redis
+    compilado = compilar_permisos(usuario_id)
+    try:
+        current_app.redis.setex(clave, PERMISOS_CACHE_TTL, json.dumps(compilado))
+    except RedisError:
+        pass
+    return compilado
+
+
+@event.listens_for(Session, "after_flush")
+def _marcar_cambios_en_permisos(session, flush_context):
+    """Al escribir cambios en los modelos de permisos, marcar la sesión para incrementar la versión al confirmar"""
+    for instancia in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instancia, MODELOS_CON_PERMISOS):
+            session.info["permisos_cambiados"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _incrementar_version_al_confirmar(session):
+    """Si la sesión confirmada cambió los permisos, incrementar la versión"""
+    if session.info.pop("permisos_cambiados", False) and has_app_context():
+        bump_permisos_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios_en_permisos(session):
+    """Si se revierte la sesión, no hay cambios que invalidar"""
+    session.info.pop("permisos_cambiados", None)
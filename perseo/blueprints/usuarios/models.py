@@ -13,6 +13,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from lib.universal_mixin import UniversalMixin
 from perseo.blueprints.permisos.models import Permiso
 from perseo.blueprints.tareas.models import Tarea
+from perseo.blueprints.usuarios.cache import get_permisos_compilados
 from perseo.blueprints.usuarios_roles.models import UsuarioRol
 from perseo.extensions import database, pwd_context
 
@@ -47,50 +48,29 @@ class Usuario(database.Model, UserMixin, UniversalMixin):
     tareas: Mapped[List["Tarea"]] = relationship("Tarea", back_populates="usuario")
     usuarios_roles: Mapped[List["UsuarioRol"]] = relationship("UsuarioRol", back_populates="usuario")
 
-    # Propiedades
-    modulos_menu_principal_consultados = []
-    permisos_consultados = {}
+    # Permisos compilados, se consultan una vez por petición (cada petición carga su propio usuario)
+    permisos_compilados = None
 
     @property
     def nombre(self):
         """Junta nombres, apellido primero y apellido segundo"""
         return self.nombres + " " + self.apellido_primero + " " + self.apellido_segundo
 
+    def get_permisos_compilados(self) -> dict:
+        """Consultar los permisos compilados del usuario, de Redis si están vigentes"""
+        if self.permisos_compilados is None:
+            self.permisos_compilados = get_permisos_compilados(self.id)
+        return self.permisos_compilados
+
     @property
     def modulos_menu_principal(self):
         """Elaborar listado con los modulos ordenados para el menu principal"""
-        if len(self.modulos_menu_principal_consultados) > 0:
-            return self.modulos_menu_principal_consultados
-        modulos = []
-        modulos_nombres = []
-        for usuario_rol in self.usuarios_roles:
-            if usuario_rol.estatus == "A":
-                for permiso in usuario_rol.rol.permisos:
-                    if (
-                        permiso.modulo.nombre not in modulos_nombres
-                        and permiso.estatus == "A"
-                        and permiso.nivel > 0
-                        and permiso.modulo.en_navegacion
-                    ):
-                        modulos.append(permiso.modulo)
-                        modulos_nombres.append(permiso.modulo.nombre)
-        self.modulos_menu_principal_consultados = sorted(modulos, key=lambda x: x.nombre_corto)
-        return self.modulos_menu_principal_consultados
+        return self.get_permisos_compilados()["modulos_menu_principal"]
 
     @property
     def permisos(self):
         """Entrega un diccionario con todos los permisos"""
-        if len(self.permisos_consultados) > 0:
-            return self.permisos_consultados
-        self.permisos_consultados = {}
-        for usuario_rol in self.usuarios_roles:
-            if usuario_rol.estatus == "A":
-                for permiso in usuario_rol.rol.permisos:
-                    if permiso.estatus == "A":
-                        etiqueta = permiso.modulo.nombre
-                        if etiqueta not in self.permisos_consultados or permiso.nivel > self.permisos_consultados[etiqueta]:
-                            self.permisos_consultados[etiqueta] = permiso.nivel
-        return self.permisos_consultados
+        return self.get_permisos_compilados()["permisos"]
 
     @classmethod
     def find_by_identity(cls, identity):
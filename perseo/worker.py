@@ -0,0 +1,76 @@
+"""
+Worker de RQ
+
+Los módulos de tareas ya no construyen la aplicación al importarse. El worker la construye
+una sola vez por proceso, empuja su contexto e importa los módulos de TAREAS_MODULOS antes
+de esperar trabajos; así cada trabajo, que RQ ejecuta en un proceso hijo, ya los hereda listos.
+
+    python -m perseo.worker
+
+Cada tarea que se lanza con Usuario.launch_task lleva el decorador con_aplicacion,
+que si se ejecuta fuera de este worker (por ejemplo con rq worker) construye la aplicación la primera vez.
+"""
+
+import importlib
+from functools import wraps
+
+from flask import Flask, has_app_context
+
+TAREAS_MODULOS = (
+    "perseo.blueprints.bancos.tasks",
+    "perseo.blueprints.centros_trabajos.tasks",
+    "perseo.blueprints.conceptos.tasks",
+    "perseo.blueprints.nominas.tasks",
+    "perseo.blueprints.personas.tasks",
+    "perseo.blueprints.plazas.tasks",
+    "perseo.blueprints.puestos.tasks",
+    "perseo.blueprints.quincenas.tasks",
+    "perseo.blueprints.tabuladores.tasks",
+)
+
+_app = None
+
+
+def get_worker_app() -> Flask:
+    """Construir la aplicación una sola vez por proceso y empujar su contexto"""
+    global _app
+    if _app is None:
+        # Se importa aquí para que importar este módulo no construya nada
+        from perseo.app import create_app
+        from perseo.extensions import database
+
+        _app = create_app()
+        _app.app_context().push()
+        database.app = _app
+    return _app
+
+
+def con_aplicacion(funcion):
+    """Decorador que se asegura de tener el contexto de la aplicación antes de ejecutar la tarea"""
+
+    @wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not has_app_context():
+            get_worker_app()
+        return funcion(*args, **kwargs)
+
+    return envoltura
+
+
+def main():
+    """Construir la aplicación, importar las tareas y esperar trabajos"""
+    # Se importa aquí porque solo lo necesita el worker
+    from rq import Worker
+
+    # Construir la aplicación e importar los módulos de tareas antes de que RQ cree los procesos hijos
+    app = get_worker_app()
+    for modulo in TAREAS_MODULOS:
+        importlib.import_module(modulo)
+
+    # Esperar trabajos en la cola de las tareas
+    worker = Worker([app.task_queue], connection=app.redis)
+    worker.work()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Prueba extraer_cfdi
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+from lib.cfdi_extractor import extraer_cfdi
+
+CFDI_NOMINA = """<?xml version="1.0" encoding="utf-8"?>
+<cfdi:Comprobante xmlns:cfdi="http://www.sat.gob.mx/cfd/4" xmlns:nomina12="http://www.sat.gob.mx/nomina12"
+    xmlns:tfd="http://www.sat.gob.mx/TimbreFiscalDigital" Version="4.0">
+  <cfdi:Emisor Rfc="EMI010101AAA" Nombre="EMISOR" RegimenFiscal="603"/>
+  <cfdi:Receptor Rfc="AAAA000000AA1" Nombre="PERSONA"/>
+  <cfdi:Conceptos>
+    <cfdi:Concepto ClaveProdServ="84111505" Cantidad="1" Importe="1000.00"/>
+  </cfdi:Conceptos>
+  <cfdi:Complemento>
+    <nomina12:Nomina Version="1.2" TipoNomina="O" FechaPago="2024-01-15" FechaInicialPago="2024-01-01"
+        FechaFinalPago="NO-ES-FECHA" TotalPercepciones="1000.5" TotalDeducciones="200.00">
+      <nomina12:Percepciones TotalSueldos="1000.50"/>
+    </nomina12:Nomina>
+    <tfd:TimbreFiscalDigital Version="1.1" UUID="ABC-123" FechaTimbrado="2024-01-17T14:19:16" NoCertificadoSAT="1"/>
+  </cfdi:Complemento>
+</cfdi:Comprobante>
+"""
+
+
+class TestCFDIExtractor(unittest.TestCase):
+    """Pruebas de la función extraer_cfdi"""
+
+    def extraer(self, contenido: str):
+        """Escribir el contenido en un archivo temporal y extraer"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio, "cfdi.xml")
+            ruta.write_text(contenido, encoding="utf8")
+            return extraer_cfdi(ruta)
+
+    def test_cfdi_nomina(self):
+        """CFDI de nómina con el timbre después del complemento de nómina"""
+        cfdi = self.extraer(CFDI_NOMINA)
+        self.assertEqual(cfdi.cfdi_emisor_rfc, "EMI010101AAA")
+        self.assertEqual(cfdi.cfdi_receptor_rfc, "AAAA000000AA1")
+        self.assertEqual(cfdi.tfd_uuid, "ABC-123")
+        self.assertEqual(cfdi.tfd_sello_sat, None)
+        self.assertEqual(cfdi.nomina12_nomina_fecha_pago, date(2024, 1, 15))
+        self.assertEqual(cfdi.nomina12_nomina_fecha_final_pago, None)
+        self.assertEqual(cfdi.nomina12_nomina_total_percepciones, Decimal("1000.5000"))
+        self.assertEqual(cfdi.nomina12_nomina_total_otros_pagos, None)
+
+    def test_no_es_comprobante(self):
+        """Raíz que no es cfdi:Comprobante y XML mal formado"""
+        self.assertIsNone(self.extraer("<otro><cfdi/></otro>"))
+        self.assertIsNone(self.extraer("<cfdi:Comprobante"))
+        self.assertIsNone(self.extraer(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Prueba ManifiestoCFDI
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from lib.cfdi_manifiesto import SUBIDA_ERROR, SUBIDA_SIN_DEPOSITO, SUBIDA_SUBIDO, ManifiestoCFDI
+
+
+class TestCFDIManifiesto(unittest.TestCase):
+    """Pruebas de la clase ManifiestoCFDI"""
+
+    def test_terminados_y_cambiados(self):
+        """Archivo terminado, tocado sin cambios y modificado"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio, "AAAA000000AA1-uuid.xml")
+            ruta.write_text("<cfdi/>", encoding="utf8")
+            manifiesto = ManifiestoCFDI(Path(directorio))
+            self.assertFalse(manifiesto.esta_terminado(ruta))
+            manifiesto.marcar_terminado(ruta, "uuid", 1, SUBIDA_SUBIDO)
+            manifiesto.guardar()
+
+            # Al cargarlo de nuevo, el archivo sigue terminado aunque cambie su fecha de modificación
+            manifiesto = ManifiestoCFDI(Path(directorio))
+            self.assertTrue(manifiesto.esta_terminado(ruta))
+            os.utime(ruta, ns=(0, 0))
+            self.assertTrue(manifiesto.esta_terminado(ruta))
+
+            # Si cambia el contenido con el mismo tamaño, ya no está terminado
+            ruta.write_text("<CFDI/>", encoding="utf8")
+            os.utime(ruta, ns=(0, 0))
+            manifiesto = ManifiestoCFDI(Path(directorio))
+            self.assertFalse(manifiesto.esta_terminado(ruta))
+
+    def test_resultado_de_la_subida(self):
+        """Solo está terminado si se subió, o si se terminó sin depósito y sigue sin haberlo"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio, "AAAA000000AA1-uuid.xml")
+            ruta.write_text("<cfdi/>", encoding="utf8")
+            manifiesto = ManifiestoCFDI(Path(directorio))
+
+            # Terminado sin depósito, hay que subirlo cuando ya hay depósito
+            manifiesto.marcar_terminado(ruta, "uuid", 1, SUBIDA_SIN_DEPOSITO)
+            self.assertTrue(manifiesto.esta_terminado(ruta, con_deposito=False))
+            self.assertFalse(manifiesto.esta_terminado(ruta, con_deposito=True))
+
+            # Si falló la subida, siempre se vuelve a procesar
+            manifiesto.marcar_terminado(ruta, "uuid", 1, SUBIDA_ERROR)
+            self.assertFalse(manifiesto.esta_terminado(ruta, con_deposito=False))
+            self.assertFalse(manifiesto.esta_terminado(ruta, con_deposito=True))
+
+            # Si se subió, queda terminado y el resultado se guarda en el manifiesto
+            manifiesto.marcar_terminado(ruta, "uuid", 1, SUBIDA_SUBIDO)
+            manifiesto.guardar()
+            manifiesto = ManifiestoCFDI(Path(directorio))
+            self.assertEqual(manifiesto.archivos[ruta.name]["subida"], SUBIDA_SUBIDO)
+            self.assertTrue(manifiesto.esta_terminado(ruta, con_deposito=True))
+
+    def test_vinculo_con_la_nomina(self):
+        """Si la nómina ya no tiene el timbrado con ese UUID, se vuelve a procesar"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio, "AAAA000000AA1-uuid.xml")
+            ruta.write_text("<cfdi/>", encoding="utf8")
+            manifiesto = ManifiestoCFDI(Path(directorio))
+            manifiesto.marcar_terminado(ruta, "uuid", 7, SUBIDA_SUBIDO)
+            self.assertTrue(manifiesto.esta_terminado(ruta, vinculados={(7, "uuid")}))
+
+            # Si se volvieron a alimentar las nóminas, la nómina 7 ya no existe o tiene timbrado_id en cero
+            self.assertFalse(manifiesto.esta_terminado(ruta, vinculados=set()))
+            self.assertFalse(manifiesto.esta_terminado(ruta, vinculados={(8, "uuid")}))
+
+            # Un registro de un manifiesto anterior, sin nomina_id, también se vuelve a procesar
+            del manifiesto.archivos[ruta.name]["nomina_id"]
+            self.assertFalse(manifiesto.esta_terminado(ruta, vinculados={(7, "uuid")}))
+
+
+if __name__ == "__main__":
+    unittest.main()
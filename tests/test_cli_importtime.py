@@ -0,0 +1,60 @@
+"""
+Prueba el arranque de la CLI con python -X importtime
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parents[1]
+
+# Módulos que solo deben importarse dentro del comando que los usa
+MODULOS_PESADOS = ("openpyxl", "xlrd", "requests", "google.cloud.storage", "google.cloud.secretmanager", "perseo.app")
+
+# Segundos que puede tardar en importar lo necesario para listar las órdenes
+LIMITE_LISTAR = 1.0
+
+
+def medir_importaciones(*argumentos: str) -> dict:
+    """Ejecutar la CLI con -X importtime y entregar los módulos importados con su tiempo acumulado en segundos"""
+    entorno = dict(os.environ, PYTHONPATH=str(RAIZ))
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from cli.app import cli; cli()", *argumentos],
+        capture_output=True,
+        check=False,
+        cwd=RAIZ,
+        env=entorno,
+        text=True,
+    )
+    modulos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:") :].split("|")
+        modulos[nombre.strip()] = int(acumulado) / 1_000_000
+    return modulos
+
+
+class TestCLIImportTime(unittest.TestCase):
+    """Pruebas del tiempo de arranque de la CLI"""
+
+    def test_listar_ordenes(self):
+        """Listar las órdenes no importa ningún módulo de perseo y es rápido"""
+        modulos = medir_importaciones("--help")
+        self.assertFalse([nombre for nombre in modulos if nombre.startswith("perseo")])
+        self.assertLess(modulos["cli.app"], LIMITE_LISTAR)
+
+    def test_ayuda_de_ordenes(self):
+        """La ayuda de una orden no importa los módulos pesados"""
+        for orden in ("nominas", "personas", "timbrados"):
+            modulos = medir_importaciones(orden, "--help")
+            self.assertIn(f"perseo.blueprints.{orden}.models", modulos)
+            for pesado in MODULOS_PESADOS:
+                self.assertNotIn(pesado, modulos, f"{orden} --help importa {pesado}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+Prueba datatables
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import json
+import unittest
+
+from flask import Flask
+from sqlalchemy import ForeignKey, String, column
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, relationship
+
+from lib.datatables import count_cached, get_datatable_cache_key, paginate_keyset, project_columns
+
+
+class Base(DeclarativeBase):
+    """Base de los modelos de prueba, no se usa una base de datos"""
+
+
+class PersonaPrueba(Base):
+    """Persona"""
+
+    __tablename__ = "personas"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    rfc: Mapped[str] = mapped_column(String(13))
+    curp: Mapped[str] = mapped_column(String(18))
+
+
+class QuincenaPrueba(Base):
+    """Quincena"""
+
+    __tablename__ = "quincenas"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    clave: Mapped[str] = mapped_column(String(6))
+
+
+class NominaPrueba(Base):
+    """Nomina con su persona y su quincena"""
+
+    __tablename__ = "nominas"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    persona_id: Mapped[int] = mapped_column(ForeignKey("personas.id"))
+    persona: Mapped[PersonaPrueba] = relationship()
+    quincena_id: Mapped[int] = mapped_column(ForeignKey("quincenas.id"))
+    quincena: Mapped[QuincenaPrueba] = relationship()
+
+
+class RedisFalso:
+    """Redis en memoria, solo con get y setex"""
+
+    def __init__(self):
+        self.datos = {}
+
+    def get(self, llave):
+        """Entregar el valor o None"""
+        return self.datos.get(llave)
+
+    def setex(self, llave, _segundos, valor):
+        """Guardar el valor, sin vencimiento"""
+        self.datos[llave] = valor
+
+
+class ConsultaFalsa:
+    """Consulta que registra los filtros y el OFFSET, entrega las filas que se le dan"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.column_descriptions = [{"expr": object}]
+        self.filtros = []
+        self.desplazamiento = None
+        self.contador_count = 0
+
+    def add_columns(self, *_columnas):
+        """Agregar columnas, no hace nada"""
+        return self
+
+    def order_by(self, *_columnas):
+        """Ordenar, no hace nada"""
+        return self
+
+    def filter(self, condicion):
+        """Registrar el filtro"""
+        self.filtros.append(condicion)
+        return self
+
+    def offset(self, desplazamiento):
+        """Registrar el OFFSET"""
+        self.desplazamiento = desplazamiento
+        return self
+
+    def limit(self, _cantidad):
+        """Limitar, no hace nada"""
+        return self
+
+    def all(self):
+        """Entregar las filas"""
+        return self.filas
+
+    def count(self):
+        """Contar las filas y cuantas veces se contaron"""
+        self.contador_count += 1
+        return len(self.filas)
+
+
+class TestDatatables(unittest.TestCase):
+    """Pruebas de paginate_keyset, count_cached y get_datatable_cache_key"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.redis = RedisFalso()
+        self.columnas = [column("clave"), column("id")]
+
+    def test_reutilizar_llave_de_la_pagina_anterior(self):
+        """La página siguiente usa la llave del último registro en lugar de OFFSET"""
+        with self.app.app_context():
+            primera = ConsultaFalsa([("A", "202401", 12), ("B", "202401", 11)])
+            self.assertEqual(paginate_keyset(primera, self.columnas, 0, 2, "datatables:prueba"), ["A", "B"])
+            self.assertEqual(primera.desplazamiento, 0)
+            self.assertEqual(json.loads(self.app.redis.get("datatables:prueba:seek:2")), ["202401", 11])
+
+            segunda = ConsultaFalsa([("C", "202401", 10)])
+            paginate_keyset(segunda, self.columnas, 2, 2, "datatables:prueba")
+            self.assertIsNone(segunda.desplazamiento)
+            self.assertEqual(len(segunda.filtros), 1)
+            self.assertEqual(segunda.filtros[0].right.clauses[1].value, 11)
+
+    def test_sin_llave_se_usa_offset(self):
+        """Si salta de página o venció el cache, se usa OFFSET y se guarda la llave para la siguiente"""
+        with self.app.app_context():
+            consulta = ConsultaFalsa([("E", "202402", 5)])
+            paginate_keyset(consulta, self.columnas, 20, 10, "datatables:prueba")
+            self.assertEqual(consulta.desplazamiento, 20)
+            self.assertEqual(consulta.filtros, [])
+            self.assertIn("datatables:prueba:seek:21", self.app.redis.datos)
+
+    def test_contar_con_cache(self):
+        """El total se cuenta una vez y luego se toma de Redis"""
+        with self.app.app_context():
+            consulta = ConsultaFalsa([("A", 1), ("B", 2), ("C", 3)])
+            self.assertEqual(count_cached(consulta, "datatables:prueba"), 3)
+            self.assertEqual(count_cached(consulta, "datatables:prueba"), 3)
+            self.assertEqual(consulta.contador_count, 1)
+
+    def test_clave_de_cache_estable(self):
+        """Los mismos filtros en otro orden y con otro draw, start o length dan la misma clave"""
+        formulario_a = {"draw": "1", "start": "0", "length": "10", "estatus": "A", "quincena_id": "3"}
+        formulario_b = {"quincena_id": "3", "length": "25", "estatus": "A", "start": "50", "draw": "7"}
+        formulario_c = {"draw": "1", "start": "0", "length": "10", "estatus": "B", "quincena_id": "3"}
+        claves = []
+        for formulario in (formulario_a, formulario_b, formulario_c):
+            with self.app.test_request_context(method="POST", data=formulario):
+                claves.append(get_datatable_cache_key("nominas"))
+        self.assertEqual(claves[0], claves[1])
+        self.assertNotEqual(claves[0], claves[2])
+        self.assertTrue(claves[0].startswith("datatables:nominas:"))
+
+
+class TestProjectColumns(unittest.TestCase):
+    """Pruebas de la función project_columns"""
+
+    def test_columnas_de_relaciones(self):
+        """Las columnas de una relación se unen una sola vez con un alias y se entregan con sus nombres"""
+        consulta = Session().query(NominaPrueba).join(QuincenaPrueba)
+        consulta = project_columns(
+            consulta,
+            {
+                "id": NominaPrueba.id,
+                "quincena_clave": QuincenaPrueba.clave,
+                "persona_rfc": (NominaPrueba.persona, PersonaPrueba.rfc),
+                "persona_curp": (NominaPrueba.persona, PersonaPrueba.curp),
+            },
+        )
+
+        # Se entregan solo las columnas declaradas, con sus nombres como etiquetas
+        nombres = [descripcion["name"] for descripcion in consulta.column_descriptions]
+        self.assertEqual(nombres, ["id", "quincena_clave", "persona_rfc", "persona_curp"])
+
+        # La quincena se toma de la union que ya tenia la consulta y la persona se une una vez con un alias
+        sql = str(consulta.statement.compile())
+        self.assertEqual(sql.count("JOIN quincenas"), 1)
+        self.assertEqual(sql.count("JOIN personas AS personas_1 ON personas_1.id = nominas.persona_id"), 1)
+        self.assertIn("personas_1.rfc AS persona_rfc", sql)
+        self.assertIn("personas_1.curp AS persona_curp", sql)
+        self.assertIn("quincenas.clave AS quincena_clave", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
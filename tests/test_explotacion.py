@@ -0,0 +1,115 @@
+"""
+Prueba leer_explotacion
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from lib.exceptions import MyNotAllowedExtensionError, MyNotValidParamError
+from lib.explotacion import buscar_archivo_explotacion, leer_explotacion
+
+
+def crear_fila(modelo: int, conceptos: list) -> list:
+    """Crear una fila de explotación con 241 columnas y los conceptos en bloques de seis desde la columna 26"""
+    fila = [""] * 241
+    fila[1] = "05ADG0001A"
+    fila[2] = "GOPE800101AB1"
+    fila[3] = "GOMEZ PEREZ ANA MARIA"
+    fila[8] = "071234"
+    fila[9] = "5"
+    fila[12] = "1234567"
+    fila[13] = "234567"
+    fila[14] = "1000000"
+    fila[16] = "202401"
+    fila[17] = "202401"
+    fila[19] = "201005"
+    fila[20] = "ACT1234"
+    fila[236] = str(modelo)
+    fila[240] = "9876"
+    for numero, (p_o_d, conc, importe) in enumerate(conceptos):
+        columna = 26 + numero * 6
+        fila[columna], fila[columna + 1], fila[columna + 3] = p_o_d, conc, importe
+    return fila
+
+
+# Columnas que en la hoja de cálculo son números
+COLUMNAS_NUMERICAS = {9, 12, 13, 14, 16, 17, 19, 29, 35, 41, 236, 240}
+
+FILAS = [
+    crear_fila(2, [("P", "07", "500000"), ("P", "Q3", "12345"), ("D", "62", "")]),
+    crear_fila(2, [("P", "ME", "150000")]),
+    crear_fila(1, [("P", "07", "700000")]),
+]
+
+
+class TestExplotacion(unittest.TestCase):
+    """Pruebas de la función leer_explotacion"""
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta_csv = Path(self.directorio.name, "NominaFmt2.csv")
+        with open(self.ruta_csv, "w", encoding="utf8", newline="") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow([f"COL{numero}" for numero in range(241)])
+            escritor.writerows(FILAS)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_leer_csv(self):
+        """Se leen las columnas por nombre, los importes en pesos, los quinquenios y la despensa"""
+        registros = list(leer_explotacion(self.ruta_csv))
+        self.assertEqual(len(registros), 3)
+        primero, segundo, tercero = registros
+        self.assertEqual(primero.rfc, "GOPE800101AB1")
+        self.assertEqual(primero.percepcion, 12345.67)
+        self.assertEqual(primero.desde_s, "202401")
+        self.assertEqual(primero.modelo, 2)
+        self.assertEqual(primero.num_empleado, 9876)
+        self.assertEqual(primero.puesto_clave, "ACT1234")
+        self.assertEqual([concepto.clave for concepto in primero.conceptos], ["P07", "PQ3", "D62"])
+        self.assertEqual(primero.conceptos[2].importe, 0.0)
+        self.assertEqual(primero.quinquenios, 3)
+        self.assertFalse(primero.es_despensa)
+        self.assertIsNone(segundo.quinquenios)
+        self.assertTrue(segundo.es_despensa)
+        self.assertEqual(tercero.quinquenios, 0)
+
+    def test_xlsx_igual_a_csv(self):
+        """El mismo contenido en XLSX entrega los mismos registros, y se encuentra por el nombre del XLS"""
+        libro = Workbook()
+        hoja = libro.active
+        hoja.append([f"COL{numero}" for numero in range(241)])
+        for fila in FILAS:
+            hoja.append([int(v) if n in COLUMNAS_NUMERICAS and v != "" else v for n, v in enumerate(fila)])
+        self.ruta_csv.unlink()
+        libro.save(Path(self.directorio.name, "NominaFmt2.xlsx"))
+        ruta = buscar_archivo_explotacion(Path(self.directorio.name), "NominaFmt2.XLS")
+        self.assertEqual(ruta.suffix, ".xlsx")
+        registros = list(leer_explotacion(ruta))
+        self.assertEqual([registro.quinquenios for registro in registros], [3, None, 0])
+        self.assertEqual(registros[0].importe, 10000.0)
+        self.assertEqual(registros[0].quincena_ingreso, "201005")
+
+    def test_errores(self):
+        """Un número inválido indica la fila y la columna, y no se aceptan otras extensiones"""
+        fila = crear_fila(2, [])
+        fila[236] = "X"
+        with open(self.ruta_csv, "a", encoding="utf8", newline="") as archivo:
+            csv.writer(archivo).writerow(fila)
+        with self.assertRaisesRegex(MyNotValidParamError, "Fila 4: MODELO"):
+            list(leer_explotacion(self.ruta_csv))
+        self.assertEqual(len(list(leer_explotacion(self.ruta_csv, con_persona=False))), 4)
+        ruta_txt = Path(self.directorio.name, "NominaFmt2.txt")
+        ruta_txt.write_text("")
+        with self.assertRaises(MyNotAllowedExtensionError):
+            list(leer_explotacion(ruta_txt))
+
+
+if __name__ == "__main__":
+    unittest.main()
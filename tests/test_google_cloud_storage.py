@@ -0,0 +1,50 @@
+"""
+Prueba Google Cloud Storage con el cliente falso
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import unittest
+
+from lib.exceptions import MyBucketNotFoundError
+from lib.google_cloud_storage import (
+    check_file_exists_from_gcs,
+    get_file_from_gcs,
+    get_file_status_from_gcs,
+    set_storage_client,
+    upload_file_to_gcs,
+)
+from lib.google_cloud_storage_fake import FakeStorageClient
+
+
+class TestGoogleCloudStorage(unittest.TestCase):
+    """Pruebas de las funciones de Google Cloud Storage con el cliente falso"""
+
+    def setUp(self):
+        self.cliente = FakeStorageClient(["deposito"])
+        set_storage_client(self.cliente)
+
+    def tearDown(self):
+        set_storage_client(None)
+
+    def test_deposito_no_existe(self):
+        """Depósito que no existe"""
+        self.assertRaises(MyBucketNotFoundError, check_file_exists_from_gcs, "no-existe", "a.xml")
+
+    def test_subir_y_consultar(self):
+        """Subir un archivo y consultar su existencia y URL con una sola petición"""
+        self.assertEqual(get_file_status_from_gcs("deposito", "timbrados/a.xml"), (False, ""))
+        url = upload_file_to_gcs("deposito", "timbrados/a.xml", "application/xml", "<xml/>")
+        peticiones = self.cliente.requests_count
+        self.assertEqual(get_file_status_from_gcs("deposito", "timbrados/a.xml"), (True, url))
+        self.assertEqual(self.cliente.requests_count, peticiones + 1)
+        self.assertEqual(get_file_from_gcs("deposito", "timbrados/a.xml"), b"<xml/>")
+
+    def test_deposito_en_cache(self):
+        """El depósito se consulta una sola vez"""
+        for numero in range(5):
+            check_file_exists_from_gcs("deposito", f"timbrados/{numero}.pdf")
+        self.assertEqual(self.cliente.requests_count, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Prueba ejecutar_grafo
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import threading
+import time
+import unittest
+
+from lib.exceptions import MyEmptyError, MyNotValidParamError
+from lib.grafo import Nodo, ejecutar_grafo
+
+
+class TestGrafo(unittest.TestCase):
+    """Pruebas de la función ejecutar_grafo"""
+
+    def test_dependencias_y_paralelo(self):
+        """Los dependientes esperan a los que necesitan, y los independientes corren al mismo tiempo"""
+        orden = []
+        barrera = threading.Barrier(2, timeout=5)
+
+        def crear(nombre, esperar=False):
+            def funcion():
+                if esperar:
+                    barrera.wait()  # Solo pasa si los dos independientes corren al mismo tiempo
+                time.sleep(0.01)
+                orden.append(nombre)
+                return f"Termina {nombre}"
+
+            return funcion
+
+        nodos = [
+            Nodo("C", crear("C"), depende_de=("B",)),
+            Nodo("B", crear("B"), depende_de=("A",)),
+            Nodo("A", crear("A", esperar=True)),
+            Nodo("X", crear("X", esperar=True)),
+        ]
+        resultados = list(ejecutar_grafo(nodos, hilos=2))
+        self.assertEqual(len(resultados), 4)
+        self.assertTrue(all(resultado.es_exitoso for resultado in resultados))
+        self.assertLess(orden.index("A"), orden.index("B"))
+        self.assertLess(orden.index("B"), orden.index("C"))
+
+    def test_error_no_detiene_a_los_demas(self):
+        """Si uno falla se entrega su error, y los que dependen de él se ejecutan al terminar"""
+
+        def fallar():
+            raise MyEmptyError("No hay registros")
+
+        nodos = [Nodo("A", fallar), Nodo("B", lambda: "Termina B", depende_de=("A",))]
+        resultados = {resultado.nombre: resultado for resultado in ejecutar_grafo(nodos)}
+        self.assertFalse(resultados["A"].es_exitoso)
+        self.assertEqual(resultados["A"].mensaje, "No hay registros")
+        self.assertTrue(resultados["B"].es_exitoso)
+
+    def test_error_inesperado(self):
+        """Una excepción que no es MyAnyError también se entrega como resultado y no detiene a los demás"""
+
+        def fallar():
+            raise KeyError("persona_id")
+
+        nodos = [Nodo("A", fallar), Nodo("B", lambda: "Termina B", depende_de=("A",)), Nodo("C", lambda: "Termina C")]
+        resultados = {resultado.nombre: resultado for resultado in ejecutar_grafo(nodos)}
+        self.assertFalse(resultados["A"].es_exitoso)
+        self.assertIn("KeyError", resultados["A"].mensaje)
+        self.assertTrue(resultados["B"].es_exitoso)
+        self.assertTrue(resultados["C"].es_exitoso)
+
+    def test_grafo_invalido(self):
+        """No se ejecuta nada si hay ciclos o dependencias que no existen"""
+        ejecutados = []
+        with self.assertRaisesRegex(MyNotValidParamError, "ciclo"):
+            nodos = [
+                Nodo("A", lambda: ejecutados.append("A"), depende_de=("B",)),
+                Nodo("B", lambda: ejecutados.append("B"), depende_de=("A",)),
+                Nodo("C", lambda: ejecutados.append("C")),
+            ]
+            list(ejecutar_grafo(nodos))
+        with self.assertRaisesRegex(MyNotValidParamError, "no existe"):
+            list(ejecutar_grafo([Nodo("A", lambda: "A", depende_de=("Z",))]))
+        self.assertEqual(ejecutados, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
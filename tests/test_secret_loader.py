@@ -0,0 +1,47 @@
+"""
+Prueba load_secrets
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from cryptography.fernet import Fernet
+
+from config.secret_loader import DictBackend, SecretsCache, load_secrets
+
+SECRETOS = {"host": "http://localhost", "salt": "sal", "secret_key": "llave"}
+
+
+class TestSecretLoader(unittest.TestCase):
+    """Pruebas de la función load_secrets"""
+
+    def test_resolver_todos(self):
+        """Se resuelven todos los secretos, los que no existen son texto vacío"""
+        backend = DictBackend(SECRETOS)
+        secretos = load_secrets(["host", "salt", "secret_key", "no_existe"], backend)
+        self.assertEqual(secretos["host"], "http://localhost")
+        self.assertEqual(secretos["no_existe"], "")
+        self.assertEqual(backend.requests_count, 4)
+
+    def test_cache_cifrado(self):
+        """El segundo uso sale del cache cifrado y al vencer se vuelve a resolver"""
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio, "perseo.secrets")
+            cache = SecretsCache(ruta, Fernet.generate_key(), ttl=60)
+            backend = DictBackend(SECRETOS, cacheable=True)
+            load_secrets(list(SECRETOS), backend, cache)
+            self.assertNotIn(b"llave", ruta.read_bytes())
+            self.assertEqual(load_secrets(list(SECRETOS), backend, cache), SECRETOS)
+            self.assertEqual(backend.requests_count, 3)
+
+            # Con otra llave o vencido no se usa el cache
+            self.assertIsNone(SecretsCache(ruta, Fernet.generate_key(), ttl=60).load(list(SECRETOS)))
+            cache.ttl = -1
+            cache.save(SECRETOS)
+            self.assertIsNone(cache.load(list(SECRETOS)))
+
+
+if __name__ == "__main__":
+    unittest.main()
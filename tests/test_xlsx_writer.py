@@ -0,0 +1,33 @@
+"""
+Prueba XLSXWriter
+    Para hacer la prueba ejecute el comando `pytest` en la raíz del proyecto
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from lib.xlsx_writer import XLSXWriter
+
+
+class TestXLSXWriter(unittest.TestCase):
+    """Pruebas de la clase XLSXWriter"""
+
+    def test_escribir_desde_generador(self):
+        """Escribir las cabeceras y las filas que entrega un generador"""
+        libro = XLSXWriter()
+        libro.append(["CLAVE", "IMPORTE"])
+        cantidad = libro.append_rows([f"C{numero:03d}", numero * 1.5] for numero in range(250))
+        self.assertEqual(cantidad, 250)
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = libro.save(Path(directorio, "prueba.xlsx"))
+            filas = list(load_workbook(ruta, read_only=True).active.iter_rows(values_only=True))
+        self.assertEqual(len(filas), 251)
+        self.assertEqual(filas[0], ("CLAVE", "IMPORTE"))
+        self.assertEqual(filas[-1], ("C249", 373.5))
+
+
+if __name__ == "__main__":
+    unittest.main()